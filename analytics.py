@@ -0,0 +1,259 @@
+"""Attendance rates per class, course, day and week, and late trends.
+
+One aggregate query reads the attendance once and produces a small cube of
+counts per (day, class, status). Every view is rolled up from that cube in
+memory, so switching views never touches the database again. Usable from a
+script:
+
+    python analytics.py week --from 2024-09-01 --to 2024-12-31
+"""
+import argparse
+from datetime import date, timedelta
+
+from db import DAY, DB_FILE, Database, day_range, init_db
+
+CUBE_QUERY = """
+    SELECT r.ts / {day} AS day, se.class_id, r.status, COUNT(*)
+    FROM attendance_records r
+    LEFT JOIN sessions se ON se.id = r.session_id
+    WHERE {where}
+    GROUP BY day, se.class_id, r.status
+"""
+
+VIEWS = {
+    "class": "By class",
+    "course": "By course",
+    "day": "By day",
+    "week": "By week",
+    "late": "Late trend",
+}
+RATE_HEADER = ("total", "present", "absent", "late", "attendance_rate", "late_rate")
+NO_CLASS = "(no class)"
+NO_COURSE = "(no course)"
+NO_DATE = "(no date)"
+EPOCH = date(1970, 1, 1)
+
+
+class Cube:
+    """Counts per ``(day, class_id, status)`` plus class and course labels.
+
+    ``day`` is days since 1970-01-01 (None for rows without a time).
+    """
+
+    def __init__(self, cells, classes, courses):
+        self.cells = cells
+        self.classes = classes
+        self.courses = courses
+
+
+def load_cube(conn, start=None, end=None):
+    """Read the cube for ``start`` <= ts < ``end`` (seconds, either open)."""
+    where = ["1=1"]
+    params = []
+    if start is not None:
+        where.append("r.ts >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("r.ts < ?")
+        params.append(end)
+    cells = conn.execute(
+        CUBE_QUERY.format(day=DAY, where=" AND ".join(where)), params
+    ).fetchall()
+    classes = {
+        cid: (label, course_id)
+        for cid, label, course_id in conn.execute(
+            "SELECT id, coalesce(class_code, '') || ' - ' || "
+            "coalesce(class_name, ''), course_id FROM classes"
+        )
+    }
+    courses = dict(
+        conn.execute(
+            "SELECT id, coalesce(course_code, '') || ' - ' || "
+            "coalesce(course_name, '') FROM courses"
+        )
+    )
+    return Cube(cells, classes, courses)
+
+
+def session_classes(conn, session_ids):
+    """``{session_id: class_id}`` for the given sessions."""
+    ids = sorted({s for s in session_ids if s is not None})
+    if not ids:
+        return {}
+    marks = ", ".join("?" * len(ids))
+    return dict(
+        conn.execute(f"SELECT id, class_id FROM sessions WHERE id IN ({marks})", ids)
+    )
+
+
+def add_rows(cube, rows, classes):
+    """Count new attendance rows into ``cube`` in place.
+
+    ``rows`` are ``[id, student_id, student_name, ts, status, session_id]``
+    (see changes.added_rows) and ``classes`` maps their sessions to
+    classes (session_classes).
+    """
+    counts = {(day, cid, status): n for day, cid, status, n in cube.cells}
+    for _, _, _, ts, status, session_id in rows:
+        key = (None if ts is None else ts // DAY, classes.get(session_id), status)
+        counts[key] = counts.get(key, 0) + 1
+    cube.cells = [(*key, n) for key, n in counts.items()]
+
+
+# ---------- ROLLUPS ----------
+def _day_label(day):
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+
+def _week_label(day):
+    year, week, _ = (EPOCH + timedelta(days=day)).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _group(cube, key):
+    """``{group: [total, present, absent, late]}`` for ``key(day, class_id)``."""
+    groups = {}
+    for day, class_id, status, count in cube.cells:
+        g = groups.setdefault(key(day, class_id), [0, 0, 0, 0])
+        g[0] += count
+        if status == "Present":
+            g[1] += count
+        elif status == "Absent":
+            g[2] += count
+        elif status == "Late":
+            g[3] += count
+    return groups
+
+
+def _rate_rows(groups, label):
+    """``(rows, keys)``: a labelled row per group, and the groups in order."""
+    # Day and week labels are ISO dates/weeks, so sorting by label is
+    # also chronological
+    keyed = []
+    for k, (total, present, absent, late) in groups.items():
+        keyed.append(((
+            label(k), total, present, absent, late,
+            f"{(present + late) / total:.1%}", f"{late / total:.1%}",
+        ), k))
+    keyed.sort(key=lambda rk: rk[0][0])
+    return [r for r, _ in keyed], [k for _, k in keyed]
+
+
+def rollup(cube, view):
+    """``(header, rows, keys)`` for one of VIEWS, from ``cube`` alone.
+
+    ``keys[i]`` is the group of ``rows[i]``: class id, course id, day or
+    week number. Labels can repeat (two classes with the same code and
+    name, every class without a course); keys don't.
+    """
+    if view == "class":
+        groups = _group(cube, lambda day, cid: cid)
+        return ("class",) + RATE_HEADER, *_rate_rows(
+            groups, lambda cid: cube.classes.get(cid, (NO_CLASS,))[0]
+        )
+    if view == "course":
+        groups = _group(
+            cube, lambda day, cid: cube.classes.get(cid, (None, None))[1]
+        )
+        return ("course",) + RATE_HEADER, *_rate_rows(
+            groups, lambda course: cube.courses.get(course, NO_COURSE)
+        )
+    if view == "day":
+        groups = _group(cube, lambda day, cid: day)
+        return ("day",) + RATE_HEADER, *_rate_rows(
+            groups, lambda day: NO_DATE if day is None else _day_label(day)
+        )
+    if view in ("week", "late"):
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        groups = _group(
+            cube, lambda day, cid: None if day is None else (day + 3) // 7
+        )
+        if view == "week":
+            return ("week",) + RATE_HEADER, *_rate_rows(
+                groups, lambda w: NO_DATE if w is None else _week_label(w * 7 - 3)
+            )
+        rows = []
+        weeks = sorted(k for k in groups if k is not None)
+        previous = None
+        for w in weeks:
+            total, _, _, late = groups[w]
+            rate = late / total
+            # + 0.0 turns a rounded -0.0 into 0.0
+            change = (
+                "" if previous is None
+                else f"{round((rate - previous) * 100, 1) + 0.0:+.1f} pt"
+            )
+            rows.append((_week_label(w * 7 - 3), total, late, f"{rate:.1%}", change))
+            previous = rate
+        return ("week", "total", "late", "late_rate", "change"), rows, weeks
+    raise ValueError(f"Unknown view: {view}")
+
+
+# ---------- CACHE ----------
+class AnalyticsCache:
+    """The last cube read and the views already rolled up from it.
+
+    Call ``add_rows()`` when attendance is added and ``invalidate()`` on
+    any other write. A cube that was being read while the data changed is
+    discarded by ``store()``.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.cube = None
+        self._views = {}
+
+    def invalidate(self):
+        self.generation += 1
+        self.cube = None
+        self._views.clear()
+
+    def add_rows(self, rows, classes):
+        """Count new rows into the cached cube instead of reading it again."""
+        # A cube still being read may or may not have them
+        self.generation += 1
+        if self.cube is None:
+            return
+        if any(c is not None and c not in self.cube.classes for c in classes.values()):
+            # A class the cube has no label for
+            self.invalidate()
+            return
+        add_rows(self.cube, rows, classes)
+        self._views.clear()
+
+    def store(self, cube, generation):
+        if generation == self.generation:
+            self.cube = cube
+            self._views.clear()
+
+    def view(self, name):
+        """Rolled-up view from the cached cube, or None if there is none."""
+        if self.cube is None:
+            return None
+        if name not in self._views:
+            self._views[name] = rollup(self.cube, name)
+        return self._views[name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attendance analytics")
+    parser.add_argument("view", choices=sorted(VIEWS))
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument("--from", dest="first", default="", help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="last", default="", help="YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    try:
+        start, end = day_range(args.first, args.last)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    with Database(args.db) as db:
+        init_db(db.conn)
+        header, rows, _ = rollup(load_cube(db.conn, start, end), args.view)
+    print("\t".join(header))
+    for r in rows:
+        print("\t".join(str(v) for v in r))
+
+
+if __name__ == "__main__":
+    main()
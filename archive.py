@@ -0,0 +1,497 @@
+"""Term archives: closed terms moved out of the main database.
+
+Archiving a term moves its attendance rows into a database file of their
+own (``archives/attendance_<term>.db`` next to the main file) and
+records it in the ``archives`` table. The main database then only holds
+the current term, so the dashboard, history and report stay small. The
+students and sessions of a term are copied along, so every archive can be
+read on its own; sessions also stay in the main database for the class
+filter.
+
+Queries across archives attach them to the connection and read the
+``attendance_all`` TEMP view: the ``attendance`` view of the main database
+UNION ALL each archive, with the same columns. SQLite attaches only a few
+databases to a connection; with more archives than that they are copied
+into TEMP tables a batch at a time instead. A restore moves a term's rows
+back and deletes its file. "Reset All" in the app keeps adding to one
+``reset`` term, so resets never pile up files.
+
+    python archive.py archive 2024-spring --from 2024-01-01 --to 2024-05-31
+    python archive.py list
+    python archive.py restore 2024-spring
+"""
+import argparse
+import getpass
+import os
+import re
+import sqlite3
+
+from db import (
+    DB_FILE,
+    Database,
+    day_range,
+    from_epoch,
+    init_db,
+    log_event,
+    now_stamp,
+    now_ts,
+    transaction,
+)
+
+ARCHIVE_DIR = "archives"
+ALL_VIEW = "attendance_all"
+ALL_SUMMARY_VIEW = "attendance_summary_all"
+# Term names end up in file and schema names
+TERM_NAME = re.compile(r"[A-Za-z0-9_-]{1,40}")
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {s}.students (
+    id INTEGER PRIMARY KEY,
+    student_code TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {s}.sessions (
+    id INTEGER PRIMARY KEY,
+    class_id INTEGER,
+    started_ts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS {s}.attendance_records (
+    id INTEGER PRIMARY KEY,
+    student_ref INTEGER NOT NULL REFERENCES students(id),
+    session_id INTEGER REFERENCES sessions(id),
+    status TEXT,
+    ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS {s}.idx_records_student_ts
+    ON attendance_records(student_ref, ts, status);
+CREATE INDEX IF NOT EXISTS {s}.idx_records_ts ON attendance_records(ts);
+CREATE TABLE IF NOT EXISTS {s}.attendance_summary (
+    student_ref INTEGER PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    present INTEGER NOT NULL DEFAULT 0,
+    absent INTEGER NOT NULL DEFAULT 0,
+    late INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# An archive never changes once written, so its report counts are
+# computed once
+ARCHIVE_SUMMARY = """
+INSERT OR REPLACE INTO {s}.attendance_summary
+    (student_ref, total, present, absent, late)
+SELECT student_ref,
+       COUNT(*),
+       SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status='Absent' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status='Late' THEN 1 ELSE 0 END)
+FROM {s}.attendance_records
+GROUP BY student_ref
+"""
+
+# Same columns as the attendance view
+ARCHIVE_SELECT = """
+    SELECT r.id, s.student_code AS student_id, s.name AS student_name,
+           strftime('%Y-%m-%d %H:%M', r.ts, 'unixepoch') AS date,
+           r.status, r.student_ref, r.session_id, r.ts
+    FROM {s}.attendance_records r JOIN {s}.students s ON s.id = r.student_ref
+"""
+
+
+# Archives copied into TEMP tables when they don't all fit as attachments
+COPY_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS archived_terms (
+    term TEXT PRIMARY KEY,
+    rows INTEGER,
+    archived_ts INTEGER
+);
+CREATE TEMP TABLE IF NOT EXISTS archived_rows (
+    id INTEGER, student_id TEXT, student_name TEXT, date TEXT, status TEXT,
+    student_ref INTEGER, session_id INTEGER, ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS temp.idx_archived_rows_student
+    ON archived_rows(student_id, ts);
+CREATE INDEX IF NOT EXISTS temp.idx_archived_rows_ts ON archived_rows(ts);
+CREATE TEMP TABLE IF NOT EXISTS archived_summary (
+    student_ref INTEGER, total INTEGER, present INTEGER, absent INTEGER,
+    late INTEGER
+);
+"""
+
+
+def _schema(term):
+    return f"archive_{term}"
+
+
+def _attached(conn):
+    return {name for _, name, _ in conn.execute("PRAGMA database_list")}
+
+
+def _check_term(term):
+    if not TERM_NAME.fullmatch(term or ""):
+        raise ValueError("Term names are 1-40 letters, digits, '-' or '_'.")
+
+
+def _range_clause(start, end, column="ts"):
+    where = ["1=1"]
+    params = []
+    if start is not None:
+        where.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        where.append(f"{column} < ?")
+        params.append(end)
+    return " AND ".join(where), params
+
+
+def default_path(conn, term):
+    """``archives/attendance_<term>.db`` next to the main database file."""
+    main = next(
+        f for _, name, f in conn.execute("PRAGMA database_list") if name == "main"
+    )
+    return os.path.join(
+        os.path.dirname(os.path.abspath(main)), ARCHIVE_DIR, f"attendance_{term}.db"
+    )
+
+
+def _attach(conn, term, path):
+    """Attach ``path`` as the term's schema, unless it already is.
+
+    Returns the quoted schema name, ready for use in SQL.
+    """
+    schema = _schema(term)
+    if schema not in _attached(conn):
+        conn.execute(f'ATTACH DATABASE ? AS "{schema}"', (path,))
+    return f'"{schema}"'
+
+
+def _detach(conn, term):
+    if _schema(term) in _attached(conn):
+        conn.execute(f'DETACH DATABASE "{_schema(term)}"')
+
+
+def _slots(conn):
+    """Archives attach_archives may attach at once.
+
+    One below SQLite's limit, to leave room for archive_term.
+    """
+    return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - 1
+
+
+def terms(conn):
+    """``(term, path, start_ts, end_ts, rows, archived_ts)``, oldest first."""
+    return conn.execute(
+        "SELECT term, path, start_ts, end_ts, rows, archived_ts FROM archives "
+        "ORDER BY COALESCE(start_ts, end_ts), term"
+    ).fetchall()
+
+
+# =================== ARCHIVE ===================
+def archive_term(conn, term, start=None, end=None, path=None, actor=None,
+                 append=False):
+    """Move the attendance rows with ``start <= ts < end`` into a term archive.
+
+    Either bound may be None (open). Returns the number of rows moved;
+    raises ValueError if there are none. An archived term is refused
+    unless ``append`` is set, which adds the rows to its file.
+    The move is logged as a ``term.archive`` event by ``actor``.
+    The copy is committed to the archive before the rows are deleted
+    from the main database, so an interrupted run leaves the rows in both
+    places and can simply be run again.
+    """
+    _check_term(term)
+    existing = conn.execute(
+        "SELECT path, start_ts, end_ts FROM archives WHERE term=?", (term,)
+    ).fetchone()
+    if existing is not None and not append:
+        raise ValueError(f"Term '{term}' is already archived.")
+    where, params = _range_clause(start, end, "r.ts")
+    delete_where, _ = _range_clause(start, end)
+    if not conn.execute(
+        f"SELECT 1 FROM main.attendance_records r WHERE {where} LIMIT 1", params
+    ).fetchone():
+        raise ValueError("There are no attendance rows to archive.")
+    if existing is not None:
+        path = existing[0]
+    path = path or default_path(conn, term)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    schema = _attach(conn, term, path)
+    try:
+        with transaction(conn) as c:
+            for statement in ARCHIVE_SCHEMA.format(s=schema).split(";"):
+                if statement.strip():
+                    c.execute(statement)
+            c.execute(
+                f"""INSERT OR IGNORE INTO {schema}.students (id, student_code, name)
+                    SELECT s.id, s.student_code, s.name FROM main.students s
+                    WHERE s.id IN (SELECT r.student_ref
+                                   FROM main.attendance_records r
+                                   WHERE {where})""",
+                params,
+            )
+            c.execute(
+                f"""INSERT OR IGNORE INTO {schema}.sessions (id, class_id, started_ts)
+                    SELECT se.id, se.class_id, se.started_ts FROM main.sessions se
+                    WHERE se.id IN (SELECT r.session_id
+                                    FROM main.attendance_records r
+                                    WHERE {where})""",
+                params,
+            )
+            c.execute(
+                f"""INSERT OR IGNORE INTO {schema}.attendance_records
+                        (id, student_ref, session_id, status, ts)
+                    SELECT r.id, r.student_ref, r.session_id, r.status, r.ts
+                    FROM main.attendance_records r WHERE {where}""",
+                params,
+            )
+            c.execute(ARCHIVE_SUMMARY.format(s=schema))
+        with transaction(conn) as c:
+            # Only delete what the archive holds
+            c.execute(
+                f"""DELETE FROM main.attendance_records
+                    WHERE {delete_where}
+                      AND id IN (SELECT id FROM {schema}.attendance_records)""",
+                params,
+            )
+            moved = c.rowcount
+            total, first, last, last_id = c.execute(
+                f"SELECT COUNT(*), MIN(ts), MAX(ts), MAX(id) "
+                f"FROM {schema}.attendance_records"
+            ).fetchone()
+            bounds = [start if start is not None else first,
+                      end if end is not None else last + 1]
+            if existing is not None:
+                # Widen the term to cover what it held already
+                bounds = [min(b for b in (bounds[0], existing[1]) if b is not None),
+                          max(b for b in (bounds[1], existing[2]) if b is not None)]
+            c.execute(
+                "INSERT OR REPLACE INTO archives "
+                "(term, path, start_ts, end_ts, rows, archived_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (term, os.path.abspath(path), *bounds, total, now_ts()),
+            )
+            # Rows added in the range after the copy stay behind; they all
+            # have ids above last_id
+            log_event(c, actor, "term.archive", {
+                "term": term, "start": start, "end": end, "last_id": last_id,
+                "rows": moved,
+            })
+    finally:
+        _detach(conn, term)
+    return moved
+
+
+def archive_all(conn, term="reset", actor=None):
+    """Add every attendance row to the ``term`` archive.
+
+    A reset that can be undone: returns ``(term, rows)``. Every reset
+    adds to the same term, so restoring it brings back all of them.
+    """
+    return term, archive_term(conn, term, actor=actor, append=True)
+
+
+def restore_term(conn, term, actor=None):
+    """Move a term's rows back into the main database and delete its file.
+
+    Returns the number of rows restored. The rows are logged with the
+    ``term.restore`` event, so a replay can bring them back too.
+    """
+    row = conn.execute("SELECT path FROM archives WHERE term=?", (term,)).fetchone()
+    if row is None:
+        raise ValueError(f"No archived term '{term}'.")
+    path = row[0]
+    if not os.path.exists(path):
+        raise ValueError(f"Archive file for '{term}' is missing: {path}")
+    schema = _attach(conn, term, path)
+    try:
+        with transaction(conn) as c:
+            c.execute(
+                f"""INSERT INTO main.students (student_code, name)
+                    SELECT student_code, name FROM {schema}.students WHERE true
+                    ON CONFLICT (student_code) DO NOTHING"""
+            )
+            c.execute(
+                f"""INSERT OR IGNORE INTO main.sessions (id, class_id, started_ts)
+                    SELECT id, class_id, started_ts FROM {schema}.sessions"""
+            )
+            # Matched by student code: the main database is the authority
+            # for student keys
+            c.execute(
+                f"""INSERT OR IGNORE INTO main.attendance_records
+                        (id, student_ref, session_id, status, ts)
+                    SELECT r.id, m.id, r.session_id, r.status, r.ts
+                    FROM {schema}.attendance_records r
+                    JOIN {schema}.students s ON s.id = r.student_ref
+                    JOIN main.students m ON m.student_code = s.student_code"""
+            )
+            restored = c.rowcount
+            rows = c.execute(
+                f"""SELECT r.id, s.student_code, s.name, r.ts, r.status,
+                           r.session_id
+                    FROM {schema}.attendance_records r
+                    JOIN {schema}.students s ON s.id = r.student_ref
+                    ORDER BY r.id"""
+            ).fetchall()
+            log_event(c, actor, "term.restore", {
+                "term": term, "rows": [list(r) for r in rows],
+            })
+            c.execute("DELETE FROM archives WHERE term=?", (term,))
+    finally:
+        _detach(conn, term)
+    os.remove(path)
+    return restored
+
+
+# =================== READING ACROSS ARCHIVES ===================
+def attach_archives(conn):
+    """Make every archive readable from ``conn`` and (re)create the TEMP views.
+
+    ``attendance_all`` has every row, ``attendance_summary_all`` the
+    report counts of every term (see ALL_REPORT_QUERY). The archives are
+    attached when they fit (see _slots); otherwise they are copied into
+    TEMP tables (_copy_archives). Cheap when nothing changed, so call it
+    before each query that reads them. Returns the ``attendance_all`` name.
+    """
+    registered = terms(conn)
+    fits = len(registered) <= _slots(conn)
+    wanted = {_schema(term) for term, *_ in registered} if fits else set()
+    for name in _attached(conn) - wanted:
+        if name.startswith("archive_"):
+            conn.execute(f'DETACH DATABASE "{name}"')
+    rows = ["SELECT id, student_id, student_name, date, status, student_ref, "
+            "session_id, ts FROM main.attendance"]
+    summaries = ["SELECT student_ref, total, present, absent, late "
+                 "FROM main.attendance_summary"]
+    if fits:
+        for term, path, *_ in registered:
+            schema = _attach(conn, term, path)
+            rows.append(ARCHIVE_SELECT.format(s=schema))
+            summaries.append(
+                "SELECT student_ref, total, present, absent, late "
+                f"FROM {schema}.attendance_summary"
+            )
+    else:
+        _copy_archives(conn, registered)
+        rows.append("SELECT id, student_id, student_name, date, status, "
+                    "student_ref, session_id, ts FROM temp.archived_rows")
+        summaries.append("SELECT student_ref, total, present, absent, late "
+                         "FROM temp.archived_summary")
+    _temp_view(conn, ALL_VIEW, rows)
+    _temp_view(conn, ALL_SUMMARY_VIEW, summaries)
+    return ALL_VIEW
+
+
+def _copy_archives(conn, registered):
+    """Copy the ``registered`` archives into TEMP tables, _slots at a time.
+
+    Skipped when the copy already matches ``registered`` (archives only
+    change when a term is archived or restored).
+    """
+    for statement in COPY_SCHEMA.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+    wanted = sorted((term, rows, archived_ts)
+                    for term, _, _, _, rows, archived_ts in registered)
+    copied = conn.execute(
+        "SELECT term, rows, archived_ts FROM temp.archived_terms ORDER BY term"
+    ).fetchall()
+    if copied == wanted:
+        return
+    # archived_terms is filled last, so an interrupted copy starts over
+    for table in ("archived_terms", "archived_rows", "archived_summary"):
+        conn.execute(f"DELETE FROM temp.{table}")
+    batch_size = _slots(conn)
+    for i in range(0, len(registered), batch_size):
+        batch = registered[i:i + batch_size]
+        try:
+            schemas = [_attach(conn, term, path) for term, path, *_ in batch]
+            conn.execute(
+                "INSERT INTO temp.archived_rows "
+                + "\nUNION ALL\n".join(ARCHIVE_SELECT.format(s=s) for s in schemas)
+            )
+            conn.execute(
+                "INSERT INTO temp.archived_summary "
+                + "\nUNION ALL\n".join(
+                    "SELECT student_ref, total, present, absent, late "
+                    f"FROM {s}.attendance_summary"
+                    for s in schemas
+                )
+            )
+        finally:
+            for term, *_ in batch:
+                _detach(conn, term)
+    conn.executemany(
+        "INSERT INTO temp.archived_terms (term, rows, archived_ts) VALUES (?, ?, ?)",
+        wanted,
+    )
+
+
+def _temp_view(conn, name, selects):
+    body = "\nUNION ALL\n".join(selects)
+    current = conn.execute(
+        "SELECT sql FROM temp.sqlite_master WHERE type='view' AND name=?", (name,)
+    ).fetchone()
+    # SQLite stores a TEMP view's SQL without the TEMP
+    if current is None or current[0] != f"CREATE VIEW {name} AS {body}":
+        conn.execute(f"DROP VIEW IF EXISTS temp.{name}")
+        conn.execute(f"CREATE TEMP VIEW {name} AS {body}")
+
+
+# Sums the stored per-term counts instead of counting archived rows
+ALL_REPORT_QUERY = f"""
+    SELECT s.student_code AS student_id, s.name AS student_name,
+           SUM(m.total), SUM(m.present), SUM(m.absent), SUM(m.late)
+    FROM {ALL_SUMMARY_VIEW} m JOIN main.students s ON s.id = m.student_ref
+    GROUP BY m.student_ref
+    ORDER BY s.student_code
+"""
+
+
+# =================== COMMAND LINE ===================
+def _cmd_archive(db, args):
+    start, end = day_range(args.start, args.end)
+    moved = archive_term(db.conn, args.term, start, end, args.path, args.actor)
+    print(f"archived {moved} rows as '{args.term}'")
+
+
+def _cmd_restore(db, args):
+    restored = restore_term(db.conn, args.term, args.actor)
+    print(f"restored {restored} rows from '{args.term}'")
+
+
+def _cmd_list(db, args):
+    for term, path, start, end, rows, _ in terms(db.conn):
+        first = from_epoch(start, "%Y-%m-%d") if start is not None else "..."
+        last = from_epoch(end - 1, "%Y-%m-%d") if end is not None else "..."
+        print(f"{term}\t{first} to {last}\t{rows} rows\t{path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive and restore terms")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument("--actor", default=getpass.getuser(),
+                        help="name recorded in the audit log")
+    sub = parser.add_subparsers(dest="command", required=True)
+    archive = sub.add_parser("archive", help="move a closed term into an archive")
+    archive.add_argument("term")
+    archive.add_argument("--from", dest="start", default="",
+                         help="first day, YYYY-MM-DD (default: oldest row)")
+    archive.add_argument("--to", dest="end", required=True,
+                         help="last day, YYYY-MM-DD, inclusive")
+    archive.add_argument("--path", help="archive file (default: archives/)")
+    archive.set_defaults(func=_cmd_archive)
+    restore = sub.add_parser("restore", help="move a term back")
+    restore.add_argument("term")
+    restore.set_defaults(func=_cmd_restore)
+    sub.add_parser("list", help="list archived terms").set_defaults(func=_cmd_list)
+
+    args = parser.parse_args(argv)
+    with Database(args.db) as db:
+        init_db(db.conn)
+        try:
+            args.func(db, args)
+        except ValueError as e:
+            raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
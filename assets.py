@@ -0,0 +1,100 @@
+"""Images shared by every screen, decoded and resized once.
+
+Decoding and resampling run on a background thread; the PhotoImage built
+from the result is created on the Tk thread and kept for the life of the
+app, so switching screens never touches the image file again.
+"""
+import threading
+
+from PIL import Image, ImageTk
+
+_PENDING = object()
+
+
+def decode(path, size):
+    """Open ``path`` and resize it to ``size``; None if it can't be read."""
+    try:
+        with Image.open(path) as img:
+            return img.resize(size, Image.LANCZOS)
+    except (OSError, ValueError):
+        return None
+
+
+class AssetCache:
+    """``(path, size)`` -> PhotoImage, built at most once per app.
+
+    ``preload()`` decodes images on a worker thread at startup. ``photo()``
+    returns the cached PhotoImage, or None while the image is still being
+    decoded; pass ``on_ready`` to be called (on the Tk thread) with the
+    PhotoImage once it exists. Missing or unreadable files give None and
+    never call ``on_ready``.
+    """
+
+    def __init__(self, root, poll_ms=30):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._lock = threading.Lock()
+        self._decoded = {}
+        self._photos = {}
+        self._waiting = {}
+        self._after_id = None
+
+    # ---------- DECODING (worker thread) ----------
+    def preload(self, *specs):
+        """Start decoding ``(path, size)`` pairs in the background."""
+        with self._lock:
+            specs = [s for s in specs if s not in self._decoded]
+            for key in specs:
+                self._decoded[key] = _PENDING
+        if specs:
+            threading.Thread(
+                target=self._decode_all, args=(specs,), name="asset-preload",
+                daemon=True,
+            ).start()
+
+    def _decode_all(self, specs):
+        for path, size in specs:
+            img = decode(path, size)
+            with self._lock:
+                self._decoded[(path, size)] = img
+
+    # ---------- PHOTOS (Tk thread) ----------
+    def photo(self, path, size, on_ready=None):
+        key = (path, size)
+        if key in self._photos:
+            return self._photos[key]
+        self.preload(key)
+        with self._lock:
+            img = self._decoded[key]
+        if img is _PENDING:
+            if on_ready is not None:
+                self._waiting.setdefault(key, []).append(on_ready)
+                if self._after_id is None:
+                    self._after_id = self.root.after(self.poll_ms, self._poll)
+            return None
+        return self._make_photo(key, img)
+
+    def _make_photo(self, key, img):
+        if img is None:
+            return None
+        # Keep a reference: Tk drops images that Python no longer holds
+        photo = self._photos[key] = ImageTk.PhotoImage(img)
+        with self._lock:
+            # The PhotoImage holds its own copy of the pixels
+            self._decoded[key] = None
+        return photo
+
+    def _poll(self):
+        self._after_id = None
+        for key in list(self._waiting):
+            with self._lock:
+                img = self._decoded[key]
+            if img is _PENDING:
+                continue
+            callbacks = self._waiting.pop(key)
+            photo = self._make_photo(key, img)
+            if photo is not None:
+                for cb in callbacks:
+                    cb(photo)
+        if self._waiting:
+            self._after_id = self.root.after(self.poll_ms, self._poll)
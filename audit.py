@@ -0,0 +1,232 @@
+"""Audit log: read, follow and replay the ``events`` table.
+
+Every write appends one event in its own transaction (db.log_event): who
+made it (``actor``), what changed (``kind`` and JSON ``data``) and when
+(``ts``). Event ids only grow, so a consumer keeps the last id it has
+handled and asks for what came after it: tail() for one read, follow()
+to keep waiting for more. replay() rebuilds the attendance rows of a
+database from its log alone, into a new file.
+
+    python audit.py tail --after 120 --kind attendance.add
+    python audit.py tail --follow
+    python audit.py replay --out rebuilt.db --verify
+
+Kinds and their data (attendance rows are
+``[id, student_id, student_name, ts, status, session_id]``):
+
+    attendance.add   {"rows"}
+    term.archive     {"term", "start", "end", "last_id", "rows"}
+    term.restore     {"term", "rows"}
+    user.save        {"username", "role", "student_id", "created", "password"}
+    user.delete      {"username"}
+    user.password    {"username"}
+    course.add       {"id", "code", "name"}       course.delete {"id"}
+    class.add        {"id", "code", "name", "course_id"}   class.delete {"id"}
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import NamedTuple
+
+from db import DB_FILE, UPSERT_STUDENT, Database, connect, init_db, transaction
+
+TAIL_LIMIT = 1000
+POLL_SECONDS = 1.0
+VERIFY_SCHEMA = "rebuilt"
+
+REPLAY_RECORD = (
+    "INSERT OR IGNORE INTO attendance_records "
+    "(id, student_ref, session_id, ts, status) "
+    "VALUES (?, (SELECT id FROM students WHERE student_code = ?), ?, ?, ?)"
+)
+
+
+class Event(NamedTuple):
+    id: int
+    ts: int
+    actor: str | None
+    kind: str
+    data: dict
+
+
+# =================== READING ===================
+def tail(conn, after=0, limit=TAIL_LIMIT, kinds=None) -> list[Event]:
+    """Up to ``limit`` events with ``id > after``, oldest first.
+
+    Pass the id of the last event handled as ``after`` to read on from
+    there; ``kinds`` keeps only those kinds.
+    """
+    where = "id > ?"
+    params = [after]
+    if kinds:
+        where += f" AND kind IN ({', '.join('?' * len(kinds))})"
+        params.extend(kinds)
+    return [
+        Event(id_, ts, actor, kind, json.loads(data))
+        for id_, ts, actor, kind, data in conn.execute(
+            f"SELECT id, ts, actor, kind, data FROM events WHERE {where} "
+            "ORDER BY id LIMIT ?",
+            (*params, limit),
+        )
+    ]
+
+
+def follow(conn, after=0, kinds=None, poll=POLL_SECONDS, stop=None):
+    """Yield every event after ``after``, then each new one as it commits.
+
+    Between polls it only checks PRAGMA data_version, which changes when
+    another connection commits, so waiting costs next to nothing. Runs
+    until ``stop`` (a threading.Event) is set.
+    """
+    stop = stop or threading.Event()
+    version = None
+    while not stop.is_set():
+        current = conn.execute("PRAGMA data_version").fetchone()[0]
+        if current != version:
+            version = current
+            while True:
+                events = tail(conn, after, kinds=kinds)
+                yield from events
+                if events:
+                    after = events[-1].id
+                if len(events) < TAIL_LIMIT:
+                    break
+        stop.wait(poll)
+
+
+# =================== REPLAY ===================
+def _add_rows(c, rows):
+    c.executemany(UPSERT_STUDENT, [(r[1], r[2]) for r in rows])
+    c.executemany(REPLAY_RECORD, [(r[0], r[1], r[5], r[3], r[4]) for r in rows])
+
+
+def _archive(c, data):
+    if data["last_id"] is None:
+        return
+    where = ["id <= ?"]
+    params = [data["last_id"]]
+    if data["start"] is not None:
+        where.append("ts >= ?")
+        params.append(data["start"])
+    if data["end"] is not None:
+        where.append("ts < ?")
+        params.append(data["end"])
+    c.execute(f"DELETE FROM attendance_records WHERE {' AND '.join(where)}", params)
+
+
+REPLAYED = {
+    "attendance.add": lambda c, data: _add_rows(c, data["rows"]),
+    "term.archive": _archive,
+    "term.restore": lambda c, data: _add_rows(c, data["rows"]),
+}
+
+
+def replay(conn, target, through=None) -> int:
+    """Rebuild the attendance rows of ``conn`` into ``target`` from the log.
+
+    ``target`` gets the full schema and must not hold attendance yet.
+    ``through`` stops after that event id, to see attendance as it was
+    then. Rows keep their ids; their students come along. Users, courses,
+    classes and sessions are logged for the audit trail only, so session
+    ids point at nothing in the rebuilt file. Returns the events applied.
+    """
+    init_db(target)
+    if target.execute("SELECT 1 FROM attendance_records LIMIT 1").fetchone():
+        raise ValueError("Replay needs a database without attendance rows.")
+    applied = 0
+    after = 0
+    # Sessions are not rebuilt; see above. Has no effect inside a transaction.
+    target.execute("PRAGMA foreign_keys = OFF")
+    try:
+        with transaction(target) as c:
+            while True:
+                events = tail(conn, after, kinds=list(REPLAYED))
+                for event in events:
+                    if through is not None and event.id > through:
+                        return applied
+                    REPLAYED[event.kind](c, event.data)
+                    applied += 1
+                if len(events) < TAIL_LIMIT:
+                    return applied
+                after = events[-1].id
+    finally:
+        target.execute("PRAGMA foreign_keys = ON")
+
+
+def verify(conn, path) -> tuple[int, int]:
+    """``(missing, extra)``: attendance rows of ``conn`` not in the file at
+    ``path``, and the other way round. ``(0, 0)`` means a faithful replay.
+    """
+    conn.execute(f"ATTACH DATABASE ? AS {VERIFY_SCHEMA}", (path,))
+    try:
+        rows = """
+            SELECT r.id, s.student_code, r.ts, r.status
+            FROM {s}.attendance_records r JOIN {s}.students s ON s.id = r.student_ref
+        """
+        main, rebuilt = rows.format(s="main"), rows.format(s=VERIFY_SCHEMA)
+        return tuple(
+            conn.execute(f"SELECT COUNT(*) FROM ({a} EXCEPT {b})").fetchone()[0]
+            for a, b in ((main, rebuilt), (rebuilt, main))
+        )
+    finally:
+        conn.execute(f"DETACH DATABASE {VERIFY_SCHEMA}")
+
+
+# =================== COMMAND LINE ===================
+def _print(event):
+    print(json.dumps(event._asdict(), ensure_ascii=False), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read or replay the audit log")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("tail", help="print events as JSON lines")
+    cmd.add_argument("--after", type=int, default=0, help="last event id seen")
+    cmd.add_argument("--limit", type=int, default=TAIL_LIMIT)
+    cmd.add_argument("--kind", action="append", help="only this kind (repeatable)")
+    cmd.add_argument("--follow", action="store_true", help="keep waiting for more")
+
+    cmd = commands.add_parser("replay", help="rebuild attendance into a new file")
+    cmd.add_argument("--out", required=True, help="new database file")
+    cmd.add_argument("--through", type=int, help="last event id to apply")
+    cmd.add_argument(
+        "--verify", action="store_true",
+        help="compare the result with the current attendance",
+    )
+
+    args = parser.parse_args(argv)
+    with Database(args.db) as db:
+        init_db(db.conn)
+        if args.command == "tail":
+            if not args.follow:
+                for event in tail(db.conn, args.after, args.limit, args.kind):
+                    _print(event)
+                return
+            try:
+                for event in follow(db.conn, args.after, args.kind):
+                    _print(event)
+            except KeyboardInterrupt:
+                pass
+            return
+
+        if os.path.exists(args.out):
+            sys.exit(f"{args.out} already exists; replay only writes new files.")
+        target = connect(args.out)
+        try:
+            applied = replay(db.conn, target, args.through)
+        finally:
+            target.close()
+        print(f"Applied {applied} events to {args.out}.")
+        if args.verify:
+            missing, extra = verify(db.conn, args.out)
+            print(f"{missing} rows missing, {extra} extra.")
+            if missing or extra:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1169 @@
+"""Micro-benchmarks for the attendance database layer.
+
+Every benchmark runs against a scratch database in a temporary directory,
+never against attendance_gui.db. Run one with e.g.:
+
+    python benchmarks.py connections --ops 2000
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from analytics import VIEWS, AnalyticsCache, load_cube, rollup
+from archive import ALL_VIEW, archive_term, attach_archives
+from assets import decode
+from audit import replay, tail
+from changes import ChangeBus, add_to_summary
+from db import (
+    INSERT_RECORD,
+    REPORT_QUERY,
+    STORAGE_PROFILES,
+    SUMMARY_QUERY,
+    UPSERT_STUDENT,
+    Database,
+    KnownUsers,
+    apply_journal_mode,
+    attendance_range_clause,
+    attendance_scope_clause,
+    attendance_search_clause,
+    authenticate,
+    connect,
+    create_tables,
+    day_range,
+    hash_password,
+    init_db,
+    insert_attendance,
+    migrate,
+    now_stamp,
+    now_ts,
+    record_roll_call,
+    schema_version,
+    transaction,
+)
+from maintenance import TASKS, run_task
+from server import MAX_DELAY_MS as API_DELAY_MS
+from server import ApiServer
+from service import AttendanceService
+from writer import MAX_BATCH, MAX_DELAY_MS, Writer
+
+STATUSES = ("Present", "Absent", "Late")
+FAMILY_NAMES = ("Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ",
+                "Võ", "Đặng")
+MIDDLE_NAMES = ("Văn", "Thị", "Minh", "Ngọc", "Quốc", "Thanh")
+GIVEN_NAMES = ("An", "Bình", "Châu", "Dũng", "Hà", "Hải", "Hoa", "Hùng", "Khánh",
+               "Linh", "Long", "Mai", "Nam", "Phương", "Quân", "Tâm", "Thảo",
+               "Trang", "Tuấn", "Yến")
+
+
+def student_name(s):
+    return (
+        f"{FAMILY_NAMES[s % 10]} {MIDDLE_NAMES[s // 10 % 6]} "
+        f"{GIVEN_NAMES[s // 60 % 20]}"
+    )
+
+
+@contextmanager
+def scratch_db(name="bench.db", migrated=True):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name)
+        with Database(path) as db:
+            if migrated:
+                init_db(db.conn)
+            else:
+                create_tables(db.conn)
+        yield path
+
+
+def seed_attendance(db, rows, students=2000):
+    """Insert ``rows`` synthetic attendance records spread over a semester."""
+    def gen():
+        for i in range(rows):
+            s = i % students
+            day = i * 120 // max(rows, 1)
+            yield (
+                f"SV{s:05d}",
+                student_name(s),
+                f"2024-{1 + day // 30 % 12:02d}-{1 + day % 28:02d} "
+                f"{7 + i % 10:02d}:{i % 60:02d}",
+                STATUSES[i % 7 % 3],
+            )
+
+    # insert_attendance writes the current schema; older layouts take the
+    # plain INSERT (through the view's trigger for v6)
+    with db.transaction() as c:
+        if schema_version(db.conn) >= 7:
+            insert_attendance(c, gen())
+        else:
+            c.executemany(
+                "INSERT INTO attendance (student_id, student_name, date, status) "
+                "VALUES (?, ?, ?, ?)",
+                gen(),
+            )
+
+
+def timeit(fn, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return (time.perf_counter() - start) / ops
+
+
+def report(label, seconds):
+    print(f"  {label:<40} {seconds * 1e6:10.1f} us/op")
+
+
+# ---------- CONNECTIONS ----------
+def bench_connections(args):
+    """Per-call sqlite3.connect() versus the shared Database connection."""
+    now = now_stamp()
+
+    with scratch_db() as path:
+        def login_per_call(i):
+            conn = sqlite3.connect(path)
+            conn.execute(
+                "SELECT role FROM users WHERE username=? AND password=?",
+                ("teacher", "1234"),
+            ).fetchone()
+            conn.close()
+
+        def save_per_call(i):
+            conn = sqlite3.connect(path)
+            conn.execute(
+                "INSERT INTO attendance (student_id, student_name, date, status) "
+                "VALUES (?, ?, ?, ?)",
+                (f"SV{i}", f"Student {i}", now, STATUSES[i % 3]),
+            )
+            conn.commit()
+            conn.close()
+
+        def load_per_call(i):
+            conn = sqlite3.connect(path)
+            conn.execute("SELECT * FROM attendance ORDER BY id DESC LIMIT 50").fetchall()
+            conn.close()
+
+        print(f"per-call connect ({args.ops} ops)")
+        report("login", timeit(login_per_call, args.ops))
+        report("save_attendance", timeit(save_per_call, args.ops))
+        report("load_attendance (50 rows)", timeit(load_per_call, args.ops))
+
+        with Database(path) as db:
+            def login_shared(i):
+                db.query_one(
+                    "SELECT role FROM users WHERE username=? AND password=?",
+                    ("teacher", "1234"),
+                )
+
+            def save_shared(i):
+                with db.transaction() as c:
+                    c.execute(
+                        "INSERT INTO attendance (student_id, student_name, date, status) "
+                        "VALUES (?, ?, ?, ?)",
+                        (f"SV{i}", f"Student {i}", now, STATUSES[i % 3]),
+                    )
+
+            def load_shared(i):
+                db.query("SELECT * FROM attendance ORDER BY id DESC LIMIT 50")
+
+            print(f"shared Database ({args.ops} ops)")
+            report("login", timeit(login_shared, args.ops))
+            report("save_attendance", timeit(save_shared, args.ops))
+            report("load_attendance (50 rows)", timeit(load_shared, args.ops))
+
+
+# ---------- PAGING ----------
+def bench_paging(args):
+    """Full-table load versus keyset pages, as used by PagedTreeview."""
+    rows = args.rows or 200_000
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        print(f"attendance rows: {rows}")
+
+        start = time.perf_counter()
+        db.query("SELECT * FROM attendance ORDER BY id DESC")
+        report("SELECT * ... ORDER BY id DESC", time.perf_counter() - start)
+
+        page = 62  # visible rows + prefetch margin
+        last_id = None
+        start = time.perf_counter()
+        for _ in range(args.ops):
+            if last_id is None:
+                got = db.query(
+                    "SELECT * FROM attendance ORDER BY id DESC LIMIT ?", (page,)
+                )
+            else:
+                got = db.query(
+                    "SELECT * FROM attendance WHERE id < ? "
+                    "ORDER BY id DESC LIMIT ?",
+                    (last_id, page),
+                )
+            if not got:
+                break
+            last_id = got[-1][0]
+        report(f"keyset page of {page}", (time.perf_counter() - start) / args.ops)
+
+
+# ---------- INDEXES ----------
+HISTORY_QUERIES = {
+    "history, no filter": (
+        "SELECT * FROM attendance ORDER BY date DESC, id DESC LIMIT 62", ()
+    ),
+    "history, student_id LIKE": (
+        "SELECT * FROM attendance WHERE student_id LIKE ? "
+        "ORDER BY date DESC, id DESC LIMIT 62",
+        ("%01234%",),
+    ),
+    "history, one student": (
+        "SELECT * FROM attendance WHERE student_id = ? "
+        "ORDER BY date DESC LIMIT 62",
+        ("SV01234",),
+    ),
+    "report, GROUP BY student": (
+        """SELECT student_id, student_name, COUNT(*),
+                  SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END),
+                  SUM(CASE WHEN status='Absent' THEN 1 ELSE 0 END),
+                  SUM(CASE WHEN status='Late' THEN 1 ELSE 0 END)
+           FROM attendance GROUP BY student_id, student_name""",
+        (),
+    ),
+}
+
+
+def time_queries(db, queries, ops):
+    for label, (sql, params) in queries.items():
+        plan = db.query("EXPLAIN QUERY PLAN " + sql, params)
+        report(label, timeit(lambda i: db.query(sql, params), ops))
+        for row in plan:
+            print(f"      plan: {row[-1]}")
+
+
+def bench_indexes(args):
+    """History and report queries before and after the schema migrations."""
+    rows = args.rows or 1_000_000
+    with scratch_db(migrated=False) as path, Database(path) as db:
+        seed_attendance(db, rows)
+        print(f"attendance rows: {rows}, no migrations")
+        time_queries(db, HISTORY_QUERIES, args.ops)
+
+        # The queries above are written for the denormalized table
+        start = time.perf_counter()
+        version = migrate(db.conn, target=5)
+        db.execute("ANALYZE")
+        print(f"migrated to v{version} in {time.perf_counter() - start:.2f}s")
+        time_queries(db, HISTORY_QUERIES, args.ops)
+
+
+# ---------- SEARCH ----------
+def bench_search(args):
+    """History name/ID filters: leading-wildcard LIKE versus the FTS index."""
+    rows = args.rows or 1_000_000
+    searches = {
+        "name 'Thảo' (common)": ("", "Thảo"),
+        "name 'ễn Ngọc Tu' (rare)": ("", "ễn Ngọc Tu"),
+        "id '01234' (one student)": ("01234", ""),
+    }
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        print(f"attendance rows: {rows}")
+        for label, (sid, name) in searches.items():
+            like_where = "1=1"
+            like_params = []
+            if sid:
+                like_where += " AND student_id LIKE ?"
+                like_params.append(f"%{sid}%")
+            if name:
+                like_where += " AND student_name LIKE ?"
+                like_params.append(f"%{name}%")
+            fts_where, fts_params = attendance_search_clause(sid, name)
+
+            print(label)
+            for kind, where, params in (
+                ("LIKE", like_where, like_params),
+                ("FTS ", fts_where, fts_params),
+            ):
+                page = (
+                    f"SELECT * FROM attendance WHERE {where} "
+                    "ORDER BY ts DESC, id DESC LIMIT 62"
+                )
+                count = f"SELECT COUNT(*) FROM attendance WHERE {where}"
+                report(
+                    f"{kind} first page",
+                    timeit(lambda i: db.query(page, params), args.ops),
+                )
+                report(
+                    f"{kind} count",
+                    timeit(lambda i: db.query(count, params), args.ops),
+                )
+
+
+# ---------- SUMMARY ----------
+def bench_summary(args):
+    """Report from GROUP BY over attendance_records versus the summary."""
+    rows = args.rows or 1_000_000
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        print(f"attendance rows: {rows}")
+        report("report, GROUP BY attendance_records", timeit(
+            lambda i: db.query(SUMMARY_QUERY), args.ops
+        ))
+        report("report, attendance_summary", timeit(
+            lambda i: db.query(REPORT_QUERY), args.ops
+        ))
+
+
+# ---------- BULK INSERT ----------
+def bench_bulk(args):
+    """Row-at-a-time commits versus one executemany transaction."""
+    rows = args.rows or 50_000
+    now = now_stamp()
+    records = [
+        (f"SV{i % 2000:05d}", student_name(i % 2000), now, STATUSES[i % 3])
+        for i in range(rows)
+    ]
+    with scratch_db() as path, Database(path) as db:
+        sample = min(rows, 2000)
+        start = time.perf_counter()
+        for r in records[:sample]:
+            with db.transaction() as c:
+                insert_attendance(c, [r])
+        per_row = (time.perf_counter() - start) / sample
+        print(f"one commit per row ({sample} rows)")
+        report("per record", per_row)
+        print(f"  {1 / per_row:>40,.0f} records/s")
+
+        start = time.perf_counter()
+        record_roll_call(db.conn, ((sid, name, status) for sid, name, _, status in records))
+        batch = (time.perf_counter() - start) / rows
+        print(f"record_roll_call, one transaction ({rows} rows)")
+        report("per record", batch)
+        print(f"  {1 / batch:>40,.0f} records/s")
+
+
+# ---------- NORMALIZED SCHEMA ----------
+NORMALIZE_QUERIES = {
+    "history, first page": (
+        "SELECT id, student_id, student_name, date, status FROM attendance "
+        "ORDER BY date DESC, id DESC LIMIT 62",
+        (),
+    ),
+    "history, one student": (
+        "SELECT id, student_id, student_name, date, status FROM attendance "
+        "WHERE student_id = ? ORDER BY date DESC LIMIT 62",
+        ("SV01234",),
+    ),
+    "history, name LIKE": (
+        "SELECT id, student_id, student_name, date, status FROM attendance "
+        "WHERE student_name LIKE ? ORDER BY date DESC, id DESC LIMIT 62",
+        ("%ễn Ngọc Tu%",),
+    ),
+    "report, GROUP BY student": (
+        """SELECT student_id, student_name, COUNT(*),
+                  SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END),
+                  SUM(CASE WHEN status='Absent' THEN 1 ELSE 0 END),
+                  SUM(CASE WHEN status='Late' THEN 1 ELSE 0 END)
+           FROM attendance GROUP BY student_id, student_name""",
+        (),
+    ),
+}
+NORMALIZED_REPORT = f"""
+    SELECT s.student_code, s.name, m.total, m.present, m.absent, m.late
+    FROM ({SUMMARY_QUERY}) m JOIN students s ON s.id = m.student_ref
+"""
+
+
+def file_size(db, path):
+    db.execute("VACUUM")
+    return os.path.getsize(path)
+
+
+def bench_normalize(args):
+    """Denormalized attendance table versus students + attendance_records."""
+    rows = args.rows or 1_000_000
+    with scratch_db(migrated=False) as path, Database(path) as db:
+        migrate(db.conn, target=5)
+        seed_attendance(db, rows)
+        db.execute("ANALYZE")
+        before = file_size(db, path)
+        print(f"attendance rows: {rows}, denormalized (v5): {before / 1e6:.1f} MB")
+        time_queries(db, NORMALIZE_QUERIES, args.ops)
+
+        start = time.perf_counter()
+        version = migrate(db.conn, target=6)
+        elapsed = time.perf_counter() - start
+        db.execute("ANALYZE")
+        after = file_size(db, path)
+        print(
+            f"online migration to v{version}: {elapsed:.2f}s, "
+            f"normalized: {after / 1e6:.1f} MB ({after / before:.0%})"
+        )
+        time_queries(db, {
+            **NORMALIZE_QUERIES,
+            "report, GROUP BY student": (NORMALIZED_REPORT, ()),
+        }, args.ops)
+
+
+# ---------- DATES ----------
+def bench_dates(args):
+    """Date-range scans over the text date column versus integer ts."""
+    rows = args.rows or 1_000_000
+    ranges = {
+        "one day": ("2024-02-10", "2024-02-10"),
+        "one week": ("2024-02-05", "2024-02-11"),
+        "one month": ("2024-03-01", "2024-03-31"),
+    }
+    with scratch_db(migrated=False) as path, Database(path) as db:
+        migrate(db.conn, target=6)
+        seed_attendance(db, rows)
+        db.execute("ANALYZE")
+        before = file_size(db, path)
+        print(f"attendance rows: {rows}, text dates (v6): {before / 1e6:.1f} MB")
+        queries = {}
+        for label, (first, last) in ranges.items():
+            params = (f"{first} 00:00", f"{last} 23:59")
+            queries[f"{label}, count"] = (
+                "SELECT COUNT(*) FROM attendance_records "
+                "WHERE date BETWEEN ? AND ?",
+                params,
+            )
+            queries[f"{label}, first page"] = (
+                "SELECT id, student_id, student_name, date, status FROM attendance "
+                "WHERE date BETWEEN ? AND ? ORDER BY date DESC, id DESC LIMIT 62",
+                params,
+            )
+        time_queries(db, queries, args.ops)
+
+        start = time.perf_counter()
+        version = migrate(db.conn)
+        elapsed = time.perf_counter() - start
+        db.execute("ANALYZE")
+        after = file_size(db, path)
+        print(
+            f"migrated to v{version} in {elapsed:.2f}s, "
+            f"epoch seconds: {after / 1e6:.1f} MB ({after / before:.0%})"
+        )
+        queries = {}
+        for label, (first, last) in ranges.items():
+            where, params = attendance_range_clause(*day_range(first, last))
+            queries[f"{label}, count"] = (
+                f"SELECT COUNT(*) FROM attendance_records WHERE {where}",
+                params,
+            )
+            queries[f"{label}, first page"] = (
+                "SELECT id, student_id, student_name, date, status FROM attendance "
+                f"WHERE {where} ORDER BY ts DESC, id DESC LIMIT 62",
+                params,
+            )
+        time_queries(db, queries, args.ops)
+
+
+# ---------- ANALYTICS ----------
+RATE_COLUMNS = """COUNT(*),
+           SUM(r.status = 'Present'), SUM(r.status = 'Absent'),
+           SUM(r.status = 'Late')"""
+VIEW_QUERIES = {
+    "class": f"""SELECT se.class_id, {RATE_COLUMNS}
+        FROM attendance_records r LEFT JOIN sessions se ON se.id = r.session_id
+        GROUP BY se.class_id""",
+    "course": f"""SELECT cl.course_id, {RATE_COLUMNS}
+        FROM attendance_records r LEFT JOIN sessions se ON se.id = r.session_id
+        LEFT JOIN classes cl ON cl.id = se.class_id
+        GROUP BY cl.course_id""",
+    "day": f"""SELECT r.ts / 86400 AS day, {RATE_COLUMNS}
+        FROM attendance_records r GROUP BY day""",
+    "week": f"""SELECT (r.ts / 86400 + 3) / 7 AS week, {RATE_COLUMNS}
+        FROM attendance_records r GROUP BY week""",
+}
+VIEW_QUERIES["late"] = VIEW_QUERIES["week"]
+
+
+def bench_analytics(args):
+    """One GROUP BY query per report view versus one cube and rollups."""
+    rows = args.rows or 1_000_000
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        with db.transaction() as c:
+            for i in range(10):
+                c.execute(
+                    "INSERT INTO courses (course_code, course_name) VALUES (?, ?)",
+                    (f"C{i % 3}", f"Course {i % 3}"),
+                )
+                c.execute(
+                    "INSERT INTO classes (class_code, class_name, course_id) "
+                    "VALUES (?, ?, ?)",
+                    (f"L{i}", f"Class {i}", i % 3 + 1),
+                )
+                c.execute(
+                    "INSERT INTO sessions (class_id, started_ts) VALUES (?, 0)",
+                    (i + 1,),
+                )
+            c.execute("UPDATE attendance_records SET session_id = id % 10 + 1")
+        db.execute("ANALYZE")
+        print(f"attendance rows: {rows}")
+
+        ops = min(args.ops, 5)
+        total = 0.0
+        for view in VIEWS:
+            seconds = timeit(lambda i: db.query(VIEW_QUERIES[view]), ops)
+            total += seconds
+            report(f"GROUP BY query, {view}", seconds)
+        report("GROUP BY query, all views", total)
+
+        load = timeit(lambda i: load_cube(db.conn), ops)
+        report("load_cube", load)
+        cube = load_cube(db.conn)
+        print(f"      cube cells: {len(cube.cells)}")
+        total = load
+        for view in VIEWS:
+            seconds = timeit(lambda i: rollup(cube, view), args.ops)
+            total += seconds
+            report(f"rollup, {view}", seconds)
+        report("load_cube + all rollups", total)
+
+
+# ---------- ASSETS ----------
+def bench_assets(args):
+    """Image work per screen switch: decode + LANCZOS resize of the logo.
+
+    This is what every create_header call used to pay; with AssetCache a
+    switch only looks up the cached PhotoImage. (Building the PhotoImage
+    needs a display and is not timed here.)
+    """
+    from PIL import Image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "logo.png")
+        Image.effect_noise((1200, 720), 64).convert("RGB").save(path)
+        print(f"logo: 1200x720 PNG, {os.path.getsize(path) / 1e3:.0f} kB")
+        report("decode + resize to 150x90", timeit(
+            lambda i: decode(path, (150, 90)), args.ops
+        ))
+
+
+# ---------- SCREENS ----------
+def bench_screens(args):
+    """Screen switch latency: rebuild on every switch versus cached frames.
+
+    Needs a display. Each switch is timed by ScreenManager, including the
+    redraw (update_idletasks).
+    """
+    import tkinter as tk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"needs a display: {e}")
+        return
+    from stage3 import AttendanceApp
+
+    route = ("teacher", "login", "admin", "login", "student", "login")
+    ops = min(args.ops, 50)
+    with scratch_db() as path:
+        with Database(path) as db:
+            seed_attendance(db, args.rows or 10_000)
+        app = AttendanceApp(root, db_path=path)
+        screens = app.screens
+        for name in route:
+            screens.show(name)
+
+        def mean_switch(rebuild):
+            del screens.timings[:]
+            for _ in range(ops):
+                for name in route:
+                    if rebuild:
+                        screens.forget(name)
+                    screens.show(name)
+            return sum(t for _, _, t in screens.timings) / len(screens.timings)
+
+        print(f"route {' -> '.join(route)}, {ops} rounds")
+        report("destroy and rebuild", mean_switch(rebuild=True))
+        report("cached frames", mean_switch(rebuild=False))
+        app.on_close()
+
+
+# ---------- TABLES ----------
+def bench_tables(args):
+    """Refilling a Treeview: row-at-a-time versus TableBinding.
+
+    Needs a display. "first chunk" is how long the Tk loop is blocked
+    before it can handle events again; the rest of a chunked fill runs
+    from idle callbacks.
+    """
+    import tkinter as tk
+    from tkinter import ttk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"needs a display: {e}")
+        return
+    from widgets import TableBinding
+
+    n = args.rows or 5000
+    ops = min(args.ops, 20)
+    tree = ttk.Treeview(root, columns=("id", "name", "status"), show="headings")
+    rows = [(i, student_name(i), STATUSES[i % 3]) for i in range(n)]
+    edited = list(rows)
+    edited[n // 2] = (n // 2, "Renamed", "Late")
+
+    def row_at_a_time(i):
+        for iid in tree.get_children():
+            tree.delete(iid)
+        for r in rows:
+            tree.insert("", tk.END, values=r)
+        root.update_idletasks()
+
+    table = TableBinding(tree, key=lambda r: r[0])
+
+    def first_chunk(i):
+        table.clear()
+        table.set_rows(rows)
+
+    def whole_table(i):
+        first_chunk(i)
+        while table.pending:
+            root.update()
+
+    print(f"{n} rows")
+    table.clear()
+    report("delete + insert per row", timeit(row_at_a_time, ops))
+    table.clear()
+    report("TableBinding, first chunk", timeit(first_chunk, ops))
+    report("TableBinding, whole table", timeit(whole_table, ops))
+    table.diff_limit = n
+    report("TableBinding, one row changed", timeit(
+        lambda i: table.set_rows(edited if i % 2 else rows), ops
+    ))
+    root.destroy()
+
+
+# ---------- LOGIN ----------
+def bench_login(args):
+    """Login latency per scrypt work factor, and for an unknown username.
+
+    A login blocks its DBExecutor worker for this long; the Tk thread only
+    waits for the result.
+    """
+    ops = min(args.ops, 20)
+    with scratch_db() as path:
+        with Database(path) as db:
+            for n in (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16):
+                with db.transaction() as c:
+                    c.execute(
+                        "UPDATE users SET password=? WHERE username='admin'",
+                        (hash_password("admin", n),),
+                    )
+                report(f"login, n=2^{n.bit_length() - 1}", timeit(
+                    lambda i: authenticate(db.conn, "admin", "admin", n), ops
+                ))
+            known = KnownUsers(db.conn)
+            report("unknown username (KnownUsers)", timeit(
+                lambda i: "nobody" in known, args.ops
+            ))
+
+
+# ---------- SERVICE ----------
+def bench_service(args):
+    """The GUI's hot paths, called through the service layer headless.
+
+    Combine with --profile to see where the time goes.
+    """
+    rows = args.rows or 100_000
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        service = AttendanceService(db.conn)
+        class_id = service.classes.add("K01", "Class 01")
+        roll = [
+            (s.student_id, s.student_name, STATUSES[0])
+            for s in service.attendance.roster()[:40]
+        ]
+        print(f"attendance rows: {rows}")
+        ops = min(args.ops, 20)
+        report("users.authenticate", timeit(
+            lambda i: service.users.authenticate("teacher", "1234"), ops
+        ))
+        report("attendance.add", timeit(
+            lambda i: service.attendance.add(
+                f"SV{i % 2000:05d}", student_name(i % 2000), "Present"
+            ),
+            args.ops,
+        ))
+        report("attendance.record_roll_call (40)", timeit(
+            lambda i: service.attendance.record_roll_call(roll, class_id), args.ops
+        ))
+        report("attendance.roster", timeit(
+            lambda i: service.attendance.roster(), args.ops
+        ))
+        report("attendance.history (100 rows)", timeit(
+            lambda i: service.attendance.history(limit=100), args.ops
+        ))
+        report("attendance.report", timeit(
+            lambda i: service.attendance.report(), min(args.ops, 100)
+        ))
+        report("classes.choices", timeit(
+            lambda i: service.classes.choices(), args.ops
+        ))
+
+
+# ---------- ROLE SCOPE ----------
+DASHBOARD_COLUMNS = "id, student_id, student_name, date, status"
+
+
+def dashboard_queries(where, params):
+    """First page and every visible row of the dashboard for one scope."""
+    order = "ORDER BY ts DESC, id DESC"
+    return {
+        "first page": (
+            f"SELECT {DASHBOARD_COLUMNS} FROM attendance WHERE {where} "
+            f"{order} LIMIT 62",
+            tuple(params),
+        ),
+        "all visible rows": (
+            f"SELECT {DASHBOARD_COLUMNS} FROM attendance WHERE {where} {order}",
+            tuple(params),
+        ),
+    }
+
+
+def bench_scoping(args):
+    """Student dashboard load: every row versus the student's own rows.
+
+    Before role scoping the student dashboard paged through the whole
+    table. Scoped, it reads one student's rows off idx_records_student_ts.
+    The plan of each query is printed under its timing.
+    """
+    rows = args.rows or 1_000_000
+    ops = min(args.ops, 200)
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        service = AttendanceService(db.conn)
+        service.users.save("sv01234", "student", "pw", "SV01234")
+        print(f"attendance rows: {rows}")
+        scopes = {
+            "unscoped (before)": ("1=1", []),
+            "teacher": attendance_scope_clause("teacher"),
+            "student": service.attendance.scope(service.users.get("sv01234")),
+            "student, not linked": attendance_scope_clause("student"),
+        }
+        for label, (where, params) in scopes.items():
+            print(label)
+            queries = dashboard_queries(where, params)
+            # Every row of the whole table takes seconds; a few runs will do
+            slow = where == "1=1"
+            time_queries(db, {"first page": queries["first page"]}, ops)
+            time_queries(
+                db,
+                {"all visible rows": queries["all visible rows"]},
+                min(ops, 3) if slow else ops,
+            )
+
+
+# ---------- ARCHIVES ----------
+def bench_archive(args):
+    """Hot queries before and after archiving closed terms.
+
+    The seed spans four months; the first three are archived as one term
+    each. Reads of the current term then touch a quarter of the rows;
+    reads across all terms go through the attendance_all view.
+    """
+    rows = args.rows or 1_000_000
+    ops = min(args.ops, 200)
+    queries = {
+        "dashboard first page": (
+            "SELECT id, student_id, student_name, date, status FROM {t} "
+            "ORDER BY ts DESC, id DESC LIMIT 62",
+            (),
+        ),
+        "one student, all rows": (
+            "SELECT id, date, status FROM {t} WHERE student_id = ? "
+            "ORDER BY ts DESC, id DESC",
+            ("SV01234",),
+        ),
+        "count": ("SELECT COUNT(*) FROM {t}", ()),
+    }
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        print(f"attendance rows: {rows}")
+
+        def run_all(table, label):
+            print(label)
+            for name, (sql, params) in queries.items():
+                sql = sql.format(t=table)
+                report(name, timeit(lambda i: db.query(sql, params), ops))
+            report("report", timeit(
+                lambda i: AttendanceService(db.conn).attendance.report(
+                    include_archives=table == ALL_VIEW
+                ),
+                min(ops, 20),
+            ))
+
+        run_all("attendance", "one table")
+        for month in ("01", "02", "03"):
+            start, end = day_range(f"2024-{month}-01", f"2024-{month}-28")
+            seconds = time.perf_counter()
+            moved = archive_term(db.conn, f"2024-{month}", start, end)
+            report(f"archive 2024-{month} ({moved} rows)",
+                   time.perf_counter() - seconds)
+        run_all("attendance", "current term only")
+        attach_archives(db.conn)
+        run_all(ALL_VIEW, "all terms (attendance_all)")
+
+
+# ---------- AUDIT LOG ----------
+def bench_audit(args):
+    """What the audit log adds to a write, and how fast it reads back.
+
+    Each op commits one transaction of ``batch`` rows, once through
+    insert_attendance (rows plus one event) and once with the bare
+    INSERTs; the two alternate, so both see the database at the same
+    size. Then the whole log is read with tail() and replayed into a new
+    file.
+    """
+    ops = min(args.ops, 500)
+    now = now_ts()
+    with scratch_db() as path, Database(path) as db:
+        for batch in (1, 40, 500):
+            def rows(i):
+                return [
+                    (f"SV{s % 2000:05d}", student_name(s % 2000), now,
+                     STATUSES[s % 3])
+                    for s in range(i * batch, (i + 1) * batch)
+                ]
+
+            def bare(i):
+                chunk = rows(i)
+                with db.transaction() as c:
+                    c.executemany(UPSERT_STUDENT, [r[:2] for r in chunk])
+                    c.executemany(
+                        INSERT_RECORD, [(r[0], None, r[2], r[3]) for r in chunk]
+                    )
+
+            def logged(i):
+                with db.transaction() as c:
+                    insert_attendance(c, rows(i), actor="bench")
+
+            spent = {"without log": 0.0, "with log": 0.0}
+            for i in range(ops):
+                for label, fn in (("without log", bare), ("with log", logged)):
+                    start = time.perf_counter()
+                    fn(i)
+                    spent[label] += time.perf_counter() - start
+            print(f"{batch} rows per commit")
+            for label, seconds in spent.items():
+                report(label, seconds / ops)
+
+        events = db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        print(f"events: {events}")
+        start = time.perf_counter()
+        after = 0
+        while batch := tail(db.conn, after):
+            after = batch[-1].id
+        report("tail() the whole log, per event",
+               (time.perf_counter() - start) / events)
+        target = connect(os.path.join(os.path.dirname(path), "rebuilt.db"))
+        try:
+            start = time.perf_counter()
+            replay(db.conn, target)
+            report("replay, whole log", time.perf_counter() - start)
+        finally:
+            target.close()
+
+
+# ---------- CHANGE BUS ----------
+def bench_changes(args):
+    """Applying one new check-in: re-reading everything versus the delta.
+
+    Without the bus an open view reloads its first page, the report
+    reruns its query and the analytics cube is read again. With it the
+    view re-reads the new row by id, and the report and cube count it in
+    memory. An empty poll is what a worker pays every second.
+    """
+    rows = args.rows or 1_000_000
+    ops = min(args.ops, 200)
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        print(f"attendance rows: {rows}")
+        bus = ChangeBus(db.conn)
+        report("poll, nothing new", timeit(lambda i: bus.poll(), ops))
+
+        AttendanceService(db.conn).attendance.add("SV01234", "x", "Late")
+        received = []
+        bus.subscribe(received.append)
+        bus.poll()
+        new, classes = received[0].rows, received[0].classes
+        new_id = new[0][0]
+        search, search_params = attendance_search_clause("", "Nguyễn Văn An")
+        for label, (where, params) in {
+            "dashboard": ("1=1", ()),
+            "history, name search": (search, search_params),
+        }.items():
+            print(label)
+            time_queries(db, {
+                "reload first page": dashboard_queries(where, params)["first page"],
+                "re-read the new id": (
+                    f"SELECT {DASHBOARD_COLUMNS}, ts FROM attendance "
+                    f"WHERE ({where}) AND id IN (?)",
+                    (*params, new_id),
+                ),
+            }, ops)
+
+        print("report")
+        summary = AttendanceService(db.conn).attendance.report()
+        report("rerun the query", timeit(
+            lambda i: AttendanceService(db.conn).attendance.report(), min(ops, 20)
+        ))
+        report("count the row in", timeit(lambda i: add_to_summary(summary, new), ops))
+
+        print("analytics cube")
+        report("read it again", timeit(lambda i: load_cube(db.conn), min(ops, 5)))
+        cache = AnalyticsCache()
+        cache.store(load_cube(db.conn), cache.generation)
+        report("count the row in", timeit(
+            lambda i: cache.add_rows(new, classes),
+            ops,
+        ))
+
+
+# ---------- STORAGE PROFILES ----------
+def bench_profiles(args):
+    """History reads while another connection writes, per storage profile.
+
+    One thread commits single attendance rows as fast as it can; the main
+    thread reads the history first page. In rollback-journal mode a read
+    waits whenever a commit holds the lock; in WAL it never does. Then the
+    maintenance tasks are timed on the same database after a purge.
+    """
+    rows = args.rows or 200_000
+    ops = min(args.ops, 2000)
+    history = (
+        "SELECT id, student_id, student_name, date, status FROM attendance "
+        "ORDER BY ts DESC, id DESC LIMIT 62"
+    )
+    for profile in ("legacy", "wal", "fast"):
+        with scratch_db() as path:
+            with Database(path, profile=profile) as db:
+                apply_journal_mode(db.conn, profile)
+                seed_attendance(db, rows)
+                stop = threading.Event()
+                written = []
+
+                def write():
+                    with db.pooled() as conn:
+                        i = 0
+                        while not stop.is_set():
+                            with transaction(conn) as c:
+                                insert_attendance(
+                                    c, [("SV00001", "An", now_stamp(), "Present")]
+                                )
+                            i += 1
+                        written.append(i)
+
+                writer = threading.Thread(target=write)
+                latencies = []
+                start = time.perf_counter()
+                writer.start()
+                for _ in range(ops):
+                    t0 = time.perf_counter()
+                    db.query(history)
+                    latencies.append(time.perf_counter() - t0)
+                stop.set()
+                writer.join()
+                elapsed = time.perf_counter() - start
+                latencies.sort()
+                print(f"{profile}: {STORAGE_PROFILES[profile]}")
+                report("history read, p50", latencies[ops // 2])
+                report("history read, p99", latencies[ops * 99 // 100])
+                print(f"  {written[0] / elapsed:>40,.0f} commits/s alongside")
+
+    # Maintenance on a database that just lost half its rows
+    with scratch_db() as path, Database(path) as db:
+        seed_attendance(db, rows)
+        with db.transaction() as c:
+            c.execute("DELETE FROM attendance_records WHERE id % 2 = 0")
+        print(f"maintenance, {rows} rows then half deleted")
+        for name in TASKS:
+            report(name, run_task(db.conn, name))
+
+
+# ---------- GROUP COMMIT ----------
+def bench_group_commit(args):
+    """Writer throughput and commit latency per batch size.
+
+    ``--clients`` threads each queue their share of ``--ops`` rows as a
+    burst, then wait for all of them to be committed. Latency is from
+    check_in() to the commit that made the row durable.
+    """
+    rows = max(args.ops, 2000)
+    delay_ms = MAX_DELAY_MS if args.delay_ms is None else args.delay_ms
+    per_thread = rows // args.clients
+    print(f"{per_thread * args.clients} rows from {args.clients} threads, "
+          f"delay {delay_ms} ms")
+    print(f"  {'batch':>6} {'rows/s':>10} {'rows/commit':>12} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for max_batch in (1, 10, 50, 100, 500, 1000):
+        with scratch_db() as path:
+            writer = Writer(path, max_batch, delay_ms)
+            latencies = []
+
+            def produce(t):
+                futures = []
+                for i in range(t * per_thread, (t + 1) * per_thread):
+                    s = i % 2000
+                    submitted = time.perf_counter()
+                    f = writer.check_in(
+                        (f"SV{s:05d}", student_name(s), now_stamp(), STATUSES[i % 3])
+                    )
+                    f.add_done_callback(
+                        lambda f, t0=submitted: latencies.append(
+                            time.perf_counter() - t0
+                        )
+                    )
+                    futures.append(f)
+                for f in futures:
+                    f.result()
+
+            threads = [
+                threading.Thread(target=produce, args=(t,))
+                for t in range(args.clients)
+            ]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            writer.close()
+        latencies.sort()
+        n = len(latencies)
+        print(f"  {max_batch:>6} {n / elapsed:>10,.0f} "
+              f"{writer.rows / writer.batches:>12.1f} "
+              f"{latencies[n // 2] * 1e3:>8.2f} "
+              f"{latencies[min(n - 1, n * 99 // 100)] * 1e3:>8.2f}")
+
+
+# ---------- HTTP API ----------
+async def _check_in_client(port, requests, first, latencies):
+    """One keep-alive connection posting ``requests`` check-ins in a row."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for i in range(first, first + requests):
+        s = i % 2000
+        body = json.dumps({
+            "student_id": f"SV{s:05d}",
+            "student_name": student_name(s),
+            "status": STATUSES[i % 3],
+        }).encode()
+        start = time.perf_counter()
+        writer.write(
+            b"POST /checkin HTTP/1.1\r\nHost: localhost\r\n"
+            b"Content-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        status = (await reader.readline()).split()[1]
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        if status != b"201":
+            raise RuntimeError(f"check-in failed with HTTP {status.decode()}")
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def _load_check_ins(path, max_batch, delay_ms, clients, requests):
+    server = ApiServer(path, max_batch, delay_ms)
+    port = await server.start("127.0.0.1", 0)
+    latencies = []
+    per_client = max(requests // clients, 1)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _check_in_client(port, per_client, c * per_client, latencies)
+        for c in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    writer = server.writer
+    await server.close()
+    return elapsed, sorted(latencies), writer.rows / max(writer.batches, 1)
+
+
+def bench_api(args):
+    """Load generator: concurrent HTTP check-ins against server.py.
+
+    ``--clients`` keep-alive connections post check-ins as fast as they
+    get answers; reported per run are check-ins/s and latency percentiles.
+    Clients and server share one process and event loop, so the numbers
+    are a floor for what a separate server process can do.
+    """
+    delay_ms = API_DELAY_MS if args.delay_ms is None else args.delay_ms
+    for label, max_batch in (("one commit per check-in", 1),
+                             ("group commit", MAX_BATCH)):
+        with scratch_db() as path:
+            elapsed, latencies, per_batch = asyncio.run(
+                _load_check_ins(
+                    path, max_batch, delay_ms, args.clients, args.ops
+                )
+            )
+        n = len(latencies)
+        print(f"{label} ({args.clients} clients, {n} check-ins)")
+        print(f"  {n / elapsed:>40,.0f} check-ins/s")
+        print(f"  {per_batch:>40.1f} rows per commit")
+        report("p50 latency", latencies[n // 2])
+        report("p99 latency", latencies[min(n - 1, n * 99 // 100)])
+
+
+BENCHMARKS = {
+    "connections": bench_connections,
+    "paging": bench_paging,
+    "indexes": bench_indexes,
+    "search": bench_search,
+    "summary": bench_summary,
+    "bulk": bench_bulk,
+    "normalize": bench_normalize,
+    "dates": bench_dates,
+    "analytics": bench_analytics,
+    "assets": bench_assets,
+    "screens": bench_screens,
+    "tables": bench_tables,
+    "login": bench_login,
+    "service": bench_service,
+    "scoping": bench_scoping,
+    "profiles": bench_profiles,
+    "archive": bench_archive,
+    "audit": bench_audit,
+    "changes": bench_changes,
+    "group-commit": bench_group_commit,
+    "api": bench_api,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=0,
+                        help="table size for benchmarks that seed data")
+    parser.add_argument("--clients", type=int, default=50,
+                        help="concurrent connections for the api benchmark")
+    parser.add_argument("--delay-ms", type=float, default=None,
+                        help="Writer flush delay (group-commit and api)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run under cProfile and print the top functions")
+    args = parser.parse_args()
+    if not args.profile:
+        BENCHMARKS[args.benchmark](args)
+        return
+    profiler = cProfile.Profile()
+    profiler.runcall(BENCHMARKS[args.benchmark], args)
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
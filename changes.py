@@ -0,0 +1,177 @@
+"""Change notifications, so open views apply just what was written.
+
+Every write lands in the audit log (audit.py) when it commits, whoever
+made it: this app's workers, its Writer thread, server.py or a script in
+another process. ChangeBus reads the events after the last id it has
+seen and hands them to its subscribers as a Changes. When nothing
+changed a poll is a single primary key lookup, so the app polls on a
+timer for other processes and again right after each of its own writes.
+
+Reading (read()) and handing out (publish()) are separate steps, so the
+app reads on a DBExecutor worker and only publishes on the Tk thread.
+A poll that adds more than RELOAD_ROWS rows asks views to reload instead
+of applying the rows one by one.
+
+Subscribers turn changes into deltas with the helpers below: the ids of
+the attendance rows a table must re-read (changed_ids), or new report
+counts computed in memory (add_to_summary).
+
+    bus = ChangeBus(db.conn)
+    unsubscribe = bus.subscribe(print, ATTENDANCE_KINDS)
+    bus.poll()
+"""
+from bisect import bisect_left
+from typing import NamedTuple
+
+from analytics import session_classes
+from audit import Event, tail
+from service import StudentSummary
+
+ATTENDANCE_KINDS = ("attendance.add", "term.archive", "term.restore")
+# Events read per poll; a backlog (a big import) is handed over in parts
+POLL_LIMIT = 50
+# Added rows in one poll beyond which views reload rather than apply them
+RELOAD_ROWS = 1000
+
+
+class Changes(NamedTuple):
+    """What one poll read, ready to apply without touching the database."""
+    events: list[Event]
+    # Attendance rows added (added_rows) and the class of each of their
+    # sessions (analytics.session_classes)
+    rows: list
+    classes: dict
+    # Too much changed (a big import): reload instead of applying deltas;
+    # events and rows are empty then
+    reload: bool = False
+
+
+def latest_id(conn):
+    """The id of the newest event, 0 if there is none."""
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+
+class ChangeBus:
+    """In-process publish/subscribe over the audit log.
+
+    ``subscribe(callback, kinds)`` calls ``callback(changes)`` with each
+    Changes holding new events of those kinds (every kind by default),
+    and with every reload; it returns a function that unsubscribes.
+    ``poll()`` reads and publishes what was committed since the last
+    poll. Only read() may run on another thread (with its own
+    connection); publish, poll and subscribe from one thread (the Tk
+    thread in the app).
+    """
+
+    def __init__(self, conn, after=None, limit=POLL_LIMIT, reload_rows=RELOAD_ROWS):
+        self.conn = conn
+        self.limit = limit
+        self.reload_rows = reload_rows
+        # Only what happens from now on
+        self.last_id = latest_id(conn) if after is None else after
+        self._subscribers = []
+
+    def subscribe(self, callback, kinds=None):
+        entry = (callback, frozenset(kinds) if kinds else None)
+        self._subscribers.append(entry)
+
+        def unsubscribe():
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+
+        return unsubscribe
+
+    def read(self, conn, after=None):
+        """``(changes, last_id, more)`` for the events after ``after``.
+
+        ``after`` defaults to the last id published. Pass the result to
+        publish(); ``more`` is True if more events are waiting.
+        """
+        after = self.last_id if after is None else after
+        events = tail(conn, after, self.limit)
+        rows = added_rows(events)
+        if len(rows) > self.reload_rows:
+            # A reload reads everything anyway: skip the rest of a backlog
+            return Changes([], [], {}, reload=True), latest_id(conn), False
+        last_id = events[-1].id if events else after
+        classes = session_classes(conn, [r[5] for r in rows])
+        return Changes(events, rows, classes), last_id, len(events) == self.limit
+
+    def publish(self, changes, last_id):
+        self.last_id = last_id
+        # A callback may unsubscribe while we loop
+        for callback, kinds in list(self._subscribers):
+            mine = changes
+            if kinds is not None and not changes.reload:
+                mine = changes._replace(
+                    events=[e for e in changes.events if e.kind in kinds]
+                )
+            if mine.reload or mine.events:
+                callback(mine)
+
+    def poll(self):
+        """Publish the events committed since the last poll.
+
+        Returns True if more are waiting (poll again soon).
+        """
+        changes, last_id, more = self.read(self.conn)
+        self.publish(changes, last_id)
+        return more
+
+
+# =================== DELTAS ===================
+def added_rows(events):
+    """The attendance rows added by ``attendance.add`` and ``term.restore``.
+
+    Rows are ``[id, student_id, student_name, ts, status, session_id]``.
+    """
+    return [
+        row
+        for e in events
+        if e.kind in ("attendance.add", "term.restore")
+        for row in e.data["rows"]
+    ]
+
+
+def changed_ids(events, shown, all_terms=False):
+    """Ids of the attendance rows a table showing ``shown`` should re-read.
+
+    Added rows by id. An archive names no ids: the shown rows it may
+    have moved (up to its ``last_id``) are re-read instead. A table
+    reading every term (``all_terms``) ignores archives and restores,
+    which only move rows between terms.
+    """
+    ids = set()
+    for e in events:
+        if e.kind == "attendance.add":
+            ids.update(row[0] for row in e.data["rows"])
+        elif all_terms:
+            continue
+        elif e.kind == "term.restore":
+            ids.update(row[0] for row in e.data["rows"])
+        elif e.kind == "term.archive" and e.data["last_id"] is not None:
+            ids.update(i for i in shown if i <= e.data["last_id"])
+    return ids
+
+
+def add_to_summary(summary, rows):
+    """``summary`` (StudentSummary rows by student_id) with ``rows`` counted in.
+
+    Returns a new list; students seen for the first time are inserted in
+    order.
+    """
+    summary = list(summary)
+    codes = [s.student_id for s in summary]
+    for _, code, name, _, status, _ in rows:
+        i = bisect_left(codes, code)
+        if i == len(codes) or codes[i] != code:
+            codes.insert(i, code)
+            summary.insert(i, StudentSummary(code, name, 0, 0, 0, 0))
+        s = summary[i]
+        summary[i] = s._replace(
+            total=s.total + 1,
+            present=s.present + (status == "Present"),
+            absent=s.absent + (status == "Absent"),
+            late=s.late + (status == "Late"),
+        )
+    return summary
@@ -0,0 +1,1413 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+
+DB_FILE = "attendance_gui.db"
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+STATUSES = ("Present", "Absent", "Late")
+
+# PRAGMAs applied to every connection we open
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Storage profiles: journal mode, fsync policy and memory per connection.
+# In WAL mode readers keep reading the last commit while a write is in
+# progress; with synchronous = FULL every commit is on disk when COMMIT
+# returns, with NORMAL the last commits can be lost (never corrupted) on
+# power failure. cache_size < 0 is in KiB. WAL needs memory shared by
+# every process using the file, so it only works when they all run on
+# the machine that has the disk: never use it for a database on a
+# network drive. That is why it is opt-in (--profile wal).
+STORAGE_PROFILES = {
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -32_000,
+        "mmap_size": 256 * 1024 * 1024,
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32_000,
+        "mmap_size": 256 * 1024 * 1024,
+    },
+    # SQLite's defaults, as the app ran before profiles existed
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2_000,
+        "mmap_size": 0,
+    },
+}
+DEFAULT_PROFILE = "legacy"
+
+
+def connect(path=DB_FILE, check_same_thread=True, profile=DEFAULT_PROFILE):
+    """Open a connection with the app's PRAGMAs and a storage profile.
+
+    Connections run in autocommit mode; writes are grouped with
+    ``transaction()`` (or an explicit BEGIN) instead of the implicit
+    transactions of the sqlite3 module.
+    """
+    conn = sqlite3.connect(
+        path, isolation_level=None, check_same_thread=check_same_thread
+    )
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    apply_profile(conn, profile)
+    return conn
+
+
+def apply_profile(conn, profile):
+    """Apply the per-connection settings of one of STORAGE_PROFILES.
+
+    The journal mode is not among them: it is stored in the database
+    file and set once, by init_db (apply_journal_mode).
+    """
+    settings = STORAGE_PROFILES[profile]
+    for name in ("synchronous", "cache_size", "mmap_size"):
+        conn.execute(f"PRAGMA {name} = {settings[name]}")
+
+
+def apply_journal_mode(conn, profile):
+    """Switch the database file to the journal mode of ``profile``.
+
+    A no-op when the file is already in that mode. Leaving WAL needs the
+    file to itself: while another process has it open the mode stays as
+    it is. Returns the mode in effect.
+    """
+    mode = STORAGE_PROFILES[profile]["journal_mode"]
+    try:
+        return conn.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+
+@contextmanager
+def transaction(conn):
+    """Run a block in one transaction; commit on success, roll back on error."""
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        yield c
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+# =================== DATABASE SETUP ===================
+def init_db(conn=None, profile=None):
+    """Create and migrate the schema.
+
+    With ``profile``, also switch the file to that profile's journal
+    mode. Tools that only borrow the file pass none and leave the mode
+    to the app that owns it.
+    """
+    own = conn is None
+    if own:
+        conn = connect()
+    create_tables(conn)
+    migrate(conn)
+    if profile is not None:
+        apply_journal_mode(conn, profile)
+    if own:
+        conn.close()
+
+
+def create_tables(conn):
+    """Create the version-0 schema that every migration builds on."""
+    c = conn.cursor()
+    c.execute("BEGIN")
+
+    # Bảng người dùng
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT,
+        role TEXT
+    )
+    """)
+
+    # Bảng điểm danh
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT,
+        student_name TEXT,
+        date TEXT,
+        status TEXT
+    )
+    """)
+
+    # Bảng môn học (Course)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_code TEXT,
+        course_name TEXT
+    )
+    """)
+
+    # Bảng lớp (Class)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS classes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        class_code TEXT,
+        class_name TEXT,
+        course_id INTEGER
+    )
+    """)
+
+    # Tài khoản mặc định
+    # Columns are named: later migrations add columns to users
+    for account in (
+        ("admin", "admin", "admin"),
+        ("teacher", "1234", "teacher"),
+        ("student", "0000", "student"),
+    ):
+        c.execute(
+            "INSERT OR IGNORE INTO users (username, password, role) "
+            "VALUES (?, ?, ?)",
+            account,
+        )
+
+    c.execute("COMMIT")
+
+
+# =================== MIGRATIONS ===================
+# Each migration upgrades the schema by exactly one version and runs in its
+# own transaction together with the PRAGMA user_version bump. Append new
+# migrations at the end; never edit or reorder one that has shipped.
+#
+# A migration marked ``online`` instead receives the connection and the
+# version it starts from, and manages its own (short) transactions so the
+# database stays usable while it runs. Its last transaction must re-check
+# the version and bump it.
+def _execute_script(c, script):
+    """Run ``script`` statement by statement inside the current transaction.
+
+    ``executescript`` would commit first, so migrations can't use it.
+    """
+    stmt = ""
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            c.execute(stmt)
+            stmt = ""
+
+
+def _m001_attendance_indexes(c):
+    # History filters by student and sorts by date
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attendance_student_date "
+        "ON attendance(student_id, date)"
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date)")
+
+
+def _m002_classes_course_index(c):
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_classes_course ON classes(course_id)"
+    )
+
+
+def _m003_attendance_report_index(c):
+    # Covers the per-student report so GROUP BY never touches the table
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attendance_report "
+        "ON attendance(student_id, student_name, status)"
+    )
+
+
+# Search index and summary as they were shipped for the denormalized
+# attendance table; migration 6 replaces both.
+_V4_SEARCH_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS attendance_fts_ai AFTER INSERT ON attendance BEGIN
+    INSERT INTO attendance_fts(rowid, student_id, student_name)
+    VALUES (new.id, new.student_id, new.student_name);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_fts_ad AFTER DELETE ON attendance BEGIN
+    INSERT INTO attendance_fts(attendance_fts, rowid, student_id, student_name)
+    VALUES ('delete', old.id, old.student_id, old.student_name);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_fts_au
+AFTER UPDATE OF student_id, student_name ON attendance BEGIN
+    INSERT INTO attendance_fts(attendance_fts, rowid, student_id, student_name)
+    VALUES ('delete', old.id, old.student_id, old.student_name);
+    INSERT INTO attendance_fts(rowid, student_id, student_name)
+    VALUES (new.id, new.student_id, new.student_name);
+END;
+"""
+
+_V5_SUMMARY_QUERY = """
+    SELECT student_id,
+           student_name,
+           COUNT(*) AS total,
+           SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END) AS present,
+           SUM(CASE WHEN status='Absent' THEN 1 ELSE 0 END) AS absent,
+           SUM(CASE WHEN status='Late' THEN 1 ELSE 0 END) AS late
+    FROM attendance
+    GROUP BY student_id, student_name
+"""
+
+_V5_SUMMARY_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS attendance_summary_ai AFTER INSERT ON attendance BEGIN
+    INSERT INTO attendance_summary
+        (student_id, student_name, total, present, absent, late)
+    VALUES (new.student_id, new.student_name, 1,
+            new.status = 'Present', new.status = 'Absent', new.status = 'Late')
+    ON CONFLICT (student_id, student_name) DO UPDATE SET
+        total = total + 1,
+        present = present + excluded.present,
+        absent = absent + excluded.absent,
+        late = late + excluded.late;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_summary_ad AFTER DELETE ON attendance BEGIN
+    UPDATE attendance_summary SET
+        total = total - 1,
+        present = present - (old.status = 'Present'),
+        absent = absent - (old.status = 'Absent'),
+        late = late - (old.status = 'Late')
+    WHERE student_id = old.student_id AND student_name = old.student_name;
+    DELETE FROM attendance_summary
+    WHERE student_id = old.student_id AND student_name = old.student_name
+      AND total <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_summary_au
+AFTER UPDATE OF student_id, student_name, status ON attendance BEGIN
+    UPDATE attendance_summary SET
+        total = total - 1,
+        present = present - (old.status = 'Present'),
+        absent = absent - (old.status = 'Absent'),
+        late = late - (old.status = 'Late')
+    WHERE student_id = old.student_id AND student_name = old.student_name;
+    DELETE FROM attendance_summary
+    WHERE student_id = old.student_id AND student_name = old.student_name
+      AND total <= 0;
+    INSERT INTO attendance_summary
+        (student_id, student_name, total, present, absent, late)
+    VALUES (new.student_id, new.student_name, 1,
+            new.status = 'Present', new.status = 'Absent', new.status = 'Late')
+    ON CONFLICT (student_id, student_name) DO UPDATE SET
+        total = total + 1,
+        present = present + excluded.present,
+        absent = absent + excluded.absent,
+        late = late + excluded.late;
+END;
+"""
+
+
+def _m004_attendance_search_index(c):
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS attendance_fts USING fts5(
+                student_id, student_name,
+                content='attendance', content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        return
+    _execute_script(c, _V4_SEARCH_TRIGGERS)
+    c.execute("INSERT INTO attendance_fts(attendance_fts) VALUES ('rebuild')")
+
+
+def _m005_attendance_summary(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_summary (
+            student_id TEXT,
+            student_name TEXT,
+            total INTEGER NOT NULL DEFAULT 0,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            late INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, student_name)
+        )
+    """)
+    _execute_script(c, _V5_SUMMARY_TRIGGERS)
+    c.execute("DELETE FROM attendance_summary")
+    c.execute(f"INSERT INTO attendance_summary {_V5_SUMMARY_QUERY}")
+
+
+# Schema 6 as shipped: students are stored once and attendance rows
+# point at them by integer key; a roll call opens a session, optionally
+# tied to a class. The ``attendance`` view keeps the old column layout.
+_V6_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    student_code TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    class_id INTEGER REFERENCES classes(id) ON DELETE SET NULL,
+    started_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attendance_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_ref INTEGER NOT NULL REFERENCES students(id),
+    session_id INTEGER REFERENCES sessions(id) ON DELETE SET NULL,
+    date TEXT NOT NULL,
+    status TEXT
+);
+-- status is included so the per-student GROUP BY is index-only
+CREATE INDEX IF NOT EXISTS idx_records_student_date
+    ON attendance_records(student_ref, date, status);
+CREATE INDEX IF NOT EXISTS idx_records_date ON attendance_records(date);
+CREATE INDEX IF NOT EXISTS idx_records_session ON attendance_records(session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_class ON sessions(class_id);
+"""
+
+_V6_ATTENDANCE_VIEW = """
+CREATE VIEW IF NOT EXISTS attendance AS
+    SELECT r.id, s.student_code AS student_id, s.name AS student_name,
+           r.date, r.status, r.student_ref, r.session_id
+    FROM attendance_records r JOIN students s ON s.id = r.student_ref;
+CREATE TRIGGER IF NOT EXISTS attendance_view_ai
+INSTEAD OF INSERT ON attendance BEGIN
+    INSERT INTO students (student_code, name)
+    VALUES (coalesce(new.student_id, ''), coalesce(new.student_name, ''))
+    ON CONFLICT (student_code) DO NOTHING;
+    INSERT INTO attendance_records (id, student_ref, session_id, date, status)
+    VALUES (new.id,
+            (SELECT id FROM students
+             WHERE student_code = coalesce(new.student_id, '')),
+            new.session_id, coalesce(new.date, ''), new.status);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_view_au
+INSTEAD OF UPDATE OF date, status ON attendance BEGIN
+    UPDATE attendance_records SET date = new.date, status = new.status
+    WHERE id = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_view_ad
+INSTEAD OF DELETE ON attendance BEGIN
+    DELETE FROM attendance_records WHERE id = old.id;
+END;
+"""
+
+# While migration 6 copies rows, these keep attendance_records in step
+# with writes that still go to the old table
+_V6_MIRROR_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS attendance_mirror_ai AFTER INSERT ON attendance BEGIN
+    INSERT INTO students (student_code, name)
+    VALUES (coalesce(new.student_id, ''), coalesce(new.student_name, ''))
+    ON CONFLICT (student_code) DO NOTHING;
+    INSERT OR REPLACE INTO attendance_records (id, student_ref, date, status)
+    VALUES (new.id,
+            (SELECT id FROM students
+             WHERE student_code = coalesce(new.student_id, '')),
+            coalesce(new.date, ''), new.status);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_mirror_au AFTER UPDATE ON attendance BEGIN
+    DELETE FROM attendance_records WHERE id = old.id;
+    INSERT INTO students (student_code, name)
+    VALUES (coalesce(new.student_id, ''), coalesce(new.student_name, ''))
+    ON CONFLICT (student_code) DO NOTHING;
+    INSERT OR REPLACE INTO attendance_records (id, student_ref, date, status)
+    VALUES (new.id,
+            (SELECT id FROM students
+             WHERE student_code = coalesce(new.student_id, '')),
+            coalesce(new.date, ''), new.status);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_mirror_ad AFTER DELETE ON attendance BEGIN
+    DELETE FROM attendance_records WHERE id = old.id;
+END;
+"""
+
+BACKFILL_BATCH = 20_000
+
+
+def _m006_normalize_students(conn, version):
+    """Move attendance into students / sessions / attendance_records.
+
+    1. Create the new tables and mirror every write on the old table.
+    2. Copy existing rows in id-range batches, one short transaction each.
+    3. Swap: drop the old table and put the ``attendance`` view in its place.
+
+    Readers and writers are only blocked for one batch at a time and for
+    the final swap.
+    """
+    with transaction(conn) as c:
+        if schema_version(conn) != version:
+            return
+        _execute_script(c, _V6_SCHEMA)
+        _execute_script(c, _V6_MIRROR_TRIGGERS)
+    last_id = conn.execute("SELECT max(id) FROM attendance").fetchone()[0] or 0
+
+    for lo in range(0, last_id, BACKFILL_BATCH):
+        hi = lo + BACKFILL_BATCH
+        with transaction(conn) as c:
+            # ORDER BY id: the first name seen for a student ID wins
+            c.execute(
+                "INSERT OR IGNORE INTO students (student_code, name) "
+                "SELECT coalesce(student_id, ''), coalesce(student_name, '') "
+                "FROM attendance WHERE id > ? AND id <= ? ORDER BY id",
+                (lo, hi),
+            )
+            c.execute(
+                "INSERT OR IGNORE INTO attendance_records "
+                "(id, student_ref, date, status) "
+                "SELECT a.id, s.id, coalesce(a.date, ''), a.status "
+                "FROM attendance a "
+                "JOIN students s ON s.student_code = coalesce(a.student_id, '') "
+                "WHERE a.id > ? AND a.id <= ?",
+                (lo, hi),
+            )
+
+    with transaction(conn) as c:
+        if schema_version(conn) != version:
+            return
+        seq = c.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'attendance'"
+        ).fetchone()
+        # Dropping the table also drops its indexes and triggers
+        c.execute("DROP TABLE IF EXISTS attendance_fts")
+        c.execute("DROP TABLE attendance")
+        c.execute("DROP TABLE IF EXISTS attendance_summary")
+        if seq:
+            # Never hand out an id the old table already used
+            c.execute(
+                "UPDATE sqlite_sequence SET seq = max(seq, ?) "
+                "WHERE name = 'attendance_records'",
+                (seq[0],),
+            )
+            if not c.rowcount:
+                c.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) "
+                    "VALUES ('attendance_records', ?)",
+                    (seq[0],),
+                )
+        _execute_script(c, _V6_ATTENDANCE_VIEW)
+        create_search_index(c)
+        create_summary(c)
+        c.execute(f"PRAGMA user_version = {version + 1}")
+
+
+_m006_normalize_students.online = True
+
+
+def _m007_epoch_timestamps(c):
+    # The view reads r.date, so it goes first; the text columns are
+    # dropped once their values are copied
+    c.execute("DROP VIEW IF EXISTS attendance")
+    c.execute("DROP INDEX IF EXISTS idx_records_student_date")
+    c.execute("DROP INDEX IF EXISTS idx_records_date")
+    c.execute("ALTER TABLE attendance_records ADD COLUMN ts INTEGER")
+    c.execute(
+        "UPDATE attendance_records SET ts = CAST(strftime('%s', date) AS INTEGER)"
+    )
+    c.execute("ALTER TABLE attendance_records DROP COLUMN date")
+    c.execute(
+        "ALTER TABLE sessions ADD COLUMN started_ts INTEGER NOT NULL DEFAULT 0"
+    )
+    c.execute(
+        "UPDATE sessions SET "
+        "started_ts = coalesce(CAST(strftime('%s', started_at) AS INTEGER), 0)"
+    )
+    c.execute("ALTER TABLE sessions DROP COLUMN started_at")
+    _execute_script(c, TIMESTAMP_INDEXES)
+    _execute_script(c, ATTENDANCE_VIEW)
+
+
+def _m008_hash_passwords(c):
+    # Accounts that never log in again would otherwise keep a plaintext
+    # password until they do
+    for username, password in c.execute(
+        "SELECT username, password FROM users"
+    ).fetchall():
+        if password is not None and not _is_hashed(password):
+            c.execute(
+                "UPDATE users SET password=? WHERE username=?",
+                (hash_password(password), username),
+            )
+
+
+def _m009_incremental_vacuum(conn, version):
+    # Lets maintenance hand free pages back to the OS a few at a time.
+    # auto_vacuum only changes with a VACUUM, which can't run inside a
+    # transaction, hence online
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    with transaction(conn) as c:
+        if schema_version(conn) == version:
+            c.execute(f"PRAGMA user_version = {version + 1}")
+
+
+_m009_incremental_vacuum.online = True
+
+
+def _m010_user_student_link(c):
+    # Student accounts see only the attendance of the student they are
+    # linked to; NULL means not linked yet
+    c.execute("ALTER TABLE users ADD COLUMN student_id TEXT")
+
+
+def _m011_archives(c):
+    # Closed terms moved out to their own database files (archive.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archives (
+            term TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            start_ts INTEGER,
+            end_ts INTEGER,
+            rows INTEGER NOT NULL,
+            archived_ts INTEGER NOT NULL
+        )
+    """)
+
+
+def _m012_events(c):
+    _execute_script(c, EVENTS_SCHEMA)
+    # The rows that predate the log, so a replay starts from the same place
+    rows = c.execute(
+        "SELECT id, student_id, student_name, ts, status, session_id "
+        "FROM attendance ORDER BY id"
+    )
+    while True:
+        chunk = rows.fetchmany(INSERT_CHUNK)
+        if not chunk:
+            break
+        log_event(c, None, "attendance.add", {"rows": [list(r) for r in chunk]})
+
+
+def _m013_link_student_accounts(c):
+    # Accounts from before _m010 were left unlinked and saw no attendance.
+    # Link those named after a student code; the rest wait for an admin.
+    c.execute("""
+        UPDATE users SET student_id = username
+        WHERE role = 'student' AND student_id IS NULL
+          AND username IN (SELECT student_code FROM students)
+    """)
+
+
+def _m014_hash_remaining_passwords(c):
+    # For a while _m008 shipped as a no-op; files upgraded then still
+    # hold plaintext passwords. Same as _m008, so every file ends up alike.
+    for username, password in c.execute(
+        "SELECT username, password FROM users"
+    ).fetchall():
+        if password is not None and not _is_hashed(password):
+            c.execute(
+                "UPDATE users SET password=? WHERE username=?",
+                (hash_password(password), username),
+            )
+
+
+MIGRATIONS = [
+    _m001_attendance_indexes,
+    _m002_classes_course_index,
+    _m003_attendance_report_index,
+    _m004_attendance_search_index,
+    _m005_attendance_summary,
+    _m006_normalize_students,
+    _m007_epoch_timestamps,
+    _m008_hash_passwords,
+    _m009_incremental_vacuum,
+    _m010_user_student_link,
+    _m011_archives,
+    _m012_events,
+    _m013_link_student_accounts,
+    _m014_hash_remaining_passwords,
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn):
+    """How many migrations init_db would still apply (all on a new file)."""
+    return max(0, len(MIGRATIONS) - schema_version(conn))
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations up to ``target`` (default: latest).
+
+    The version is re-read inside each write transaction, so two processes
+    starting at once never run the same migration twice.
+    """
+    target = len(MIGRATIONS) if target is None else target
+    c = conn.cursor()
+    while True:
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            step = MIGRATIONS[version] if version < target else None
+            online = getattr(step, "online", False)
+            if step is not None and not online:
+                step(c)
+                c.execute(f"PRAGMA user_version = {version + 1}")
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        c.execute("COMMIT")
+        if step is None:
+            return version
+        if online:
+            step(conn, version)
+
+
+# =================== NORMALIZED SCHEMA ===================
+# Students are stored once and attendance rows point at them by integer
+# key; a roll call opens a session, optionally tied to a class. Times are
+# stored as integer seconds (``attendance_records.ts``,
+# ``sessions.started_ts``). The ``attendance`` view keeps the old column
+# layout, with ``date`` rendered as text, for reads and for writers that
+# still insert, update or delete through it. Filter and sort on ``ts``:
+# ``date`` is computed and can't use an index.
+TIMESTAMP_INDEXES = """
+-- status is included so the per-student GROUP BY is index-only
+CREATE INDEX IF NOT EXISTS idx_records_student_ts
+    ON attendance_records(student_ref, ts, status);
+CREATE INDEX IF NOT EXISTS idx_records_ts ON attendance_records(ts);
+"""
+
+ATTENDANCE_VIEW = """
+CREATE VIEW IF NOT EXISTS attendance AS
+    SELECT r.id, s.student_code AS student_id, s.name AS student_name,
+           strftime('%Y-%m-%d %H:%M', r.ts, 'unixepoch') AS date,
+           r.status, r.student_ref, r.session_id, r.ts
+    FROM attendance_records r JOIN students s ON s.id = r.student_ref;
+CREATE TRIGGER IF NOT EXISTS attendance_view_ai
+INSTEAD OF INSERT ON attendance BEGIN
+    INSERT INTO students (student_code, name)
+    VALUES (coalesce(new.student_id, ''), coalesce(new.student_name, ''))
+    ON CONFLICT (student_code) DO NOTHING;
+    INSERT INTO attendance_records (id, student_ref, session_id, ts, status)
+    VALUES (new.id,
+            (SELECT id FROM students
+             WHERE student_code = coalesce(new.student_id, '')),
+            new.session_id,
+            coalesce(new.ts, CAST(strftime('%s', new.date) AS INTEGER)),
+            new.status);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_view_au
+INSTEAD OF UPDATE OF date, ts, status ON attendance BEGIN
+    UPDATE attendance_records SET
+        ts = CASE WHEN new.date IS NOT old.date
+                  THEN CAST(strftime('%s', new.date) AS INTEGER)
+                  ELSE new.ts END,
+        status = new.status
+    WHERE id = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_view_ad
+INSTEAD OF DELETE ON attendance BEGIN
+    DELETE FROM attendance_records WHERE id = old.id;
+END;
+"""
+
+
+# =================== DATES ===================
+# Stamps are wall-clock times without a time zone. They are stored as the
+# seconds SQLite's strftime('%s', ...) gives for the same text, so both
+# sides convert identically.
+DAY = 86400
+
+
+@lru_cache(maxsize=4096)
+def to_epoch(text, fmt=DATE_FORMAT):
+    """Seconds for a ``DATE_FORMAT`` stamp (or ``fmt``)."""
+    stamp = datetime.strptime(text, fmt).replace(tzinfo=timezone.utc)
+    return int(stamp.timestamp())
+
+
+def from_epoch(ts, fmt=DATE_FORMAT):
+    return (datetime(1970, 1, 1) + timedelta(seconds=ts)).strftime(fmt)
+
+
+def _epoch(stamp):
+    return stamp if isinstance(stamp, int) else to_epoch(stamp)
+
+
+def day_range(first="", last=""):
+    """``(start, end)`` seconds covering the days ``first``..``last``.
+
+    Days are ``YYYY-MM-DD``; both ends are inclusive and either may be
+    empty for an open range (None). Raises ValueError on a malformed day.
+    """
+    start = to_epoch(first, "%Y-%m-%d") if first else None
+    end = to_epoch(last, "%Y-%m-%d") + DAY if last else None
+    return start, end
+
+
+def attendance_range_clause(start=None, end=None, class_id=None, status=None):
+    """WHERE clause over the ``attendance`` view for the range filters.
+
+    ``start`` is inclusive and ``end`` exclusive, both in seconds (see
+    ``day_range``); ``class_id`` matches the class of the roll call
+    session. Combine with ``attendance_search_clause`` using AND.
+    """
+    where = ["1=1"]
+    params = []
+    if start is not None:
+        where.append("ts >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("ts < ?")
+        params.append(end)
+    if class_id is not None:
+        where.append("session_id IN (SELECT id FROM sessions WHERE class_id = ?)")
+        params.append(class_id)
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    return " AND ".join(where), params
+
+
+def query_attendance(conn, start=None, end=None, class_id=None, status=None,
+                     limit=1000, scope=None, source="attendance"):
+    """Attendance rows in a date range, newest first.
+
+    Returns ``(id, student_id, student_name, date, status)`` tuples; the
+    range is answered from idx_records_ts. ``scope`` is an
+    ``attendance_scope_clause`` result; ``source`` may name another view
+    with the same columns (archive.ALL_VIEW).
+    """
+    where, params = attendance_range_clause(start, end, class_id, status)
+    scope_where, scope_params = scope or ("1=1", [])
+    return conn.execute(
+        f"SELECT id, student_id, student_name, date, status FROM {source} "
+        f"WHERE {scope_where} AND {where} ORDER BY ts DESC, id DESC LIMIT ?",
+        (*scope_params, *params, limit),
+    ).fetchall()
+
+
+# =================== ROLE SCOPE ===================
+def attendance_scope_clause(role, student_id=None):
+    """WHERE clause over the ``attendance`` view for what ``role`` may see.
+
+    Teachers and admins see every row. A student sees only the rows of
+    the student linked to the account (``users.student_id``): the code is
+    looked up in the students key and the rows read through
+    idx_records_student_ts. A plain comparison, so SQLite also pushes it
+    into each term of archive.ALL_VIEW. An account that is not linked
+    sees nothing. AND it into every attendance query a student can run.
+    """
+    if role != "student":
+        return "1=1", []
+    if not student_id:
+        return "0", []
+    return "student_id = ?", [student_id]
+
+
+# =================== STUDENT SEARCH INDEX ===================
+# Trigram FTS5 shadow of students(student_code, name). Substring searches
+# of three or more characters find the matching students in the index and
+# then their attendance rows through idx_records_student_date, instead of
+# a leading-wildcard LIKE that scans every attendance row.
+SEARCH_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+    INSERT INTO students_fts(rowid, student_code, name)
+    VALUES (new.id, new.student_code, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+    INSERT INTO students_fts(students_fts, rowid, student_code, name)
+    VALUES ('delete', old.id, old.student_code, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS students_fts_au
+AFTER UPDATE OF student_code, name ON students BEGIN
+    INSERT INTO students_fts(students_fts, rowid, student_code, name)
+    VALUES ('delete', old.id, old.student_code, old.name);
+    INSERT INTO students_fts(rowid, student_code, name)
+    VALUES (new.id, new.student_code, new.name);
+END;
+"""
+
+# The trigram tokenizer ignores shorter search terms
+MIN_SEARCH_TERM = 3
+
+# History filter field -> students_fts column
+_SEARCH_COLUMNS = {"student_id": "student_code", "student_name": "name"}
+
+
+def has_search_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='students_fts'"
+    ).fetchone() is not None
+
+
+def create_search_index(c):
+    """Create the FTS table and its triggers, then index existing students.
+
+    SQLite builds without FTS5 (or without the trigram tokenizer) are left
+    without an index; searches then fall back to LIKE.
+    """
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+                student_code, name,
+                content='students', content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        return False
+    _execute_script(c, SEARCH_TRIGGERS)
+    c.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+    return True
+
+
+def rebuild_search_index(conn):
+    """(Re)build the search index for an existing database."""
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        ok = create_search_index(c)
+    except BaseException:
+        c.execute("ROLLBACK")
+        raise
+    c.execute("COMMIT")
+    return ok
+
+
+def _fts_phrase(column, term):
+    return f'{column} : "{term.replace(chr(34), chr(34) * 2)}"'
+
+
+def attendance_search_clause(student_id="", student_name="", use_index=True):
+    """WHERE clause over the ``attendance`` view for the history filters.
+
+    Pass ``use_index=has_search_index(conn)`` for databases that may lack
+    the FTS table.
+    """
+    where = ["1=1"]
+    params = []
+    fts_terms = []
+    for column, term in (("student_id", student_id), ("student_name", student_name)):
+        if not term:
+            continue
+        if use_index and len(term) >= MIN_SEARCH_TERM:
+            fts_terms.append(_fts_phrase(_SEARCH_COLUMNS[column], term))
+        else:
+            where.append(f"{column} LIKE ?")
+            params.append(f"%{term}%")
+    if fts_terms:
+        where.append(
+            "student_ref IN "
+            "(SELECT rowid FROM students_fts WHERE students_fts MATCH ?)"
+        )
+        params.append(" AND ".join(fts_terms))
+    return " AND ".join(where), params
+
+
+# =================== REPORT SUMMARY ===================
+# attendance_summary holds the per-student counts shown by the report
+# window, keyed by student. Triggers on attendance_records keep it current
+# on every write, so the report never has to aggregate the whole table.
+SUMMARY_QUERY = """
+    SELECT student_ref,
+           COUNT(*) AS total,
+           SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END) AS present,
+           SUM(CASE WHEN status='Absent' THEN 1 ELSE 0 END) AS absent,
+           SUM(CASE WHEN status='Late' THEN 1 ELSE 0 END) AS late
+    FROM attendance_records
+    GROUP BY student_ref
+"""
+
+SUMMARY_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS attendance_summary_ai
+AFTER INSERT ON attendance_records BEGIN
+    INSERT INTO attendance_summary (student_ref, total, present, absent, late)
+    VALUES (new.student_ref, 1,
+            new.status = 'Present', new.status = 'Absent', new.status = 'Late')
+    ON CONFLICT (student_ref) DO UPDATE SET
+        total = total + 1,
+        present = present + excluded.present,
+        absent = absent + excluded.absent,
+        late = late + excluded.late;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_summary_ad
+AFTER DELETE ON attendance_records BEGIN
+    UPDATE attendance_summary SET
+        total = total - 1,
+        present = present - (old.status = 'Present'),
+        absent = absent - (old.status = 'Absent'),
+        late = late - (old.status = 'Late')
+    WHERE student_ref = old.student_ref;
+    DELETE FROM attendance_summary
+    WHERE student_ref = old.student_ref AND total <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_summary_au
+AFTER UPDATE OF student_ref, status ON attendance_records BEGIN
+    UPDATE attendance_summary SET
+        total = total - 1,
+        present = present - (old.status = 'Present'),
+        absent = absent - (old.status = 'Absent'),
+        late = late - (old.status = 'Late')
+    WHERE student_ref = old.student_ref;
+    DELETE FROM attendance_summary
+    WHERE student_ref = old.student_ref AND total <= 0;
+    INSERT INTO attendance_summary (student_ref, total, present, absent, late)
+    VALUES (new.student_ref, 1,
+            new.status = 'Present', new.status = 'Absent', new.status = 'Late')
+    ON CONFLICT (student_ref) DO UPDATE SET
+        total = total + 1,
+        present = present + excluded.present,
+        absent = absent + excluded.absent,
+        late = late + excluded.late;
+END;
+"""
+
+# Columns of the report, as shown and exported
+SUMMARY_COLUMNS = ("student_id", "student_name", "total", "present", "absent", "late")
+
+REPORT_QUERY = """
+    SELECT s.student_code AS student_id, s.name AS student_name,
+           m.total, m.present, m.absent, m.late
+    FROM attendance_summary m JOIN students s ON s.id = m.student_ref
+    ORDER BY s.student_code
+"""
+
+_SUMMARY_KEYED = "student_ref, total, present, absent, late"
+
+
+def create_summary(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_summary (
+            student_ref INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            late INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    _execute_script(c, SUMMARY_TRIGGERS)
+    c.execute("DELETE FROM attendance_summary")
+    c.execute(f"INSERT INTO attendance_summary {SUMMARY_QUERY}")
+
+
+def check_summary(conn, repair=False):
+    """Recompute the summary from attendance and diff it with the stored one.
+
+    Returns a list of ``(student_id, student_name, stored, expected)``
+    tuples, where ``stored``/``expected`` are ``(total, present, absent,
+    late)`` or None when the row is missing. With ``repair=True`` the
+    stored table is replaced by the recomputed one in the same transaction.
+    """
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("DROP TABLE IF EXISTS temp.expected_summary")
+        c.execute(f"CREATE TEMP TABLE expected_summary AS {SUMMARY_QUERY}")
+        cols = _SUMMARY_KEYED
+        stored = {
+            r[0]: r[1:]
+            for r in c.execute(
+                f"SELECT {cols} FROM attendance_summary "
+                f"EXCEPT SELECT {cols} FROM temp.expected_summary"
+            )
+        }
+        expected = {
+            r[0]: r[1:]
+            for r in c.execute(
+                f"SELECT {cols} FROM temp.expected_summary "
+                f"EXCEPT SELECT {cols} FROM attendance_summary"
+            )
+        }
+        diffs = []
+        for ref in sorted(stored.keys() | expected.keys()):
+            student = c.execute(
+                "SELECT student_code, name FROM students WHERE id = ?", (ref,)
+            ).fetchone() or (None, None)
+            diffs.append((*student, stored.get(ref), expected.get(ref)))
+        if repair and diffs:
+            c.execute("DELETE FROM attendance_summary")
+            c.execute(
+                f"INSERT INTO attendance_summary ({cols}) "
+                f"SELECT {cols} FROM temp.expected_summary"
+            )
+        c.execute("DROP TABLE temp.expected_summary")
+    except BaseException:
+        c.execute("ROLLBACK")
+        raise
+    c.execute("COMMIT")
+    return diffs
+
+
+# =================== ATTENDANCE WRITES ===================
+# A new student ID is added to students on first sight; an existing one
+# keeps the name it was first recorded with
+UPSERT_STUDENT = (
+    "INSERT INTO students (student_code, name) VALUES (?, ?) "
+    "ON CONFLICT (student_code) DO NOTHING"
+)
+INSERT_RECORD = (
+    "INSERT INTO attendance_records (student_ref, session_id, ts, status) "
+    "VALUES ((SELECT id FROM students WHERE student_code = ?), ?, ?, ?)"
+)
+INSERT_CHUNK = 1000
+
+
+def now_stamp():
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def insert_attendance(c, rows, session_id=None, actor=None):
+    """Insert ``(student_id, student_name, date, status)`` rows.
+
+    ``date`` is a ``DATE_FORMAT`` stamp or epoch seconds. Runs inside the
+    caller's transaction; ``rows`` may be any iterable and is consumed in
+    chunks. Each chunk is logged as one ``attendance.add`` event by
+    ``actor``. Returns the number of rows.
+    """
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(islice(rows, INSERT_CHUNK))
+        if not chunk:
+            return count
+        records = [(r[0], session_id, _epoch(r[2]), r[3]) for r in chunk]
+        # AUTOINCREMENT hands out seq + 1, seq + 2, ... and nobody else can
+        # insert while this transaction holds the write lock
+        seq = c.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name='attendance_records'"
+        ).fetchone()
+        first = (seq[0] if seq else 0) + 1
+        c.executemany(UPSERT_STUDENT, [(r[0], r[1]) for r in chunk])
+        c.executemany(INSERT_RECORD, records)
+        log_event(c, actor, "attendance.add", {"rows": [
+            [first + i, sid, r[1], ts, status, session_id]
+            for i, (r, (sid, _, ts, status)) in enumerate(zip(chunk, records))
+        ]})
+        count += len(chunk)
+
+
+def open_session(c, started_at=None, class_id=None):
+    """Create a class session and return its id."""
+    c.execute(
+        "INSERT INTO sessions (class_id, started_ts) VALUES (?, ?)",
+        (class_id, _epoch(started_at or now_stamp())),
+    )
+    return c.lastrowid
+
+
+def record_roll_call(conn, statuses, date=None, class_id=None, actor=None):
+    """Save a whole roll call as one session, in one transaction.
+
+    ``statuses`` is an iterable of ``(student_id, student_name, status)``;
+    every row gets the same timestamp. This is the scriptable counterpart
+    of the Roll Call window.
+    """
+    date = date or now_stamp()
+    with transaction(conn) as c:
+        session_id = open_session(c, date, class_id)
+        return insert_attendance(
+            c,
+            ((sid, name, date, status) for sid, name, status in statuses),
+            session_id,
+            actor,
+        )
+
+
+def roster(conn):
+    """Every known (student_id, student_name)."""
+    return conn.execute(
+        "SELECT student_code, name FROM students ORDER BY student_code"
+    ).fetchall()
+
+
+def class_choices(conn):
+    """``(id, label)`` for every class, for session pickers."""
+    return conn.execute(
+        "SELECT id, coalesce(class_code, '') || ' - ' || coalesce(class_name, '') "
+        "FROM classes ORDER BY class_code"
+    ).fetchall()
+
+
+# =================== AUDIT LOG ===================
+# Every mutation appends one row to ``events`` in the transaction that
+# makes it: who (``actor``, the username; None for the system), what
+# (``kind`` and compact JSON ``data``) and when (``ts``, wall-clock
+# seconds like attendance_records.ts). Attendance is logged one event per
+# insert_attendance chunk, so a group commit pays for one extra INSERT
+# however many rows it holds. Triggers keep the table append-only and
+# AUTOINCREMENT keeps ids increasing, so readers can follow it by id
+# (audit.py).
+EVENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,
+    actor TEXT,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS events_no_update BEFORE UPDATE ON events BEGIN
+    SELECT RAISE(ABORT, 'events are append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS events_no_delete BEFORE DELETE ON events BEGIN
+    SELECT RAISE(ABORT, 'events are append-only');
+END;
+"""
+
+
+def now_ts():
+    """Wall-clock seconds now, as stored in ``ts`` columns."""
+    return int((datetime.now() - datetime(1970, 1, 1)).total_seconds())
+
+
+def log_event(c, actor, kind, data):
+    """Append an event inside the caller's transaction."""
+    c.execute(
+        "INSERT INTO events (ts, actor, kind, data) VALUES (?, ?, ?, ?)",
+        (now_ts(), actor, kind,
+         json.dumps(data, ensure_ascii=False, separators=(",", ":"))),
+    )
+
+
+# =================== PASSWORDS ===================
+# Stored as "scrypt$n$r$p$salt$hash" (base64 salt and hash). n is the work
+# factor: every doubling doubles the time and memory a login costs, so
+# verification always runs on the DBExecutor, never on the Tk thread.
+# Pick it with `python benchmarks.py login`.
+PASSWORD_COST = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=2 * 128 * r * n, dklen=32,
+    )
+
+
+def _is_hashed(stored):
+    return stored.startswith("scrypt$")
+
+
+def hash_password(password, cost=PASSWORD_COST):
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, cost, SCRYPT_R, SCRYPT_P)
+    return "$".join((
+        "scrypt", str(cost), str(SCRYPT_R), str(SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode(),
+    ))
+
+
+def verify_password(password, stored):
+    """True if ``password`` matches the stored hash (or legacy plaintext)."""
+    if stored is None:
+        return False
+    if not _is_hashed(stored):
+        # create_tables still seeds the default accounts in plaintext
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored, cost=PASSWORD_COST):
+    """True if ``stored`` is plaintext or hashed with other parameters."""
+    if not _is_hashed(stored):
+        return True
+    return stored.split("$")[1:4] != [str(cost), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+def authenticate(conn, username, password, cost=PASSWORD_COST):
+    """Return the user's role, or None if the login is wrong.
+
+    A password stored with other parameters than ``cost`` is rehashed on
+    the way in. Slow by design: run it on a worker thread.
+    """
+    row = conn.execute(
+        "SELECT password, role FROM users WHERE username=?", (username,)
+    ).fetchone()
+    if row is None or not verify_password(password, row[0]):
+        return None
+    stored, role = row
+    if needs_rehash(stored, cost):
+        new = hash_password(password, cost)
+        # Only if nobody changed the password since we read it
+        with transaction(conn) as c:
+            c.execute(
+                "UPDATE users SET password=? WHERE username=? AND password=?",
+                (new, username, stored),
+            )
+    return role
+
+
+def set_password(conn, username, password, cost=PASSWORD_COST, actor=None):
+    """Hash and store a new password; False if there is no such user."""
+    new = hash_password(password, cost)
+    with transaction(conn) as c:
+        c.execute(
+            "UPDATE users SET password=? WHERE username=?", (new, username)
+        )
+        if not c.rowcount:
+            return False
+        log_event(c, actor, "user.password", {"username": username})
+        return True
+
+
+class KnownUsers:
+    """The usernames in ``users``, so an unknown name fails at once.
+
+    A login for a name that isn't here needs no worker round trip and no
+    hash. The set is reloaded when another connection has committed
+    (``PRAGMA data_version``); call ``invalidate()`` after writing users
+    on ``conn`` itself.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._names = None
+        self._version = None
+
+    def invalidate(self):
+        self._names = None
+
+    def __contains__(self, username):
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._names is None or version != self._version:
+            self._names = {
+                name for (name,) in self.conn.execute("SELECT username FROM users")
+            }
+            self._version = version
+        return username in self._names
+
+
+# =================== CONNECTION MANAGER ===================
+class Database:
+    """Shared connections to the attendance database.
+
+    The Tk thread uses one long-lived connection (``execute``, ``query``,
+    ``transaction``). Background workers borrow connections from a small
+    pool with ``pooled()`` so they never share a connection with the UI.
+    """
+
+    def __init__(self, path=DB_FILE, pool_size=2, profile=DEFAULT_PROFILE):
+        self.path = path
+        self.pool_size = pool_size
+        self.profile = profile
+        self._conn = connect(path, profile=profile)
+        self._pool = []
+        self._pool_lock = threading.Lock()
+        self._closed = False
+
+    # ---------- MAIN CONNECTION ----------
+    @property
+    def conn(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Database has been closed.")
+        return self._conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def query(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchone()
+
+    def transaction(self):
+        return transaction(self.conn)
+
+    # ---------- WORKER POOL ----------
+    @contextmanager
+    def pooled(self):
+        """Borrow a connection for use on a background thread."""
+        with self._pool_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Database has been closed.")
+            conn = self._pool.pop() if self._pool else None
+        if conn is None:
+            conn = connect(self.path, check_same_thread=False, profile=self.profile)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self._pool_lock:
+                if not self._closed and len(self._pool) < self.pool_size:
+                    self._pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    # ---------- SHUTDOWN ----------
+    def close(self):
+        with self._pool_lock:
+            if self._closed:
+                return
+            self._closed = True
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            conn.close()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =================== COMMAND LINE ===================
+def _cmd_migrate(db, args):
+    init_db(db.conn)
+    print(f"schema version {schema_version(db.conn)}")
+
+
+def _cmd_rebuild_search(db, args):
+    if rebuild_search_index(db.conn):
+        print("search index rebuilt")
+    else:
+        print("this SQLite build has no FTS5 trigram tokenizer; search uses LIKE")
+
+
+def _cmd_check_summary(db, args):
+    diffs = check_summary(db.conn, repair=args.repair)
+    for sid, name, stored, expected in diffs:
+        print(f"{sid}\t{name}\tstored={stored}\texpected={expected}")
+    state = "repaired" if args.repair else "found"
+    print(f"{len(diffs)} mismatched summary rows {state}" if diffs else "summary OK")
+    if diffs and not args.repair:
+        raise SystemExit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attendance database tools")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="apply pending schema migrations").set_defaults(
+        func=_cmd_migrate
+    )
+    sub.add_parser(
+        "rebuild-search", help="rebuild the student name/ID search index"
+    ).set_defaults(func=_cmd_rebuild_search)
+    check = sub.add_parser(
+        "check-summary", help="verify the report summary against attendance"
+    )
+    check.add_argument(
+        "--repair", action="store_true", help="rewrite mismatched summary rows"
+    )
+    check.set_defaults(func=_cmd_check_summary)
+
+    args = parser.parse_args(argv)
+    with Database(args.db) as db:
+        args.func(db, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import queue
+import threading
+
+
+class Job:
+    """A unit of database work submitted to a DBExecutor.
+
+    ``fn(conn, job)`` runs on a worker thread with that worker's own
+    connection. Long jobs may call ``job.progress(...)`` to report back to
+    the Tk thread and should stop early once ``job.cancelled`` is set.
+    """
+
+    def __init__(self, executor, fn, on_done, on_error, on_progress, key, owner):
+        self.executor = executor
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.key = key
+        self.owner = owner
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def cancel(self):
+        """Drop the job; a query already running on SQLite is interrupted."""
+        self.cancelled.set()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def progress(self, *args):
+        if self.on_progress is not None and not self.cancelled.is_set():
+            self.executor._results.put((self, "progress", args))
+
+    def _run(self, conn):
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self._conn = conn
+        try:
+            result = self.fn(conn, self)
+        except Exception as e:
+            self.executor._results.put((self, "error", e))
+        else:
+            self.executor._results.put((self, "done", result))
+        finally:
+            with self._lock:
+                self._conn = None
+
+
+class DBExecutor:
+    """Worker threads that run database jobs off the Tk main thread.
+
+    Every worker owns a pooled connection for its whole life. Results and
+    progress reports are queued and delivered on the Tk thread by polling
+    with ``root.after``, so callbacks may touch widgets freely. Submitting
+    a job with the same ``key`` as an unfinished one cancels the older job
+    (e.g. a history search that was typed over). Callbacks for a job whose
+    ``owner`` widget has been destroyed are skipped.
+    """
+
+    def __init__(self, root, db, workers=2, poll_ms=30, on_error=None):
+        self.root = root
+        self.db = db
+        self.poll_ms = poll_ms
+        self.default_on_error = on_error
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = {}
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"db-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    # ---------- SUBMIT ----------
+    def submit(self, fn, on_done=None, on_error=None, on_progress=None,
+               key=None, owner=None):
+        if self._closed:
+            raise RuntimeError("DBExecutor has been shut down.")
+        job = Job(self, fn, on_done, on_error, on_progress, key, owner)
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = job
+        self._jobs.put(job)
+        return job
+
+    def query(self, sql, params=(), prepare=None, **kwargs):
+        """Run a SELECT on a worker; ``on_done`` receives the fetched rows.
+
+        ``prepare(conn)`` runs first on the worker's connection, e.g. to
+        attach the databases the query reads.
+        """
+        def run(conn, job):
+            if prepare is not None:
+                prepare(conn)
+            return conn.execute(sql, params).fetchall()
+
+        return self.submit(run, **kwargs)
+
+    def watch(self, future, on_done=None, on_error=None, owner=None):
+        """Deliver a concurrent.futures.Future's outcome like a job's.
+
+        For work done elsewhere (the Writer's thread): no worker waits on
+        it, and ``on_done``/``on_error`` still run on the Tk thread.
+        """
+        job = Job(self, None, on_done, on_error, None, None, owner)
+
+        def finished(f):
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                self._results.put((job, "error", error))
+            else:
+                self._results.put((job, "done", f.result()))
+
+        future.add_done_callback(finished)
+        return job
+
+    # ---------- WORKERS ----------
+    def _worker(self):
+        with self.db.pooled() as conn:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                job._run(conn)
+
+    # ---------- RESULTS (Tk thread) ----------
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    job, kind, payload = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._dispatch(job, kind, payload)
+        finally:
+            # Keep polling even if a callback raised
+            if not self._closed:
+                self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def _dispatch(self, job, kind, payload):
+        if kind != "progress" and self._latest.get(job.key) is job:
+            del self._latest[job.key]
+        if job.cancelled.is_set():
+            return
+        if job.owner is not None and not job.owner.winfo_exists():
+            return
+        if kind == "progress":
+            job.on_progress(*payload)
+        elif kind == "done":
+            if job.on_done is not None:
+                job.on_done(payload)
+        else:
+            handler = job.on_error or self.default_on_error
+            if handler is None:
+                raise payload
+            handler(payload)
+
+    # ---------- SHUTDOWN ----------
+    def shutdown(self, timeout=2.0):
+        if self._closed:
+            return
+        self._closed = True
+        self.root.after_cancel(self._after_id)
+        for job in list(self._latest.values()):
+            job.cancel()
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join(timeout)
@@ -0,0 +1,203 @@
+"""Streaming export of history and report results to CSV or XLSX.
+
+The query cursor is drained with ``fetchmany`` and every chunk is written
+straight to disk, so exporting millions of rows never holds them all in
+memory. Usable from a script:
+
+    python exporter.py history out.csv --student-name "Nguyễn"
+    python exporter.py report out.xlsx
+"""
+import argparse
+import csv
+import os
+
+from archive import ALL_REPORT_QUERY, attach_archives
+from db import (
+    DB_FILE,
+    REPORT_QUERY,
+    SUMMARY_COLUMNS,
+    Database,
+    attendance_range_clause,
+    attendance_search_clause,
+    day_range,
+    has_search_index,
+    init_db,
+)
+
+HISTORY_COLUMNS = ("id", "student_id", "student_name", "date", "status")
+CHUNK_SIZE = 1000
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+# ---------- QUERIES ----------
+def history_query(conn, student_id="", student_name="", start=None, end=None,
+                  class_id=None, status=None, scope=None, source="attendance"):
+    """SQL, params and header for the history window's current filter.
+
+    ``scope`` is the ``attendance_scope_clause`` of the logged-in user;
+    ``source`` is the view to read (archive.ALL_VIEW for all terms).
+    """
+    scope_where, scope_params = scope or ("1=1", [])
+    where, params = attendance_search_clause(
+        student_id, student_name, use_index=has_search_index(conn)
+    )
+    range_where, range_params = attendance_range_clause(
+        start, end, class_id, status
+    )
+    sql = (
+        f"SELECT {', '.join(HISTORY_COLUMNS)} FROM {source} "
+        f"WHERE {scope_where} AND {where} AND {range_where} "
+        "ORDER BY ts DESC, id DESC"
+    )
+    return sql, [*scope_params, *params, *range_params], HISTORY_COLUMNS
+
+
+def report_query(conn=None, include_archives=False):
+    """SQL, params and header for the per-student report.
+
+    ``include_archives`` sums every term; it attaches the archives to
+    ``conn`` (see archive.attach_archives).
+    """
+    if include_archives:
+        attach_archives(conn)
+        return ALL_REPORT_QUERY, (), SUMMARY_COLUMNS
+    return REPORT_QUERY, (), SUMMARY_COLUMNS
+
+
+# ---------- WRITERS ----------
+class _CsvWriter:
+    def __init__(self, path, header):
+        # utf-8-sig so Excel shows Vietnamese names correctly
+        self.f = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(header)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.f.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path, header):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ImportError(
+                "Writing .xlsx files requires openpyxl (pip install openpyxl)."
+            )
+        self.path = path
+        # write-only workbooks stream rows to a temp file instead of memory
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Attendance")
+        self.ws.append(list(header))
+
+    def write(self, rows):
+        for r in rows:
+            self.ws.append(list(r))
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+def open_writer(path, header):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx":
+        return _XlsxWriter(path, header)
+    if ext == ".csv":
+        return _CsvWriter(path, header)
+    raise ValueError(f"Unsupported file type: {ext or path}")
+
+
+# ---------- EXPORT ----------
+def export_rows(rows, header, path):
+    """Write rows already in memory (e.g. an analytics view) to ``path``."""
+    writer = open_writer(path, header)
+    try:
+        writer.write(rows)
+    finally:
+        writer.close()
+    return len(rows)
+
+
+def export_query(conn, sql, params, header, path, chunk_size=CHUNK_SIZE,
+                 progress=None, cancel=None):
+    """Write the rows of ``sql`` to ``path`` (.csv or .xlsx).
+
+    ``progress(written, total)`` is called after every chunk; ``cancel`` is
+    an optional ``threading.Event``. A cancelled or failed export removes
+    the partial file. Returns the number of rows written.
+    """
+    writer = open_writer(path, header)
+    written = 0
+    try:
+        total = None
+        if progress:
+            total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+            progress(0, total)
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.write(rows)
+            written += len(rows)
+            if progress:
+                progress(written, total)
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled()
+        writer.close()
+    except BaseException:
+        try:
+            writer.close()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export attendance to CSV/XLSX")
+    parser.add_argument("what", choices=("history", "report"))
+    parser.add_argument("file")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument("--student-id", default="")
+    parser.add_argument("--student-name", default="")
+    parser.add_argument("--from", dest="first", default="", help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="last", default="", help="YYYY-MM-DD")
+    parser.add_argument("--status", default="")
+    parser.add_argument("--all-terms", action="store_true",
+                        help="include archived terms")
+    args = parser.parse_args(argv)
+
+    def show(written, total):
+        print(f"\rexported {written}/{total}", end="")
+
+    with Database(args.db) as db:
+        init_db(db.conn)
+        if args.what == "history":
+            try:
+                start, end = day_range(args.first, args.last)
+            except ValueError as e:
+                raise SystemExit(f"Export failed: {e}")
+            source = attach_archives(db.conn) if args.all_terms else "attendance"
+            query = history_query(
+                db.conn, args.student_id, args.student_name, start, end,
+                status=args.status, source=source,
+            )
+        else:
+            query = report_query(db.conn, args.all_terms)
+        try:
+            export_query(db.conn, *query, args.file, progress=show)
+        except (OSError, ValueError, ImportError) as e:
+            raise SystemExit(f"Export failed: {e}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
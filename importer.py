@@ -0,0 +1,243 @@
+"""Streaming import of attendance records from CSV and XLSX files.
+
+Rows are read one at a time, validated against the attendance schema and
+inserted in batches, each batch in its own transaction, so memory use does
+not depend on the file size. Usable from a script:
+
+    python importer.py export.csv --batch-size 5000
+"""
+import argparse
+import csv
+import os
+from datetime import date, datetime
+
+from db import (
+    DATE_FORMAT,
+    DB_FILE,
+    STATUSES,
+    Database,
+    init_db,
+    insert_attendance,
+    now_stamp,
+    transaction,
+)
+
+# Accepted header spellings, after lower-casing and turning spaces/dashes
+# into underscores
+HEADER_ALIASES = {
+    "student_id": ("student_id", "sid", "mssv", "mã_sinh_viên", "ma_sinh_vien"),
+    "student_name": (
+        "student_name", "name", "full_name", "họ_tên", "họ_và_tên", "ho_ten",
+        "ho_va_ten",
+    ),
+    "date": ("date", "datetime", "timestamp", "time"),
+    "status": ("status",),
+}
+REQUIRED = ("student_id", "student_name", "status")
+DATE_INPUT_FORMATS = (
+    DATE_FORMAT,
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+)
+MAX_ERRORS = 100
+
+
+class ImportReport:
+    """Outcome of one import; ``errors`` keeps the first MAX_ERRORS messages."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.cancelled = False
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"row {line}: {message}")
+
+
+# ---------- READERS ----------
+def _csv_rows(path):
+    size = os.path.getsize(path) or 1
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.reader(f):
+            # buffer.tell() is the read-ahead position: close enough
+            yield row, f.buffer.tell() / size
+
+
+def _xlsx_rows(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError(
+            "Reading .xlsx files requires openpyxl (pip install openpyxl)."
+        )
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        total = ws.max_row or 0
+        for n, row in enumerate(ws.iter_rows(values_only=True), 1):
+            yield row, (n / total if total else None)
+    finally:
+        wb.close()
+
+
+def open_rows(path):
+    """Yield ``(cells, fraction_done)`` for each row of a CSV or XLSX file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return _xlsx_rows(path)
+    if ext in (".csv", ".txt"):
+        return _csv_rows(path)
+    raise ValueError(f"Unsupported file type: {ext or path}")
+
+
+# ---------- VALIDATION ----------
+def map_header(header):
+    """Column index for each attendance field present in ``header``."""
+    normalized = [
+        str(h or "").strip().lower().replace(" ", "_").replace("-", "_")
+        for h in header
+    ]
+    mapping = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for i, name in enumerate(normalized):
+            if name in aliases:
+                mapping[field] = i
+                break
+    missing = [f for f in REQUIRED if f not in mapping]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return mapping
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).strftime(DATE_FORMAT)
+    text = _text(value)
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime(DATE_FORMAT)
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognised date {text!r}")
+
+
+_STATUS_LOOKUP = {s.lower(): s for s in STATUSES}
+
+
+def validate_row(cells, mapping, default_date):
+    """Return an attendance row tuple or raise ValueError."""
+
+    def cell(field):
+        i = mapping.get(field)
+        return cells[i] if i is not None and i < len(cells) else None
+
+    sid = _text(cell("student_id"))
+    name = _text(cell("student_name"))
+    if not sid or not name:
+        raise ValueError("student_id and student_name are required")
+    status = _STATUS_LOOKUP.get(_text(cell("status")).lower())
+    if status is None:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    if "date" in mapping:
+        stamp = _parse_date(cell("date"))
+    else:
+        stamp = default_date
+    return sid, name, stamp, status
+
+
+# ---------- IMPORT ----------
+def import_attendance(conn, path, batch_size=1000, progress=None, cancel=None,
+                      actor=None):
+    """Stream ``path`` into the attendance table, logged as ``actor``.
+
+    ``progress(report, fraction)`` is called after every committed batch
+    (``fraction`` may be None when the total is unknown) and ``cancel`` is
+    an optional ``threading.Event`` checked between batches. Batches that
+    were committed before a cancel or an error stay in the database.
+    """
+    report = ImportReport()
+    rows = open_rows(path)
+    default_date = now_stamp()
+    fraction = 0.0
+
+    def flush(batch):
+        if batch:
+            with transaction(conn) as c:
+                report.imported += insert_attendance(c, batch, actor=actor)
+            batch.clear()
+        if progress:
+            progress(report, fraction)
+
+    mapping = None
+    batch = []
+    try:
+        for line, (cells, fraction) in enumerate(rows, 1):
+            if mapping is None:
+                mapping = map_header(cells)
+                continue
+            if not any(_text(v) for v in cells):
+                continue
+            try:
+                batch.append(validate_row(cells, mapping, default_date))
+            except ValueError as e:
+                report.reject(line, e)
+            if len(batch) >= batch_size:
+                flush(batch)
+                if cancel is not None and cancel.is_set():
+                    report.cancelled = True
+                    break
+        else:
+            if mapping is None:
+                raise ValueError("The file is empty.")
+            fraction = 1.0
+            flush(batch)
+    finally:
+        rows.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import attendance from CSV/XLSX")
+    parser.add_argument("file")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    def show(report, fraction):
+        done = f"{fraction:6.1%}" if fraction is not None else "   ..."
+        print(
+            f"\r{done}  imported {report.imported}  rejected {report.rejected}",
+            end="",
+        )
+
+    with Database(args.db) as db:
+        init_db(db.conn)
+        try:
+            report = import_attendance(
+                db.conn, args.file, args.batch_size, progress=show
+            )
+        except (OSError, ValueError, ImportError) as e:
+            raise SystemExit(f"Import failed: {e}")
+    print()
+    for err in report.errors:
+        print(err)
+
+
+if __name__ == "__main__":
+    main()
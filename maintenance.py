@@ -0,0 +1,147 @@
+"""Scheduled database upkeep: PRAGMA optimize, incremental vacuum, ANALYZE.
+
+MaintenanceScheduler runs each task on its own interval on a background
+thread with a pooled connection. Every run is logged with its duration to
+the ``attendance.maintenance`` logger. A task can also be run once from a
+script:
+
+    python maintenance.py analyze --db attendance_gui.db
+"""
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+
+from db import DB_FILE, DEFAULT_PROFILE, STORAGE_PROFILES, Database, init_db
+
+log = logging.getLogger("attendance.maintenance")
+
+# ANALYZE looks at about this many rows per index instead of all of them,
+# so it holds the write lock for milliseconds, not seconds
+ANALYSIS_LIMIT = 1000
+# Free pages handed back per incremental vacuum, to keep each run short
+VACUUM_PAGES = 2000
+
+# Seconds between runs; None disables a task
+DEFAULT_INTERVALS = {
+    "optimize": 60 * 60,
+    "incremental_vacuum": 6 * 60 * 60,
+    "analyze": 24 * 60 * 60,
+}
+# Nothing runs in the first minute, while the app is starting up
+FIRST_DELAY = 60
+
+
+def optimize(conn):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    conn.execute("PRAGMA optimize")
+    return ""
+
+
+def incremental_vacuum(conn):
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free:
+        # Each returned row is a step; stopping early would stop the vacuum
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+    left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return f"freed {free - left} of {free} free pages"
+
+
+def analyze(conn):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    return ""
+
+
+TASKS = {
+    "optimize": optimize,
+    "incremental_vacuum": incremental_vacuum,
+    "analyze": analyze,
+}
+
+
+def run_task(conn, name):
+    """Run one task and log how long it took; returns the seconds."""
+    start = time.perf_counter()
+    try:
+        detail = TASKS[name](conn)
+    except sqlite3.Error as e:
+        log.warning("%s failed after %.1f ms: %s", name,
+                    (time.perf_counter() - start) * 1e3, e)
+        raise
+    seconds = time.perf_counter() - start
+    log.info("%s took %.1f ms%s", name, seconds * 1e3,
+             f" ({detail})" if detail else "")
+    return seconds
+
+
+class MaintenanceScheduler:
+    """Runs TASKS on ``intervals`` (seconds) until ``stop()``.
+
+    Failures are logged and the task is tried again at its next slot.
+    ``history`` holds ``(name, seconds, error)`` for every run.
+    """
+
+    def __init__(self, db, intervals=None, first_delay=FIRST_DELAY):
+        self.db = db
+        self.intervals = {
+            name: every
+            for name, every in {**DEFAULT_INTERVALS, **(intervals or {})}.items()
+            if every
+        }
+        self.first_delay = first_delay
+        self.history = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or not self.intervals:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="db-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop after the task in progress, if any; call before db.close()."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        start = time.monotonic() + self.first_delay
+        due = {name: start for name in self.intervals}
+        while True:
+            name = min(due, key=due.get)
+            if self._stop.wait(max(0.0, due[name] - time.monotonic())):
+                return
+            error = None
+            seconds = 0.0
+            try:
+                with self.db.pooled() as conn:
+                    seconds = run_task(conn, name)
+            except sqlite3.Error as e:
+                error = e
+            self.history.append((name, seconds, error))
+            due[name] = time.monotonic() + self.intervals[name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run database maintenance once")
+    parser.add_argument("task", choices=sorted(TASKS) + ["all"])
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument(
+        "--profile", default=DEFAULT_PROFILE, choices=sorted(STORAGE_PROFILES)
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    with Database(args.db, profile=args.profile) as db:
+        init_db(db.conn)
+        for name in TASKS if args.task == "all" else (args.task,):
+            run_task(db.conn, name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""HTTP/JSON API over the attendance database, for many classrooms at once.
+
+    python server.py --port 8080
+
+The Tk app serves one user on one machine; this serves every classroom
+from the same SQLite file. All writes go through one Writer (writer.py),
+the thread that owns the only write connection. Check-ins are buffered
+and written together (group commit), so a burst of check-ins costs a few
+commits instead of one each. Reads run on a small thread pool with pooled
+connections. With ``--profile wal`` readers never wait for the writer;
+use it when the database is on the server's own disk (WAL does not work
+on a network drive). Maintenance (maintenance.py) runs in the
+background.
+
+There is no authentication: keep the default localhost binding, or put an
+authenticating proxy in front.
+
+    POST   /checkin           {"student_id", "student_name", "status"}
+    GET    /history           ?from=YYYY-MM-DD&to=&class_id=&status=&limit=
+                              &archives=1 (include archived terms)
+    GET    /report            ?archives=1
+    GET    /users             POST /users {"username", "role", "password",
+                                           "student_id"}
+    DELETE /users/<username>
+    GET    /courses           POST /courses {"code", "name"}
+    DELETE /courses/<id>
+    GET    /classes           POST /classes {"code", "name", "course_id"}
+    DELETE /classes/<id>
+    GET    /stats             group commit counters
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from db import (
+    DB_FILE,
+    DEFAULT_PROFILE,
+    STATUSES,
+    STORAGE_PROFILES,
+    Database,
+    day_range,
+    init_db,
+)
+from maintenance import MaintenanceScheduler
+from service import AttendanceService, ValidationError, attendance_row
+from writer import MAX_BATCH, Writer
+
+READERS = 4
+# HTTP clients wait for each answer, so check-ins already pile up behind
+# a running commit; waiting for more only adds latency unless fsync is slow
+MAX_DELAY_MS = 0
+HISTORY_LIMIT = 1000
+MAX_BODY = 64 * 1024
+# Writes are logged under this name: requests carry no user
+API_ACTOR = "api"
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# =================== HTTP ===================
+async def _read_request(reader):
+    """``(method, target, headers, body)``, or None once the client is gone."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def _write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+    )
+    if not keep_alive:
+        head += "Connection: close\r\n"
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+
+
+def _text(data, name, default=""):
+    value = data.get(name, default)
+    if not isinstance(value, str):
+        raise HttpError(400, f"'{name}' must be a string")
+    return value.strip()
+
+
+def _int(value, name):
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"'{name}' must be an integer")
+
+
+def _records(rows):
+    return [r._asdict() for r in rows]
+
+
+# =================== SERVER ===================
+class ApiServer:
+    def __init__(self, path=DB_FILE, max_batch=MAX_BATCH,
+                 max_delay_ms=MAX_DELAY_MS, readers=READERS,
+                 profile=DEFAULT_PROFILE, maintenance=True):
+        self.db = Database(path, pool_size=readers, profile=profile)
+        init_db(self.db.conn, profile)
+        self.writer = Writer(path, max_batch, max_delay_ms, profile, actor=API_ACTOR)
+        self.maintenance = MaintenanceScheduler(self.db) if maintenance else None
+        if self.maintenance is not None:
+            self.maintenance.start()
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="db-reader")
+        self._server = None
+        self._routes = {
+            ("POST", "checkin"): self.check_in,
+            ("GET", "history"): self.history,
+            ("GET", "report"): self.report,
+            ("GET", "stats"): self.stats,
+            ("GET", "users"): self.list_users,
+            ("POST", "users"): self.save_user,
+            ("DELETE", "users"): self.delete_user,
+            ("GET", "courses"): self.list_courses,
+            ("POST", "courses"): self.add_course,
+            ("DELETE", "courses"): self.delete_course,
+            ("GET", "classes"): self.list_classes,
+            ("POST", "classes"): self.add_class,
+            ("DELETE", "classes"): self.delete_class,
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening; returns the port (useful with ``port=0``)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.writer.close()
+        self._readers.shutdown()
+        if self.maintenance is not None:
+            self.maintenance.stop()
+        self.db.close()
+
+    # ---------- DATABASE ----------
+    async def read(self, task):
+        """``task(service)`` on a reader thread with a pooled connection."""
+        def run():
+            with self.db.pooled() as conn:
+                return task(AttendanceService(conn, API_ACTOR))
+
+        return await asyncio.wrap_future(self._readers.submit(run))
+
+    async def write(self, task):
+        return await asyncio.wrap_future(self.writer.submit(task))
+
+    # ---------- CONNECTIONS ----------
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as e:
+                    _write_response(writer, e.status, {"error": str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self._respond(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, body):
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        handler = self._routes.get((method, parts[0]))
+        if handler is None or len(parts) > 2:
+            return 404, {"error": "Not found"}
+        # DELETE names its target in the path; nothing else does
+        if (method == "DELETE") != (len(parts) == 2):
+            return 404, {"error": "Not found"}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HttpError(400, "Expected a JSON object")
+            return await handler(data, query, *parts[1:])
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except json.JSONDecodeError:
+            return 400, {"error": "Malformed JSON"}
+        except ValidationError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    # ---------- ATTENDANCE ----------
+    async def check_in(self, data, query):
+        status = _text(data, "status", STATUSES[0])
+        if status not in STATUSES:
+            raise HttpError(400, f"'status' must be one of {', '.join(STATUSES)}")
+        row = attendance_row(
+            _text(data, "student_id"), _text(data, "student_name"), status
+        )
+        await asyncio.wrap_future(self.writer.check_in(row))
+        return 201, {"ok": True}
+
+    async def history(self, data, query):
+        try:
+            start, end = day_range(query.get("from", ""), query.get("to", ""))
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        class_id = _int(query.get("class_id"), "class_id")
+        status = query.get("status") or None
+        limit = min(_int(query.get("limit"), "limit") or 100, HISTORY_LIMIT)
+        archives = bool(_int(query.get("archives"), "archives"))
+        rows = await self.read(
+            lambda s: s.attendance.history(
+                start, end, class_id, status, limit, include_archives=archives
+            )
+        )
+        return 200, _records(rows)
+
+    async def report(self, data, query):
+        archives = bool(_int(query.get("archives"), "archives"))
+        rows = await self.read(lambda s: s.attendance.report(archives))
+        return 200, _records(rows)
+
+    async def stats(self, data, query):
+        w = self.writer
+        return 200, {
+            "batches": w.batches,
+            "rows": w.rows,
+            "rows_per_batch": w.rows / w.batches if w.batches else 0.0,
+            "queued": w.queued,
+        }
+
+    # ---------- ADMIN ----------
+    async def list_users(self, data, query):
+        return 200, _records(await self.read(lambda s: s.users.all()))
+
+    async def save_user(self, data, query):
+        username = _text(data, "username")
+        role = _text(data, "role")
+        password = _text(data, "password")
+        student_id = _text(data, "student_id")
+        created = await self.write(
+            lambda s: s.users.save(username, role, password, student_id)
+        )
+        return (201 if created else 200), {"ok": True, "created": created}
+
+    async def delete_user(self, data, query, username):
+        await self.write(lambda s: s.users.delete(username))
+        return 200, {"ok": True}
+
+    async def list_courses(self, data, query):
+        return 200, _records(await self.read(lambda s: s.courses.all()))
+
+    async def add_course(self, data, query):
+        code, name = _text(data, "code"), _text(data, "name")
+        course_id = await self.write(lambda s: s.courses.add(code, name))
+        return 201, {"id": course_id}
+
+    async def delete_course(self, data, query, course_id):
+        course_id = _int(course_id, "id")
+        await self.write(lambda s: s.courses.delete(course_id))
+        return 200, {"ok": True}
+
+    async def list_classes(self, data, query):
+        return 200, _records(await self.read(lambda s: s.classes.all()))
+
+    async def add_class(self, data, query):
+        code, name = _text(data, "code"), _text(data, "name")
+        course_id = _int(data.get("course_id"), "course_id")
+        class_id = await self.write(lambda s: s.classes.add(code, name, course_id))
+        return 201, {"id": class_id}
+
+    async def delete_class(self, data, query, class_id):
+        class_id = _int(class_id, "id")
+        await self.write(lambda s: s.classes.delete(class_id))
+        return 200, {"ok": True}
+
+
+async def serve(path, host, port, max_batch, max_delay_ms, profile):
+    server = ApiServer(path, max_batch, max_delay_ms, profile=profile)
+    port = await server.start(host, port)
+    print(f"serving {path} on http://{host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attendance HTTP/JSON API")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--batch", type=int, default=MAX_BATCH,
+        help="most check-ins per commit (1 disables group commit)",
+    )
+    parser.add_argument(
+        "--delay-ms", type=float, default=MAX_DELAY_MS,
+        help="longest a check-in waits for others to share its commit",
+    )
+    parser.add_argument(
+        "--profile", default=DEFAULT_PROFILE, choices=sorted(STORAGE_PROFILES)
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        asyncio.run(
+            serve(args.db, args.host, args.port, args.batch, args.delay_ms,
+                  args.profile)
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Attendance business logic, without Tk.
+
+Each repository wraps the SQL for one part of the schema and works on a
+plain sqlite3 connection, so the same code runs on the Tk thread, on a
+DBExecutor worker, in scripts and in benchmarks. Inputs are checked here
+and rejected with ValidationError, whose message is meant for the user.
+AttendanceApp only reads its widgets, calls these methods and shows the
+results. Every write is also logged to the audit log (see audit.py) under
+the service's ``actor``, in the same transaction.
+
+    with Database() as db:
+        service = AttendanceService(db.conn)
+        service.attendance.add("SV001", "Nguyễn Văn An", "Present")
+"""
+from typing import NamedTuple
+
+from archive import ALL_REPORT_QUERY, archive_all, attach_archives
+from db import (
+    REPORT_QUERY,
+    attendance_scope_clause,
+    authenticate,
+    class_choices,
+    hash_password,
+    insert_attendance,
+    log_event,
+    now_stamp,
+    query_attendance,
+    record_roll_call,
+    roster,
+    set_password,
+    transaction,
+)
+
+
+class ValidationError(ValueError):
+    """Input that the service refuses; ``str(e)`` is shown to the user."""
+
+
+# =================== RECORDS ===================
+class User(NamedTuple):
+    username: str
+    role: str
+    student_id: str = ""
+
+
+class Course(NamedTuple):
+    id: int
+    code: str
+    name: str
+
+
+class SchoolClass(NamedTuple):
+    id: int
+    code: str
+    name: str
+    course_name: str
+
+
+class Student(NamedTuple):
+    student_id: str
+    student_name: str
+
+
+class AttendanceRecord(NamedTuple):
+    id: int
+    student_id: str
+    student_name: str
+    date: str
+    status: str
+
+
+class StudentSummary(NamedTuple):
+    student_id: str
+    student_name: str
+    total: int
+    present: int
+    absent: int
+    late: int
+
+
+def _require(message, *values):
+    if not all(values):
+        raise ValidationError(message)
+
+
+def attendance_row(student_id: str, student_name: str, status: str,
+                   date: str | None = None) -> tuple:
+    """A checked ``(student_id, student_name, date, status)`` insert row."""
+    _require("Please enter both Student ID and Name.", student_id, student_name)
+    return (student_id, student_name, date or now_stamp(), status)
+
+
+# =================== USERS ===================
+class UserRepository:
+    def __init__(self, conn, actor=None):
+        self.conn = conn
+        self.actor = actor
+
+    def all(self) -> list[User]:
+        return [
+            User(*r)
+            for r in self.conn.execute(
+                "SELECT username, role, COALESCE(student_id, '') FROM users "
+                "ORDER BY username"
+            )
+        ]
+
+    def get(self, username: str) -> User | None:
+        row = self.conn.execute(
+            "SELECT username, role, COALESCE(student_id, '') FROM users "
+            "WHERE username=?",
+            (username,),
+        ).fetchone()
+        return User(*row) if row else None
+
+    def exists(self, username: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM users WHERE username=?", (username,)
+        ).fetchone() is not None
+
+    def authenticate(self, username: str, password: str) -> str | None:
+        """The user's role, or None. Slow by design (password hashing)."""
+        _require("Please enter username and password.", username, password)
+        return authenticate(self.conn, username, password)
+
+    def login(self, username: str, password: str) -> User | None:
+        """The account, with its student link, if the password is right."""
+        if self.authenticate(username, password) is None:
+            return None
+        return self.get(username)
+
+    def save(self, username: str, role: str, password: str = "",
+             student_id: str = "") -> bool:
+        """Create or update an account; True if it was created.
+
+        An existing account keeps its password when ``password`` is empty.
+        ``student_id`` links a student account to its attendance rows.
+        """
+        _require("Please enter username and select a role.", username, role)
+        if not password and not self.exists(username):
+            raise ValidationError("Please enter a password for new account.")
+        link = student_id if role == "student" and student_id else None
+        pw_hash = hash_password(password) if password else None
+        with transaction(self.conn) as c:
+            if pw_hash:
+                c.execute(
+                    "UPDATE users SET password=?, role=?, student_id=? "
+                    "WHERE username=?",
+                    (pw_hash, role, link, username),
+                )
+            else:
+                c.execute(
+                    "UPDATE users SET role=?, student_id=? WHERE username=?",
+                    (role, link, username),
+                )
+            created = not c.rowcount
+            if created:
+                c.execute(
+                    "INSERT INTO users (username, password, role, student_id) "
+                    "VALUES (?, ?, ?, ?)",
+                    (username, pw_hash, role, link),
+                )
+            # Whether the password changed, never the password (or its hash)
+            log_event(c, self.actor, "user.save", {
+                "username": username, "role": role, "student_id": link,
+                "created": created, "password": bool(pw_hash),
+            })
+            return created
+
+    def delete(self, username: str) -> None:
+        if username == "admin":
+            raise ValidationError("Cannot delete default admin account.")
+        with transaction(self.conn) as c:
+            c.execute("DELETE FROM users WHERE username=?", (username,))
+            if c.rowcount:
+                log_event(c, self.actor, "user.delete", {"username": username})
+
+    def reset_password(self, username: str, new: str, confirm: str) -> bool:
+        """Set a new password; False if there is no such user."""
+        _require("Please fill in all fields.", username, new, confirm)
+        if new != confirm:
+            raise ValidationError("New password and confirmation do not match.")
+        return set_password(self.conn, username, new, actor=self.actor)
+
+    def change_password(self, username: str, current: str, new: str,
+                        confirm: str) -> bool:
+        """Replace the password; False if ``current`` is wrong."""
+        _require("Please fill in all fields.", current, new, confirm)
+        if new != confirm:
+            raise ValidationError("New password and confirmation do not match.")
+        if authenticate(self.conn, username, current) is None:
+            return False
+        return set_password(self.conn, username, new, actor=self.actor)
+
+
+# =================== COURSES AND CLASSES ===================
+class CourseRepository:
+    def __init__(self, conn, actor=None):
+        self.conn = conn
+        self.actor = actor
+
+    def all(self) -> list[Course]:
+        return [
+            Course(*r)
+            for r in self.conn.execute(
+                "SELECT id, course_code, course_name FROM courses ORDER BY id"
+            )
+        ]
+
+    def by_name(self) -> list[Course]:
+        return [
+            Course(*r)
+            for r in self.conn.execute(
+                "SELECT id, course_code, course_name FROM courses "
+                "ORDER BY course_name"
+            )
+        ]
+
+    def add(self, code: str, name: str) -> int:
+        _require("Please enter course code and course name.", code, name)
+        with transaction(self.conn) as c:
+            c.execute(
+                "INSERT INTO courses (course_code, course_name) VALUES (?, ?)",
+                (code, name),
+            )
+            course_id = c.lastrowid
+            log_event(c, self.actor, "course.add", {
+                "id": course_id, "code": code, "name": name,
+            })
+            return course_id
+
+    def delete(self, course_id: int) -> None:
+        with transaction(self.conn) as c:
+            c.execute("DELETE FROM courses WHERE id=?", (course_id,))
+            if c.rowcount:
+                log_event(c, self.actor, "course.delete", {"id": course_id})
+
+
+class ClassRepository:
+    def __init__(self, conn, actor=None):
+        self.conn = conn
+        self.actor = actor
+
+    def all(self) -> list[SchoolClass]:
+        return [
+            SchoolClass(*r)
+            for r in self.conn.execute("""
+                SELECT classes.id, classes.class_code, classes.class_name,
+                       COALESCE(courses.course_name, '')
+                FROM classes
+                LEFT JOIN courses ON classes.course_id = courses.id
+                ORDER BY classes.id
+            """)
+        ]
+
+    def choices(self) -> list[tuple[int, str]]:
+        """``(id, "code - name")`` for every class, for session pickers."""
+        return class_choices(self.conn)
+
+    def add(self, code: str, name: str, course_id: int | None = None) -> int:
+        _require("Please enter class code and class name.", code, name)
+        with transaction(self.conn) as c:
+            c.execute(
+                "INSERT INTO classes (class_code, class_name, course_id) "
+                "VALUES (?, ?, ?)",
+                (code, name, course_id),
+            )
+            class_id = c.lastrowid
+            log_event(c, self.actor, "class.add", {
+                "id": class_id, "code": code, "name": name, "course_id": course_id,
+            })
+            return class_id
+
+    def delete(self, class_id: int) -> None:
+        with transaction(self.conn) as c:
+            c.execute("DELETE FROM classes WHERE id=?", (class_id,))
+            if c.rowcount:
+                log_event(c, self.actor, "class.delete", {"id": class_id})
+
+
+# =================== ATTENDANCE ===================
+class AttendanceRepository:
+    def __init__(self, conn, actor=None):
+        self.conn = conn
+        self.actor = actor
+
+    def add(self, student_id: str, student_name: str, status: str,
+            date: str | None = None) -> None:
+        row = attendance_row(student_id, student_name, status, date)
+        with transaction(self.conn) as c:
+            insert_attendance(c, [row], actor=self.actor)
+
+    def record_roll_call(self, statuses, class_id: int | None = None,
+                         date: str | None = None) -> int:
+        """Save ``(student_id, student_name, status)`` rows as one session."""
+        statuses = list(statuses)
+        if not statuses:
+            raise ValidationError("The roster is empty.")
+        return record_roll_call(self.conn, statuses, date, class_id, self.actor)
+
+    def reset(self) -> tuple[str, int]:
+        """Move every record into the ``reset`` archive; ``(term, rows)``.
+
+        Nothing is lost: ``python archive.py restore reset`` brings the
+        records of every reset back. Students and sessions stay, so the
+        roll call roster survives a reset.
+        """
+        if not self.conn.execute(
+            "SELECT 1 FROM attendance_records LIMIT 1"
+        ).fetchone():
+            raise ValidationError("There are no attendance records to reset.")
+        return archive_all(self.conn, actor=self.actor)
+
+    def roster(self) -> list[Student]:
+        return [Student(*r) for r in roster(self.conn)]
+
+    def history(self, start: int | None = None, end: int | None = None,
+                class_id: int | None = None, status: str | None = None,
+                limit: int = 1000, user: User | None = None,
+                include_archives: bool = False) -> list[AttendanceRecord]:
+        """Newest first; ``start``/``end`` are epoch seconds (see day_range).
+
+        With ``user``, only the rows that user may see (see scope()).
+        ``include_archives`` reads archived terms too.
+        """
+        scope = self.scope(user) if user is not None else None
+        source = attach_archives(self.conn) if include_archives else "attendance"
+        return [
+            AttendanceRecord(*r)
+            for r in query_attendance(
+                self.conn, start, end, class_id, status, limit, scope, source
+            )
+        ]
+
+    @staticmethod
+    def scope(user: User) -> tuple[str, list]:
+        """``(where, params)`` limiting the attendance view to ``user``."""
+        return attendance_scope_clause(user.role, user.student_id)
+
+    def report(self, include_archives: bool = False) -> list[StudentSummary]:
+        """Per-student counts; across archived terms too if asked (slower)."""
+        if not include_archives:
+            return [StudentSummary(*r) for r in self.conn.execute(REPORT_QUERY)]
+        attach_archives(self.conn)
+        return [StudentSummary(*r) for r in self.conn.execute(ALL_REPORT_QUERY)]
+
+
+# =================== SERVICE ===================
+class AttendanceService:
+    """All repositories over one connection.
+
+    Cheap to create: build one per connection, e.g. inside a DBExecutor
+    job with the worker's connection. Writes are logged as ``actor``
+    (a username, or a name such as "api" for other writers).
+    """
+
+    def __init__(self, conn, actor=None):
+        self.conn = conn
+        self.actor = actor
+        self.users = UserRepository(conn, actor)
+        self.courses = CourseRepository(conn, actor)
+        self.classes = ClassRepository(conn, actor)
+        self.attendance = AttendanceRepository(conn, actor)
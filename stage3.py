@@ -1,99 +1,209 @@
-import tkinter as tk
-from tkinter import messagebox, ttk
-from PIL import Image, ImageTk
+import argparse
+import logging
+import operator
 import sqlite3
-from datetime import datetime
-import os
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+from analytics import VIEWS, AnalyticsCache, load_cube
+from archive import ALL_VIEW, attach_archives
+from assets import AssetCache
+from changes import (
+    ATTENDANCE_KINDS,
+    ChangeBus,
+    add_to_summary,
+    changed_ids,
+)
+from db import (
+    DB_FILE,
+    DEFAULT_PROFILE,
+    STATUSES,
+    STORAGE_PROFILES,
+    Database,
+    KnownUsers,
+    attendance_range_clause,
+    attendance_scope_clause,
+    attendance_search_clause,
+    day_range,
+    has_search_index,
+    init_db,
+    pending_migrations,
+)
+from executor import DBExecutor
+from exporter import export_query, export_rows, history_query, report_query
+from importer import import_attendance
+from maintenance import MaintenanceScheduler, run_task
+from service import (
+    AttendanceService,
+    StudentSummary,
+    ValidationError,
+    attendance_row,
+)
+from widgets import Debouncer, PagedTreeview, ScreenManager, TableBinding
+from writer import Writer
 
-DB_FILE = "attendance_gui.db"
 LOGO_FILE = "uth.png"
+LOGO_SIZE = (150, 90)
+SEARCH_DEBOUNCE_MS = 300
+# How often other processes' writes are looked for
+CHANGE_POLL_MS = 1000
 
-# =================== DATABASE SETUP ===================
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-
-    # Bảng người dùng
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password TEXT,
-        role TEXT
-    )
-    """)
-
-    # Bảng điểm danh
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS attendance (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        student_id TEXT,
-        student_name TEXT,
-        date TEXT,
-        status TEXT
-    )
-    """)
-
-    # Bảng môn học (Course)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS courses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course_code TEXT,
-        course_name TEXT
-    )
-    """)
-
-    # Bảng lớp (Class)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS classes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        class_code TEXT,
-        class_name TEXT,
-        course_id INTEGER
-    )
-    """)
-
-    # Tài khoản mặc định
-    c.execute("INSERT OR IGNORE INTO users VALUES ('admin','admin','admin')")
-    c.execute("INSERT OR IGNORE INTO users VALUES ('teacher','1234','teacher')")
-    c.execute("INSERT OR IGNORE INTO users VALUES ('student','0000','student')")
-
-    conn.commit()
-    conn.close()
-
-
-init_db()
+log = logging.getLogger("attendance.app")
 
 
 # =================== MAIN APPLICATION ===================
 class AttendanceApp:
-    def __init__(self, root):
+    def __init__(self, root, db_path=DB_FILE, profile=DEFAULT_PROFILE):
         self.root = root
         self.root.title("Student Attendance System")
         self.root.geometry("950x600")
         self.root.resizable(False, False)
         self.logo_path = LOGO_FILE
+        # The logo is decoded and resized once, off the Tk thread
+        self.assets = AssetCache(self.root)
+        self.assets.preload((self.logo_path, LOGO_SIZE))
+
+        # One shared connection for the whole session
+        self.db = Database(db_path, profile=profile)
+        # Quick reads and writes on small tables go through the Tk
+        # thread's connection; anything slow goes through run()
+        self.service = AttendanceService(self.db.conn)
+        # Slow queries and writes run on worker threads, off the Tk loop
+        self.executor = DBExecutor(self.root, self.db, on_error=self.show_db_error)
+        # Single attendance saves are group-committed
+        self.writer = Writer(db_path, profile=profile)
+        # PRAGMA optimize / incremental vacuum / ANALYZE on a schedule
+        self.maintenance = MaintenanceScheduler(self.db)
+        # Report views rolled up from one aggregate read; dropped on writes
+        self.analytics = AnalyticsCache()
+        # Committed writes, this app's and other processes', reach the
+        # open views through the audit log as row-level changes
+        self.attendance_table = None
+        self.changes = None
+        self._changes_after = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.current_user = None
         self.current_role = None
+        # ANDed into every attendance query; nothing until someone logs in
+        self.attendance_scope = ("0", [])
+
+        # Each screen is built once, then hidden and shown on navigation
+        self.screens = ScreenManager(self.root)
+        self.screens.register("login", self.create_login_screen, self.on_show_login)
+        self.screens.register(
+            "teacher", self.create_teacher_screen, self.on_show_dashboard
+        )
+        self.screens.register(
+            "student", self.create_student_screen, self.on_show_dashboard
+        )
+        self.screens.register("admin", self.create_admin_screen, self.on_show_admin)
+        self.screens.register("upgrade", self.create_upgrade_screen)
+
+        if pending_migrations(self.db.conn):
+            # Migrations can take minutes on a big file; run them on a
+            # worker so the window keeps drawing
+            self.screens.show("upgrade")
+            self.executor.submit(
+                lambda conn, job: init_db(conn, profile),
+                on_done=lambda _: self.finish_startup(),
+                on_error=self.upgrade_failed,
+            )
+        else:
+            init_db(self.db.conn, profile)
+            self.finish_startup()
+
+    def finish_startup(self):
+        """Everything that needs the current schema; then the login screen."""
+        self.search_indexed = has_search_index(self.db.conn)
+        # Logins for unknown usernames fail without hashing anything
+        self.known_users = KnownUsers(self.db.conn)
+        self.changes = ChangeBus(self.db.conn)
+        self.changes.subscribe(self.on_attendance_events, ATTENDANCE_KINDS)
+        self.poll_changes()
+        self.maintenance.start()
+        self.screens.show("login")
+
+    def upgrade_failed(self, error):
+        messagebox.showerror(
+            "DB Error",
+            f"Could not upgrade the database:\n{error}\n\n"
+            "Try again with: python db.py migrate",
+        )
+        self.on_close()
+
+    def on_close(self):
+        if self._changes_after is not None:
+            self.root.after_cancel(self._changes_after)
+        # Jobs already queued run first; a save among them still needs the
+        # Writer, which then commits whatever is still buffered
+        self.executor.shutdown()
+        self.writer.close()
+        self.maintenance.stop()
+        # SQLite recommends an optimize before closing a long session
+        try:
+            run_task(self.db.conn, "optimize")
+        except sqlite3.Error:
+            pass
+        self.db.close()
+        self.root.destroy()
+
+    def show_db_error(self, error):
+        messagebox.showerror("DB Error", f"Database error:\n{error}")
+
+    def run(self, task, on_done=None, parent=None, error=None, **kwargs):
+        """Run ``task(service)`` on a DBExecutor worker.
+
+        A ValidationError is shown as an input warning; anything else as
+        ``error`` (a message prefix) or the generic database error.
+        """
+        def failed(e):
+            if isinstance(e, ValidationError):
+                messagebox.showwarning("Input Error", str(e), parent=parent)
+            elif error is not None:
+                messagebox.showerror("DB Error", f"{error}:\n{e}", parent=parent)
+            else:
+                self.show_db_error(e)
+
+        actor = self.current_user
+        return self.executor.submit(
+            lambda conn, job: task(AttendanceService(conn, actor)),
+            on_done=on_done,
+            on_error=kwargs.pop("on_error", failed),
+            owner=parent,
+            **kwargs,
+        )
 
-        self.create_login_screen()
+    # ---------- UPGRADE SCREEN ----------
+    def create_upgrade_screen(self, frame):
+        frame.configure(bg="white")
+        tk.Label(
+            frame,
+            text="Upgrading database...",
+            font=("Times New Roman", 18, "bold"),
+            fg="navy",
+            bg="white",
+        ).pack(pady=(220, 15))
+        bar = ttk.Progressbar(frame, mode="indeterminate", length=300)
+        bar.pack()
+        bar.start(15)
 
     # ---------- HEADER ----------
-    def create_header(self):
-        header = tk.Frame(self.root, bg="#d9e1f2", height=70)
+    def create_header(self, parent):
+        header = tk.Frame(parent, bg="#d9e1f2", height=70)
         header.pack(fill="x")
 
         # Logo UTH
-        try:
-            if os.path.exists(self.logo_path):
-                img = Image.open(self.logo_path)
-                img = img.resize((150, 90), Image.LANCZOS)
-                self.logo = ImageTk.PhotoImage(img)
-                tk.Label(header, image=self.logo, bg="#d9e1f2").pack(
-                    side="right", padx=30, pady=2
-                )
-        except Exception:
-            pass
+        logo = tk.Label(header, bg="#d9e1f2")
+        logo.pack(side="right", padx=30, pady=2)
+
+        def show_logo(photo):
+            if logo.winfo_exists():
+                logo.config(image=photo)
+
+        photo = self.assets.photo(self.logo_path, LOGO_SIZE, on_ready=show_logo)
+        if photo is not None:
+            logo.config(image=photo)
 
         tk.Label(
             header,
@@ -104,14 +214,11 @@ class AttendanceApp:
         ).pack(side="left", padx=60, pady=5)
 
     # ---------- LOGIN SCREEN ----------
-    def create_login_screen(self):
-        for w in self.root.winfo_children():
-            w.destroy()
-
-        self.root.configure(bg="#f2f4f7")
-        self.create_header()
+    def create_login_screen(self, frame):
+        frame.configure(bg="#f2f4f7")
+        self.create_header(frame)
 
-        login_frame = tk.Frame(self.root, bg="#f2f4f7")
+        login_frame = tk.Frame(frame, bg="#f2f4f7")
         login_frame.place(relx=0.5, rely=0.55, anchor="center")
 
         tk.Label(
@@ -149,7 +256,7 @@ class AttendanceApp:
         )
         self.password_entry.grid(row=2, column=1, padx=15, pady=10)
 
-        tk.Button(
+        self.login_button = tk.Button(
             login_frame,
             text="Login",
             font=("Times New Roman", 14, "bold"),
@@ -160,7 +267,8 @@ class AttendanceApp:
             height=1,
             relief="flat",
             command=self.login,
-        ).grid(row=3, column=0, columnspan=2, pady=(15, 5))
+        )
+        self.login_button.grid(row=3, column=0, columnspan=2, pady=(15, 5))
 
         tk.Button(
             login_frame,
@@ -173,8 +281,21 @@ class AttendanceApp:
             command=self.open_reset_password_window,
         ).grid(row=4, column=0, columnspan=2, pady=(0, 10))
 
+    def on_show_login(self, _):
+        self.username_entry.delete(0, tk.END)
+        self.password_entry.delete(0, tk.END)
+        self.username_entry.focus_set()
+
+    def logout(self):
         self.current_user = None
         self.current_role = None
+        self.service = AttendanceService(self.db.conn)
+        self.attendance_scope = ("0", [])
+        # The dashboards are shared by every session; the next user must
+        # not see these rows while their own first page loads
+        if self.attendance_table is not None:
+            self.attendance_table.clear()
+        self.screens.show("login")
 
     # ---------- LOGIN LOGIC ----------
     def login(self):
@@ -185,81 +306,100 @@ class AttendanceApp:
             messagebox.showwarning("Input Error", "Please enter username and password.")
             return
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
-            "SELECT role FROM users WHERE username=? AND password=?",
-            (username, password),
+        if username not in self.known_users:
+            messagebox.showerror("Login Failed", "Invalid username or password.")
+            return
+
+        # Password hashing is deliberately slow; keep it off the Tk thread
+        self.login_button.config(state="disabled")
+        self.run(
+            lambda service: service.users.login(username, password),
+            on_done=self.finish_login,
+            on_error=self.login_failed,
+            key="login",
         )
-        result = c.fetchone()
-        conn.close()
 
-        if not result:
+    def login_failed(self, error):
+        self.login_button.config(state="normal")
+        self.show_db_error(error)
+
+    def finish_login(self, user):
+        self.login_button.config(state="normal")
+        if user is None:
             messagebox.showerror("Login Failed", "Invalid username or password.")
             return
 
-        role = result[0]
+        username, role = user.username, user.role
         self.current_user = username
         self.current_role = role
+        # Writes from here on are logged under this account
+        self.service = AttendanceService(self.db.conn, username)
+        # Students only ever load their own rows
+        self.attendance_scope = attendance_scope_clause(role, user.student_id)
 
         messagebox.showinfo("Welcome", f"Welcome {username} ({role})")
+        if role == "student" and not user.student_id:
+            messagebox.showwarning(
+                "Account Not Linked",
+                "This account is not linked to a student, so there is no "
+                "attendance to show. Ask an administrator to link it.",
+            )
 
-        if role == "teacher":
-            self.create_teacher_screen()
-        elif role == "student":
-            self.create_student_screen()
-        elif role == "admin":
-            self.create_admin_screen()
+        if role in ("teacher", "student", "admin"):
+            self.screens.show(role)
         else:
             messagebox.showerror("Role Error", "Unknown user role!")
 
     # ---------- TEACHER SCREEN ----------
-    def create_teacher_screen(self):
-        for w in self.root.winfo_children():
-            w.destroy()
-        self.root.configure(bg="white")
-        self.create_header()
+    def create_teacher_screen(self, frame):
+        frame.configure(bg="white")
+        self.create_header(frame)
 
         tk.Label(
-            self.root,
+            frame,
             text="Teacher Dashboard",
             font=("Times New Roman", 20, "bold"),
             fg="navy",
             bg="white",
         ).pack(pady=15)
 
-        self.create_attendance_form()
-        self.create_table_buttons(role="teacher")
-        self.load_attendance()
+        form = self.create_attendance_form(frame)
+        self.create_table_buttons(frame, role="teacher")
+        return form
 
     # ---------- STUDENT SCREEN ----------
-    def create_student_screen(self):
-        for w in self.root.winfo_children():
-            w.destroy()
-        self.root.configure(bg="white")
-        self.create_header()
+    def create_student_screen(self, frame):
+        frame.configure(bg="white")
+        self.create_header(frame)
 
         tk.Label(
-            self.root,
+            frame,
             text="Student Dashboard",
             font=("Times New Roman", 20, "bold"),
             fg="darkred",
             bg="white",
         ).pack(pady=10)
 
-        self.create_attendance_form()
-        self.create_table_buttons(role="student")
+        form = self.create_attendance_form(frame)
+        self.create_table_buttons(frame, role="student")
+        return form
+
+    def on_show_dashboard(self, form):
+        # Teacher and student screens each have their own form; point the
+        # save/load handlers at the one being shown
+        self.student_id = form["student_id"]
+        self.student_name = form["student_name"]
+        self.status_var = form["status_var"]
+        self.attendance_table = form["attendance_table"]
         self.load_attendance()
 
     # ---------- ADMIN SCREEN ----------
-    def create_admin_screen(self):
-        for w in self.root.winfo_children():
-            w.destroy()
-        self.root.configure(bg="white")
-        self.create_header()
+    def create_admin_screen(self, frame):
+        frame.configure(bg="white")
+        self.create_header(frame)
 
         tk.Label(
-            self.root,
+            frame,
             text="Admin Dashboard",
             font=("Times New Roman", 20, "bold"),
             fg="darkgreen",
@@ -267,7 +407,7 @@ class AttendanceApp:
         ).pack(pady=10)
 
         # Notebook tabs: Accounts, Courses, Classes
-        notebook = ttk.Notebook(self.root)
+        notebook = ttk.Notebook(frame)
         notebook.pack(fill="both", expand=True, padx=15, pady=10)
 
         # Tabs
@@ -282,21 +422,33 @@ class AttendanceApp:
         self.build_accounts_tab()
         self.build_courses_tab()
         self.build_classes_tab()
+        self.admin_data_version = self.db.query_one("PRAGMA data_version")[0]
 
         # Nút logout
         tk.Button(
-            self.root,
+            frame,
             text="Logout",
-            command=self.create_login_screen,
+            command=self.logout,
             bg="red",
             fg="white",
             font=("Times New Roman", 13),
             width=12,
         ).pack(pady=5)
 
+    def on_show_admin(self, _):
+        # Admin edits reload their own table; only changes committed by
+        # other connections (data_version) need a reload here
+        version = self.db.query_one("PRAGMA data_version")[0]
+        if version != self.admin_data_version:
+            self.admin_data_version = version
+            self.reload_users_table()
+            self.reload_courses_table()
+            self.reload_classes_table()
+            self.reload_courses_to_combo()
+
     # ---------- ATTENDANCE FORM ----------
-    def create_attendance_form(self):
-        form_frame = tk.Frame(self.root, bg="white")
+    def create_attendance_form(self, parent):
+        form_frame = tk.Frame(parent, bg="white")
         form_frame.pack(pady=15)
 
         tk.Label(
@@ -305,8 +457,8 @@ class AttendanceApp:
             font=("Times New Roman", 14),
             bg="white",
         ).grid(row=0, column=0, padx=8, pady=5, sticky="e")
-        self.student_id = tk.Entry(form_frame, font=("Times New Roman", 14), width=14)
-        self.student_id.grid(row=0, column=1, padx=5, pady=5)
+        student_id = tk.Entry(form_frame, font=("Times New Roman", 14), width=14)
+        student_id.grid(row=0, column=1, padx=5, pady=5)
 
         tk.Label(
             form_frame,
@@ -314,10 +466,8 @@ class AttendanceApp:
             font=("Times New Roman", 14),
             bg="white",
         ).grid(row=0, column=2, padx=8, pady=5, sticky="e")
-        self.student_name = tk.Entry(
-            form_frame, font=("Times New Roman", 14), width=18
-        )
-        self.student_name.grid(row=0, column=3, padx=5, pady=5)
+        student_name = tk.Entry(form_frame, font=("Times New Roman", 14), width=18)
+        student_name.grid(row=0, column=3, padx=5, pady=5)
 
         tk.Label(
             form_frame,
@@ -325,11 +475,11 @@ class AttendanceApp:
             font=("Times New Roman", 14),
             bg="white",
         ).grid(row=0, column=4, padx=8, pady=5, sticky="e")
-        self.status_var = tk.StringVar()
+        status_var = tk.StringVar()
         combo = ttk.Combobox(
             form_frame,
-            textvariable=self.status_var,
-            values=["Present", "Absent", "Late"],
+            textvariable=status_var,
+            values=list(STATUSES),
             width=12,
             font=("Times New Roman", 13),
         )
@@ -347,15 +497,18 @@ class AttendanceApp:
         ).grid(row=0, column=6, padx=10, pady=5)
 
         cols = ("id", "student_id", "student_name", "date", "status")
-        self.tree = ttk.Treeview(self.root, columns=cols, show="headings", height=12)
-        for c in cols:
-            self.tree.heading(c, text=c.capitalize())
-            self.tree.column(c, width=150, anchor="center")
-        self.tree.pack(pady=10, fill="x", padx=20)
+        attendance_table = PagedTreeview(parent, self.executor, cols, height=12)
+        attendance_table.pack(pady=10, fill="x", padx=20)
+        return {
+            "student_id": student_id,
+            "student_name": student_name,
+            "status_var": status_var,
+            "attendance_table": attendance_table,
+        }
 
     # ---------- BUTTONS UNDER TABLE ----------
-    def create_table_buttons(self, role="teacher"):
-        btn_frame = tk.Frame(self.root, bg="white")
+    def create_table_buttons(self, parent, role="teacher"):
+        btn_frame = tk.Frame(parent, bg="white")
         btn_frame.pack(pady=5)
 
         tk.Button(
@@ -379,6 +532,16 @@ class AttendanceApp:
                 width=12,
             ).pack(side="left", padx=10)
 
+            tk.Button(
+                btn_frame,
+                text="Roll Call",
+                command=self.open_roll_call_window,
+                bg="#2e8b57",
+                fg="white",
+                font=("Times New Roman", 13),
+                width=10,
+            ).pack(side="left", padx=10)
+
             tk.Button(
                 btn_frame,
                 text="History",
@@ -399,6 +562,16 @@ class AttendanceApp:
                 width=10,
             ).pack(side="left", padx=10)
 
+            tk.Button(
+                btn_frame,
+                text="Import",
+                command=self.open_import_window,
+                bg="#6f42c1",
+                fg="white",
+                font=("Times New Roman", 13),
+                width=10,
+            ).pack(side="left", padx=10)
+
         elif role == "student":
             tk.Button(
                 btn_frame,
@@ -424,7 +597,7 @@ class AttendanceApp:
         tk.Button(
             btn_frame,
             text="Logout",
-            command=self.create_login_screen,
+            command=self.logout,
             bg="red",
             fg="white",
             font=("Times New Roman", 13),
@@ -437,59 +610,419 @@ class AttendanceApp:
         name = self.student_name.get().strip()
         status = self.status_var.get().strip()
 
-        if not sid or not name:
-            messagebox.showwarning(
-                "Input Error", "Please enter both Student ID and Name."
-            )
-            return
-
-        try:
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute(
-                "INSERT INTO attendance (student_id, student_name, date, status) "
-                "VALUES (?, ?, ?, ?)",
-                (sid, name, datetime.now().strftime("%Y-%m-%d %H:%M"), status),
-            )
-            conn.commit()
-            conn.close()
-
+        def saved(_):
             messagebox.showinfo("Success", "Attendance saved successfully.")
             self.student_id.delete(0, tk.END)
             self.student_name.delete(0, tk.END)
-            self.load_attendance()
-        except Exception as e:
-            messagebox.showerror("DB Error", f"Error saving attendance:\n{e}")
+            self.attendance_changed()
+
+        def failed(error):
+            messagebox.showerror("DB Error", f"Error saving attendance:\n{error}")
+
+        try:
+            row = attendance_row(sid, name, status)
+        except ValidationError as e:
+            messagebox.showwarning("Input Error", str(e))
+            return
+        # Saves in quick succession share one commit; saved() runs once
+        # this row is on disk. No worker waits for it meanwhile.
+        self.executor.watch(
+            self.writer.check_in(row, self.current_user),
+            on_done=saved,
+            on_error=failed,
+        )
 
     # ---------- LOAD ATTENDANCE ----------
     def load_attendance(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        where, params = self.attendance_scope
+        # ts order: a student's rows come straight off idx_records_student_ts
+        self.attendance_table.set_source(
+            "attendance", where, params, order_by=("ts", "id")
+        )
+
+    def attendance_changed(self):
+        """Call after writing attendance: open views apply it right away."""
+        self.poll_changes()
+
+    # ---------- CHANGES ----------
+    def poll_changes(self):
+        """Read newly committed events on a worker; changes_read hands them out."""
+        if self._changes_after is not None:
+            self.root.after_cancel(self._changes_after)
+            self._changes_after = None
+        after = self.changes.last_id
+        # A newer poll supersedes one still reading
+        self.executor.submit(
+            lambda conn, job: self.changes.read(conn, after),
+            on_done=self.changes_read,
+            on_error=self.changes_failed,
+            key="changes",
+        )
+
+    def changes_read(self, result):
+        changes, last_id, more = result
         try:
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute("SELECT * FROM attendance ORDER BY id DESC")
-            rows = c.fetchall()
-            conn.close()
-            for r in rows:
-                self.tree.insert("", tk.END, values=r)
-        except Exception as e:
-            messagebox.showerror("DB Error", f"Load error:\n{e}")
+            self.changes.publish(changes, last_id)
+        finally:
+            # A backlog (a big import) is read in parts, without waiting
+            self._changes_after = self.root.after(
+                1 if more else CHANGE_POLL_MS, self.poll_changes
+            )
+
+    def changes_failed(self, error):
+        log.warning("reading changes failed: %s", error)
+        self._changes_after = self.root.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def subscribe_window(self, win, callback, kinds=ATTENDANCE_KINDS):
+        """``callback(changes)`` for each change while ``win`` is open."""
+        unsubscribe = self.changes.subscribe(callback, kinds)
+        win.bind(
+            "<Destroy>", lambda e: unsubscribe() if e.widget is win else None, "+"
+        )
+
+    def on_attendance_events(self, changes):
+        # New rows are counted into the analytics cube; archives, restores
+        # and big imports move too many rows for that
+        if not changes.reload and all(
+            e.kind == "attendance.add" for e in changes.events
+        ):
+            self.analytics.add_rows(changes.rows, changes.classes)
+        else:
+            self.analytics.invalidate()
+        table = self.attendance_table
+        if self.current_user is None or table is None:
+            return
+        if changes.reload:
+            table.refresh()
+        else:
+            table.refresh_ids(changed_ids(changes.events, table.shown_ids()))
 
     # ---------- RESET ----------
     def reset_attendance(self):
-        if not messagebox.askyesno("Confirm", "Delete all attendance records?"):
+        if not messagebox.askyesno(
+            "Confirm", "Move all attendance records to an archive?"
+        ):
             return
-        try:
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute("DELETE FROM attendance")
-            conn.commit()
-            conn.close()
-            self.load_attendance()
-            messagebox.showinfo("Reset", "All records cleared.")
-        except Exception as e:
-            messagebox.showerror("DB Error", f"Reset error:\n{e}")
+
+        def done(result):
+            term, rows = result
+            self.attendance_changed()
+            messagebox.showinfo(
+                "Reset",
+                f"{rows} records moved to the '{term}' archive.\n"
+                f"Restore every reset with: python archive.py restore {term}",
+            )
+
+        self.run(
+            lambda service: service.attendance.reset(),
+            on_done=done,
+            error="Reset error",
+        )
+
+    # ====================================================
+    #           BULK ROLL CALL
+    # ====================================================
+    def open_roll_call_window(self):
+        win = tk.Toplevel(self.root)
+        win.title("Roll Call")
+        win.geometry("700x510")
+        win.resizable(False, False)
+
+        add_frame = tk.Frame(win)
+        add_frame.pack(pady=5)
+
+        tk.Label(add_frame, text="Student ID:", font=("Times New Roman", 11)).grid(
+            row=0, column=0, padx=5, pady=5
+        )
+        sid_entry = tk.Entry(add_frame, font=("Times New Roman", 11), width=15)
+        sid_entry.grid(row=0, column=1, padx=5)
+
+        tk.Label(add_frame, text="Student Name:", font=("Times New Roman", 11)).grid(
+            row=0, column=2, padx=5, pady=5
+        )
+        name_entry = tk.Entry(add_frame, font=("Times New Roman", 11), width=20)
+        name_entry.grid(row=0, column=3, padx=5)
+
+        tk.Label(add_frame, text="Class:", font=("Times New Roman", 11)).grid(
+            row=1, column=0, padx=5, pady=5
+        )
+        class_box = ttk.Combobox(add_frame, state="readonly", width=40)
+        class_box.grid(row=1, column=1, columnspan=3, sticky="w", padx=5)
+        class_ids = {}
+
+        def fill_classes(rows):
+            class_ids.clear()
+            class_ids["(no class)"] = None
+            for class_id, label in rows:
+                class_ids[label] = class_id
+            class_box["values"] = list(class_ids)
+            class_box.current(0)
+
+        self.run(
+            lambda service: service.classes.choices(), on_done=fill_classes, parent=win
+        )
+
+        cols = ("student_id", "student_name", "status")
+        tree = ttk.Treeview(win, columns=cols, show="headings", height=13)
+        for c in cols:
+            tree.heading(c, text=c.replace("_", " ").title())
+            tree.column(c, width=200, anchor="center")
+        tree.pack(pady=5, fill="x", padx=10)
+
+        # Row data lives here: Treeview hands values back as Tcl-converted
+        # types, which would turn an ID like "007" into 7
+        entries = {}
+
+        def fill_roster(rows):
+            for sid, name in rows:
+                item = tree.insert("", tk.END, values=(sid, name, STATUSES[0]))
+                entries[item] = [sid, name, STATUSES[0]]
+
+        self.run(
+            lambda service: service.attendance.roster(),
+            on_done=fill_roster,
+            parent=win,
+        )
+
+        def add_student():
+            sid = sid_entry.get().strip()
+            name = name_entry.get().strip()
+            if not sid or not name:
+                messagebox.showwarning(
+                    "Input Error", "Please enter both Student ID and Name.", parent=win
+                )
+                return
+            item = tree.insert("", 0, values=(sid, name, STATUSES[0]))
+            entries[item] = [sid, name, STATUSES[0]]
+            tree.see(item)
+            sid_entry.delete(0, tk.END)
+            name_entry.delete(0, tk.END)
+
+        def set_status(status, items=None):
+            for item in items if items is not None else tree.selection():
+                entries[item][2] = status
+                tree.item(item, values=entries[item])
+
+        def cycle_status(event):
+            item = tree.identify_row(event.y)
+            if item:
+                current = entries[item][2]
+                nxt = STATUSES[(STATUSES.index(current) + 1) % len(STATUSES)]
+                set_status(nxt, [item])
+
+        # Double-click cycles one row; P / A / L set every selected row
+        tree.bind("<Double-1>", cycle_status)
+        for status in STATUSES:
+            key = status[0].lower()
+            tree.bind(f"<Key-{key}>", lambda e, s=status: set_status(s))
+
+        def save_roll_call():
+            rows = [entries[i] for i in tree.get_children()]
+
+            def saved(count):
+                self.attendance_changed()
+                messagebox.showinfo(
+                    "Success", f"Saved attendance for {count} students.", parent=win
+                )
+                win.destroy()
+
+            class_id = class_ids.get(class_box.get())
+            self.run(
+                lambda service: service.attendance.record_roll_call(
+                    rows, class_id=class_id
+                ),
+                on_done=saved,
+                parent=win,
+                error="Error saving roll call",
+            )
+
+        tk.Button(
+            add_frame,
+            text="Add",
+            font=("Times New Roman", 11),
+            bg="#007bff",
+            fg="white",
+            width=8,
+            command=add_student,
+        ).grid(row=0, column=4, padx=5)
+
+        btn_frame = tk.Frame(win)
+        btn_frame.pack(pady=5)
+        for status, color in zip(STATUSES, ("#28a745", "#dc3545", "#ffc107")):
+            tk.Button(
+                btn_frame,
+                text=status,
+                font=("Times New Roman", 11),
+                bg=color,
+                width=8,
+                command=lambda s=status: set_status(s),
+            ).pack(side="left", padx=5)
+        tk.Button(
+            btn_frame,
+            text="All Present",
+            font=("Times New Roman", 11),
+            width=10,
+            command=lambda: set_status(STATUSES[0], tree.get_children()),
+        ).pack(side="left", padx=5)
+        tk.Button(
+            btn_frame,
+            text="Save Roll Call",
+            font=("Times New Roman", 11, "bold"),
+            bg="green",
+            fg="white",
+            width=14,
+            command=save_roll_call,
+        ).pack(side="left", padx=15)
+
+    # ====================================================
+    #           IMPORT CSV / XLSX
+    # ====================================================
+    def open_import_window(self):
+        win = tk.Toplevel(self.root)
+        win.title("Import Attendance")
+        win.geometry("480x260")
+        win.resizable(False, False)
+
+        tk.Label(
+            win, text="Import Attendance", font=("Times New Roman", 16, "bold")
+        ).pack(pady=10)
+
+        form = tk.Frame(win)
+        form.pack(pady=5, padx=10)
+
+        path_var = tk.StringVar()
+        tk.Label(form, text="File:", font=("Times New Roman", 12)).grid(
+            row=0, column=0, sticky="e", padx=5, pady=5
+        )
+        tk.Entry(
+            form, textvariable=path_var, font=("Times New Roman", 12), width=30
+        ).grid(row=0, column=1, padx=5, pady=5)
+
+        def browse():
+            path = filedialog.askopenfilename(
+                parent=win,
+                filetypes=[
+                    ("Spreadsheets", "*.csv *.xlsx"),
+                    ("CSV", "*.csv"),
+                    ("Excel", "*.xlsx"),
+                ],
+            )
+            if path:
+                path_var.set(path)
+
+        tk.Button(form, text="Browse...", width=8, command=browse).grid(
+            row=0, column=2, padx=5
+        )
+
+        tk.Label(form, text="Batch size:", font=("Times New Roman", 12)).grid(
+            row=1, column=0, sticky="e", padx=5, pady=5
+        )
+        batch_var = tk.IntVar(value=1000)
+        tk.Spinbox(
+            form, from_=100, to=50000, increment=100, textvariable=batch_var, width=8
+        ).grid(row=1, column=1, sticky="w", padx=5, pady=5)
+
+        bar = ttk.Progressbar(win, length=400, maximum=1.0)
+        bar.pack(pady=5)
+        status = tk.Label(win, text="", font=("Times New Roman", 11))
+        status.pack()
+
+        current = {"job": None}
+
+        def on_progress(imported, rejected, fraction):
+            if fraction is None:
+                bar.configure(mode="indeterminate")
+                bar.step(0.05)
+            else:
+                bar.configure(mode="determinate", value=fraction)
+            status.config(text=f"Imported {imported} rows, rejected {rejected}")
+
+        def finish(report):
+            current["job"] = None
+            start_btn.config(state="normal")
+            self.attendance_changed()
+            bar.configure(mode="determinate", value=1.0)
+            summary = f"Imported {report.imported} rows, rejected {report.rejected}."
+            if report.errors:
+                summary += "\n\n" + "\n".join(report.errors[:10])
+            messagebox.showinfo("Import", summary, parent=win)
+
+        def failed(error):
+            current["job"] = None
+            start_btn.config(state="normal")
+            self.attendance_changed()
+            messagebox.showerror("Import Error", str(error), parent=win)
+
+        def start():
+            path = path_var.get().strip()
+            if not path:
+                messagebox.showwarning("Input Error", "Please choose a file.", parent=win)
+                return
+            try:
+                batch_size = max(1, int(batch_var.get()))
+            except (tk.TclError, ValueError):
+                messagebox.showwarning(
+                    "Input Error", "Batch size must be a number.", parent=win
+                )
+                return
+
+            actor = self.current_user
+
+            def run(conn, job):
+                return import_attendance(
+                    conn,
+                    path,
+                    batch_size,
+                    progress=lambda r, f: job.progress(r.imported, r.rejected, f),
+                    cancel=job.cancelled,
+                    actor=actor,
+                )
+
+            start_btn.config(state="disabled")
+            status.config(text="Importing...")
+            current["job"] = self.executor.submit(
+                run,
+                on_done=finish,
+                on_error=failed,
+                on_progress=on_progress,
+                owner=win,
+            )
+
+        def cancel():
+            job = current["job"]
+            if job is None:
+                return
+            job.cancel()
+            current["job"] = None
+            start_btn.config(state="normal")
+            status.config(text="Cancelled. Batches already committed are kept.")
+            self.attendance_changed()
+
+        def close():
+            cancel()
+            win.destroy()
+
+        win.protocol("WM_DELETE_WINDOW", close)
+
+        btn_frame = tk.Frame(win)
+        btn_frame.pack(pady=10)
+        start_btn = tk.Button(
+            btn_frame,
+            text="Import",
+            font=("Times New Roman", 12, "bold"),
+            bg="#2e8b57",
+            fg="white",
+            width=8,
+            command=start,
+        )
+        start_btn.pack(side="left", padx=10)
+        tk.Button(
+            btn_frame,
+            text="Cancel",
+            font=("Times New Roman", 12),
+            width=8,
+            command=cancel,
+        ).pack(side="left", padx=10)
 
     # ====================================================
     #           RESET PASSWORD (FORGOT)
@@ -534,40 +1067,25 @@ class AttendanceApp:
             new_pw = new_pass_entry.get().strip()
             confirm_pw = confirm_entry.get().strip()
 
-            if not username or not new_pw or not confirm_pw:
-                messagebox.showwarning(
-                    "Input Error", "Please fill in all fields."
-                )
-                return
-            if new_pw != confirm_pw:
-                messagebox.showwarning(
-                    "Input Error", "New password and confirmation do not match."
-                )
-                return
-
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute("SELECT username FROM users WHERE username=?", (username,))
-            row = c.fetchone()
-            if not row:
-                conn.close()
-                messagebox.showerror(
-                    "Error", "Username does not exist in the system."
+            def done(found):
+                if not found:
+                    messagebox.showerror(
+                        "Error", "Username does not exist in the system."
+                    )
+                    return
+                messagebox.showinfo(
+                    "Success",
+                    f"Password has been reset successfully for user '{username}'.",
                 )
-                return
-
-            c.execute(
-                "UPDATE users SET password=? WHERE username=?",
-                (new_pw, username),
+                win.destroy()
+
+            self.run(
+                lambda service: service.users.reset_password(
+                    username, new_pw, confirm_pw
+                ),
+                on_done=done,
+                parent=win,
             )
-            conn.commit()
-            conn.close()
-
-            messagebox.showinfo(
-                "Success",
-                f"Password has been reset successfully for user '{username}'.",
-            )
-            win.destroy()
 
         btn_frame = tk.Frame(win)
         btn_frame.pack(pady=10)
@@ -640,43 +1158,26 @@ class AttendanceApp:
             cur_pw = current_entry.get().strip()
             new_pw = new_entry.get().strip()
             cf_pw = confirm_entry.get().strip()
-
-            if not cur_pw or not new_pw or not cf_pw:
-                messagebox.showwarning(
-                    "Input Error", "Please fill in all fields."
-                )
-                return
-            if new_pw != cf_pw:
-                messagebox.showwarning(
-                    "Input Error", "New password and confirmation do not match."
+            username = self.current_user
+
+            def done(updated):
+                if not updated:
+                    messagebox.showerror(
+                        "Error", "Current password is incorrect."
+                    )
+                    return
+                messagebox.showinfo(
+                    "Success", "Your password has been updated successfully."
                 )
-                return
-
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute(
-                "SELECT username FROM users WHERE username=? AND password=?",
-                (self.current_user, cur_pw),
+                win.destroy()
+
+            self.run(
+                lambda service: service.users.change_password(
+                    username, cur_pw, new_pw, cf_pw
+                ),
+                on_done=done,
+                parent=win,
             )
-            row = c.fetchone()
-            if not row:
-                conn.close()
-                messagebox.showerror(
-                    "Error", "Current password is incorrect."
-                )
-                return
-
-            c.execute(
-                "UPDATE users SET password=? WHERE username=?",
-                (new_pw, self.current_user),
-            )
-            conn.commit()
-            conn.close()
-
-            messagebox.showinfo(
-                "Success", "Your password has been updated successfully."
-            )
-            win.destroy()
 
         btn_frame = tk.Frame(win)
         btn_frame.pack(pady=10)
@@ -703,7 +1204,7 @@ class AttendanceApp:
     def open_history_window(self):
         win = tk.Toplevel(self.root)
         win.title("Attendance History")
-        win.geometry("800x400")
+        win.geometry("800x440")
         win.resizable(False, False)
 
         filter_frame = tk.Frame(win)
@@ -712,49 +1213,159 @@ class AttendanceApp:
         tk.Label(filter_frame, text="Student ID:", font=("Times New Roman", 11)).grid(
             row=0, column=0, padx=5, pady=5
         )
-        sid_entry = tk.Entry(filter_frame, font=("Times New Roman", 11), width=15)
+        sid_var = tk.StringVar()
+        sid_entry = tk.Entry(
+            filter_frame, textvariable=sid_var, font=("Times New Roman", 11), width=15
+        )
         sid_entry.grid(row=0, column=1, padx=5)
 
         tk.Label(filter_frame, text="Student Name:", font=("Times New Roman", 11)).grid(
             row=0, column=2, padx=5, pady=5
         )
-        name_entry = tk.Entry(filter_frame, font=("Times New Roman", 11), width=20)
+        name_var = tk.StringVar()
+        name_entry = tk.Entry(
+            filter_frame, textvariable=name_var, font=("Times New Roman", 11), width=20
+        )
         name_entry.grid(row=0, column=3, padx=5)
 
-        cols = ("id", "student_id", "student_name", "date", "status")
-        tree = ttk.Treeview(win, columns=cols, show="headings", height=12)
-        for c in cols:
-            tree.heading(c, text=c.capitalize())
-            tree.column(c, width=140, anchor="center")
-        tree.pack(pady=10, fill="x", padx=10)
+        # Date range (YYYY-MM-DD, inclusive), class and status
+        range_frame = tk.Frame(win)
+        range_frame.pack()
 
-        def load_history():
-            for i in tree.get_children():
-                tree.delete(i)
+        tk.Label(range_frame, text="From:", font=("Times New Roman", 11)).grid(
+            row=0, column=0, padx=5
+        )
+        from_var = tk.StringVar()
+        from_entry = tk.Entry(
+            range_frame, textvariable=from_var, font=("Times New Roman", 11), width=11
+        )
+        from_entry.grid(row=0, column=1, padx=5)
 
-            sid = sid_entry.get().strip()
-            sname = name_entry.get().strip()
+        tk.Label(range_frame, text="To:", font=("Times New Roman", 11)).grid(
+            row=0, column=2, padx=5
+        )
+        to_var = tk.StringVar()
+        to_entry = tk.Entry(
+            range_frame, textvariable=to_var, font=("Times New Roman", 11), width=11
+        )
+        to_entry.grid(row=0, column=3, padx=5)
 
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            query = "SELECT * FROM attendance WHERE 1=1"
-            params = []
+        tk.Label(range_frame, text="Class:", font=("Times New Roman", 11)).grid(
+            row=0, column=4, padx=5
+        )
+        class_box = ttk.Combobox(range_frame, state="readonly", width=22)
+        class_box.grid(row=0, column=5, padx=5)
+        class_ids = {"(all classes)": None}
+        class_box["values"] = list(class_ids)
+        class_box.current(0)
+
+        def fill_classes(rows):
+            for class_id, label in rows:
+                class_ids[label] = class_id
+            class_box["values"] = list(class_ids)
+
+        self.run(
+            lambda service: service.classes.choices(), on_done=fill_classes, parent=win
+        )
 
-            if sid:
-                query += " AND student_id LIKE ?"
-                params.append(f"%{sid}%")
-            if sname:
-                query += " AND student_name LIKE ?"
-                params.append(f"%{sname}%")
+        tk.Label(range_frame, text="Status:", font=("Times New Roman", 11)).grid(
+            row=0, column=6, padx=5
+        )
+        status_box = ttk.Combobox(
+            range_frame, state="readonly", width=9, values=("(all)",) + STATUSES
+        )
+        status_box.grid(row=0, column=7, padx=5)
+        status_box.current(0)
 
-            query += " ORDER BY date DESC"
+        # Archived terms are only searched when asked
+        archives_var = tk.IntVar(value=0)
 
-            c.execute(query, params)
-            rows = c.fetchall()
-            conn.close()
+        cols = ("id", "student_id", "student_name", "date", "status")
+        table = PagedTreeview(
+            win, self.executor, cols, height=12, col_width=140, bg=None, cache_size=32
+        )
+        table.pack(pady=10, fill="x", padx=10)
+        # Rows written while the window is open are merged in as they commit
+        def on_changes(changes):
+            if changes.reload:
+                table.refresh()
+                return
+            table.refresh_ids(
+                changed_ids(changes.events, table.shown_ids(), table.source == ALL_VIEW)
+            )
 
-            for r in rows:
-                tree.insert("", tk.END, values=r)
+        self.subscribe_window(win, on_changes)
+
+        def current_filters():
+            """The filters as history_query arguments; ValueError on a bad day."""
+            start, end = day_range(from_var.get().strip(), to_var.get().strip())
+            status = status_box.get()
+            return {
+                "student_id": sid_var.get().strip(),
+                "student_name": name_var.get().strip(),
+                "start": start,
+                "end": end,
+                "class_id": class_ids.get(class_box.get()),
+                "status": status if status in STATUSES else None,
+            }
+
+        def load_history(quiet=False):
+            debounce.cancel()
+            try:
+                f = current_filters()
+            except ValueError:
+                # Half-typed dates are normal while typing
+                if not quiet:
+                    messagebox.showwarning(
+                        "Input Error", "Dates must look like 2024-09-30.", parent=win
+                    )
+                return
+
+            where, params = attendance_search_clause(
+                f["student_id"], f["student_name"], use_index=self.search_indexed
+            )
+            range_where, range_params = attendance_range_clause(
+                f["start"], f["end"], f["class_id"], f["status"]
+            )
+            # ts, not the computed date column, so the range uses its index
+            scope_where, scope_params = self.attendance_scope
+            # Archived terms are attached to the worker's connection first
+            archived = bool(archives_var.get())
+            table.set_source(
+                ALL_VIEW if archived else "attendance",
+                f"{scope_where} AND {where} AND {range_where}",
+                [*scope_params, *params, *range_params],
+                order_by=("ts", "id"),
+                prepare=attach_archives if archived else None,
+            )
+
+        def export_history():
+            try:
+                f = current_filters()
+            except ValueError:
+                messagebox.showwarning(
+                    "Input Error", "Dates must look like 2024-09-30.", parent=win
+                )
+                return
+            archived = bool(archives_var.get())
+
+            def make_query(conn):
+                source = attach_archives(conn) if archived else "attendance"
+                return history_query(
+                    conn, scope=self.attendance_scope, source=source, **f
+                )
+
+            self.export_results(win, make_query, "attendance_history")
+
+        # Search as you type: one query once typing pauses; a newer search
+        # cancels the one still running
+        debounce = Debouncer(win, SEARCH_DEBOUNCE_MS, lambda: load_history(True))
+        for var in (sid_var, name_var, from_var, to_var):
+            var.trace_add("write", debounce.trigger)
+        for entry in (sid_entry, name_entry, from_entry, to_entry):
+            entry.bind("<Return>", lambda e: load_history())
+        for box in (class_box, status_box):
+            box.bind("<<ComboboxSelected>>", lambda e: load_history())
 
         tk.Button(
             filter_frame,
@@ -766,44 +1377,279 @@ class AttendanceApp:
             command=load_history,
         ).grid(row=0, column=4, padx=5)
 
+        tk.Button(
+            filter_frame,
+            text="Export",
+            font=("Times New Roman", 11),
+            bg="#6c757d",
+            fg="white",
+            width=10,
+            command=export_history,
+        ).grid(row=0, column=5, padx=5)
+
+        tk.Checkbutton(
+            filter_frame,
+            text="All terms",
+            variable=archives_var,
+            font=("Times New Roman", 11),
+            command=load_history,
+        ).grid(row=0, column=6, padx=5)
+
         load_history()
 
     def open_report_window(self):
         win = tk.Toplevel(self.root)
         win.title("Attendance Report")
-        win.geometry("700x380")
+        win.geometry("800x400")
         win.resizable(False, False)
 
-        tk.Label(
-            win,
-            text="Attendance Summary by Student",
-            font=("Times New Roman", 14, "bold"),
-        ).pack(pady=10)
+        top = tk.Frame(win)
+        top.pack(pady=10)
+        title = tk.Label(top, font=("Times New Roman", 14, "bold"))
+        title.pack(side="left", padx=10)
 
-        cols = ("student_id", "student_name", "total", "present", "absent", "late")
-        tree = ttk.Treeview(win, columns=cols, show="headings", height=12)
-        for c in cols:
-            tree.heading(c, text=c.replace("_", " ").title())
-            tree.column(c, width=110, anchor="center")
+        views = {"student": "By student", **VIEWS}
+        view_box = ttk.Combobox(
+            top, state="readonly", width=14, values=list(views.values())
+        )
+        view_box.pack(side="left", padx=10)
+        view_box.current(0)
+
+        # Archived terms are only counted when asked (the By student view;
+        # the analytics views cover the current term)
+        archives_var = tk.IntVar(value=0)
+        tk.Checkbutton(
+            top,
+            text="All terms",
+            variable=archives_var,
+            font=("Times New Roman", 11),
+            command=lambda: show("student") if shown["view"] == "student" else None,
+        ).pack(side="left", padx=10)
+
+        tree = ttk.Treeview(win, show="headings", height=12)
         tree.pack(pady=10, fill="x", padx=10)
+        # Rows are shown with their group key in a hidden last column: a
+        # student id, or the class/course/day/week of rollup()'s keys.
+        # Analytics labels can repeat, so they can't be the key.
+        table = TableBinding(tree, key=operator.itemgetter(-1))
+        shown = {"view": None, "header": (), "rows": [], "filled": None,
+                 "added": [], "counting": False}
+
+        def fill(view, header, rows, keys=None):
+            if shown["view"] != view:
+                return
+            if shown["filled"] != view:
+                table.clear()
+                tree["columns"] = (*header, "key")
+                tree["displaycolumns"] = header
+                width = 760 // len(header)
+                for c in header:
+                    tree.heading(c, text=c.replace("_", " ").title())
+                    tree.column(c, width=width, anchor="center")
+            if keys is None:
+                keys = [r[0] for r in rows]
+            # Refreshing the same view only touches the rows that changed
+            table.set_rows([(*r, k) for r, k in zip(rows, keys)])
+            shown["filled"] = view
+            shown["header"] = header
+            shown["rows"] = rows
+
+        loading = {"job": None}
+
+        def load_views():
+            # One aggregate read serves every analytics view
+            if loading["job"] is not None:
+                return
+            generation = self.analytics.generation
+
+            def loaded(cube):
+                loading["job"] = None
+                self.analytics.store(cube, generation)
+                view = shown["view"]
+                if view == "student":
+                    return
+                if self.analytics.cube is None:
+                    # Attendance was saved while reading; read again
+                    load_views()
+                else:
+                    fill(view, *self.analytics.view(view))
+
+            def failed(error):
+                loading["job"] = None
+                self.show_db_error(error)
+
+            loading["job"] = self.executor.submit(
+                lambda conn, job: load_cube(conn),
+                on_done=loaded,
+                on_error=failed,
+                owner=win,
+            )
+
+        def show(view):
+            shown["view"] = view
+            title.config(text=f"Attendance Summary {views[view]}")
+            if view == "student":
+                # Counts are kept up to date by triggers on attendance_records
+                archived = bool(archives_var.get())
+                self.run(
+                    lambda service: service.attendance.report(archived),
+                    on_done=lambda rows: fill(view, StudentSummary._fields, rows),
+                    parent=win,
+                    key=(win, "report"),
+                )
+                return
+            result = self.analytics.view(view)
+            if result is None:
+                load_views()
+            else:
+                fill(view, *result)
+
+        def on_view_selected(event):
+            show(list(views)[view_box.current()])
+
+        def export():
+            if shown["view"] == "student":
+                archived = bool(archives_var.get())
+                self.export_results(
+                    win,
+                    lambda conn: report_query(conn, archived),
+                    "attendance_report",
+                )
+                return
+            # Analytics views are already in memory and small
+            path = filedialog.asksaveasfilename(
+                parent=win,
+                initialfile=f"attendance_{shown['view']}",
+                defaultextension=".csv",
+                filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx")],
+            )
+            if not path:
+                return
+            try:
+                export_rows(shown["rows"], shown["header"], path)
+            except (OSError, ValueError, ImportError) as e:
+                messagebox.showerror("Export Error", str(e), parent=win)
+
+        def on_changes(changes):
+            view = shown["view"]
+            if view != "student":
+                # on_attendance_events has already updated the cube
+                if self.analytics.cube is None:
+                    load_views()
+                else:
+                    fill(view, *self.analytics.view(view))
+            elif shown["filled"] == view and not changes.reload and all(
+                e.kind == "attendance.add" for e in changes.events
+            ):
+                # New rows are counted in on a worker; no query
+                shown["added"].extend(changes.rows)
+                if not shown["counting"]:
+                    count_added(view)
+            else:
+                show(view)
+
+        def count_added(view):
+            summary, added = shown["rows"], shown["added"]
+            shown["added"] = []
+            shown["counting"] = True
+
+            def counted(rows):
+                shown["counting"] = False
+                # Unless the table was refilled meanwhile
+                if shown["rows"] is summary:
+                    fill(view, shown["header"], rows)
+                if shown["added"]:
+                    count_added(view)
+
+            def failed(error):
+                shown["counting"] = False
+                shown["added"] = []
+                show(view)
+
+            self.executor.submit(
+                lambda conn, job: add_to_summary(summary, added),
+                on_done=counted,
+                on_error=failed,
+                owner=win,
+            )
+
+        self.subscribe_window(win, on_changes)
+        view_box.bind("<<ComboboxSelected>>", on_view_selected)
+
+        tk.Button(
+            win,
+            text="Export",
+            font=("Times New Roman", 11),
+            bg="#6c757d",
+            fg="white",
+            width=10,
+            command=export,
+        ).pack()
+
+        show("student")
+        # Read the analytics cube now so switching views is instant
+        if self.analytics.cube is None:
+            load_views()
+
+    def export_results(self, parent, make_query, default_name):
+        """Ask for a file and stream a query's rows into it off the Tk thread.
+
+        ``make_query(conn)`` runs on the worker and returns the
+        ``(sql, params, header)`` to export.
+        """
+        path = filedialog.asksaveasfilename(
+            parent=parent,
+            initialfile=default_name,
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx")],
+        )
+        if not path:
+            return
+
+        win = tk.Toplevel(parent)
+        win.title("Exporting")
+        win.geometry("360x130")
+        win.resizable(False, False)
+
+        status = tk.Label(win, text="Exporting...", font=("Times New Roman", 11))
+        status.pack(pady=10)
+        bar = ttk.Progressbar(win, length=300, maximum=1.0)
+        bar.pack(pady=5)
+
+        def run(conn, job):
+            return export_query(
+                conn,
+                *make_query(conn),
+                path,
+                progress=job.progress,
+                cancel=job.cancelled,
+            )
+
+        def on_progress(written, total):
+            bar.configure(value=written / total if total else 1.0)
+            status.config(text=f"Exported {written} of {total} rows")
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            SELECT student_id,
-                   student_name,
-                   COUNT(*) AS total,
-                   SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END) AS present_cnt,
-                   SUM(CASE WHEN status='Absent' THEN 1 ELSE 0 END) AS absent_cnt,
-                   SUM(CASE WHEN status='Late' THEN 1 ELSE 0 END) AS late_cnt
-            FROM attendance
-            GROUP BY student_id, student_name
-        """)
-        rows = c.fetchall()
-        conn.close()
-
-        for r in rows:
-            tree.insert("", tk.END, values=r)
+        def done(written):
+            win.destroy()
+            messagebox.showinfo(
+                "Export", f"Exported {written} rows to\n{path}", parent=parent
+            )
+
+        def failed(error):
+            win.destroy()
+            messagebox.showerror("Export Error", str(error), parent=parent)
+
+        job = self.executor.submit(
+            run, on_done=done, on_error=failed, on_progress=on_progress, owner=win
+        )
+
+        def cancel():
+            # The job removes the partial file when it stops
+            job.cancel()
+            win.destroy()
+
+        tk.Button(win, text="Cancel", width=8, command=cancel).pack(pady=5)
+        win.protocol("WM_DELETE_WINDOW", cancel)
 
     # ====================================================
     #           ADMIN – MANAGE ACCOUNTS
@@ -842,6 +1688,13 @@ class AttendanceApp:
         self.admin_role.grid(row=0, column=5, padx=5, pady=5)
         self.admin_role.current(2)  # default student
 
+        # Student accounts only see the attendance of this student
+        tk.Label(
+            top, text="Student ID:", font=("Times New Roman", 12), bg="white"
+        ).grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        self.admin_student_id = tk.Entry(top, font=("Times New Roman", 12), width=18)
+        self.admin_student_id.grid(row=1, column=1, padx=5, pady=5)
+
         btn_frame = tk.Frame(frame, bg="white")
         btn_frame.pack(pady=5)
 
@@ -865,85 +1718,51 @@ class AttendanceApp:
             command=self.admin_delete_user,
         ).pack(side="left", padx=5)
 
-        cols = ("username", "role")
+        cols = ("username", "role", "student_id")
         self.users_tree = ttk.Treeview(frame, columns=cols, show="headings", height=12)
         for c in cols:
-            self.users_tree.heading(c, text=c.capitalize())
+            self.users_tree.heading(c, text=c.replace("_", " ").title())
             self.users_tree.column(c, width=200, anchor="center")
         self.users_tree.pack(pady=10, fill="x", padx=10)
 
         self.users_tree.bind("<<TreeviewSelect>>", self.on_select_user)
+        self.users_table = TableBinding(
+            self.users_tree, key=operator.attrgetter("username")
+        )
 
         self.reload_users_table()
 
     def reload_users_table(self):
-        for i in self.users_tree.get_children():
-            self.users_tree.delete(i)
-
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT username, role FROM users ORDER BY username")
-        rows = c.fetchall()
-        conn.close()
-
-        for r in rows:
-            self.users_tree.insert("", tk.END, values=r)
+        self.users_table.set_rows(self.service.users.all())
 
     def on_select_user(self, event):
         sel = self.users_tree.selection()
         if not sel:
             return
-        item = self.users_tree.item(sel[0])
-        username, role = item["values"]
+        # Not item["values"]: Tk would turn a student id like "007" into 7
+        username, role, student_id = self.users_table.row(sel[0])
         self.admin_username.delete(0, tk.END)
         self.admin_username.insert(0, username)
         self.admin_role_var.set(role)
+        self.admin_student_id.delete(0, tk.END)
+        self.admin_student_id.insert(0, student_id)
         # Password không load lại (bảo mật), user sẽ nhập mới nếu muốn update
 
     def admin_add_update_user(self):
         username = self.admin_username.get().strip()
         password = self.admin_password.get().strip()
         role = self.admin_role_var.get().strip()
+        student_id = self.admin_student_id.get().strip()
 
-        if not username or not role:
-            messagebox.showwarning(
-                "Input Error", "Please enter username and select a role."
-            )
-            return
-
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT username FROM users WHERE username=?", (username,))
-        row = c.fetchone()
-
-        if row:
-            # Update
-            if password:
-                c.execute(
-                    "UPDATE users SET password=?, role=? WHERE username=?",
-                    (password, role, username),
-                )
-            else:
-                c.execute(
-                    "UPDATE users SET role=? WHERE username=?",
-                    (role, username),
-                )
-        else:
-            if not password:
-                messagebox.showwarning(
-                    "Input Error", "Please enter a password for new account."
-                )
-                conn.close()
-                return
-            c.execute(
-                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                (username, password, role),
-            )
+        def saved(_):
+            self.reload_users_table()
+            messagebox.showinfo("Success", "Account has been saved successfully.")
 
-        conn.commit()
-        conn.close()
-        self.reload_users_table()
-        messagebox.showinfo("Success", "Account has been saved successfully.")
+        # Hashing a new password is slow; save on a worker
+        self.run(
+            lambda service: service.users.save(username, role, password, student_id),
+            on_done=saved,
+        )
 
     def admin_delete_user(self):
         sel = self.users_tree.selection()
@@ -951,8 +1770,7 @@ class AttendanceApp:
             messagebox.showwarning("Warning", "Please select an account to delete.")
             return
 
-        item = self.users_tree.item(sel[0])
-        username = item["values"][0]
+        username = self.users_table.row(sel[0]).username
 
         if username == "admin":
             messagebox.showwarning("Warning", "Cannot delete default admin account.")
@@ -963,12 +1781,13 @@ class AttendanceApp:
         ):
             return
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("DELETE FROM users WHERE username=?", (username,))
-        conn.commit()
-        conn.close()
+        try:
+            self.service.users.delete(username)
+        except ValidationError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
 
+        self.known_users.invalidate()
         self.reload_users_table()
         messagebox.showinfo("Deleted", "Account deleted successfully.")
 
@@ -1026,28 +1845,21 @@ class AttendanceApp:
         self.courses_tree.pack(pady=10, fill="x", padx=10)
 
         self.courses_tree.bind("<<TreeviewSelect>>", self.on_select_course)
+        self.courses_table = TableBinding(
+            self.courses_tree, key=operator.attrgetter("id")
+        )
 
         self.reload_courses_table()
 
     def reload_courses_table(self):
-        for i in self.courses_tree.get_children():
-            self.courses_tree.delete(i)
-
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id, course_code, course_name FROM courses ORDER BY id")
-        rows = c.fetchall()
-        conn.close()
-
-        for r in rows:
-            self.courses_tree.insert("", tk.END, values=r)
+        self.courses_table.set_rows(self.service.courses.all())
 
     def on_select_course(self, event):
         sel = self.courses_tree.selection()
         if not sel:
             return
-        item = self.courses_tree.item(sel[0])
-        _, code, name = item["values"]
+        # The bound row, not item["values"]: Tk turns a code like "007" into 7
+        _, code, name = self.courses_table.row(sel[0])
         self.course_code.delete(0, tk.END)
         self.course_code.insert(0, code)
         self.course_name.delete(0, tk.END)
@@ -1057,21 +1869,12 @@ class AttendanceApp:
         code = self.course_code.get().strip()
         name = self.course_name.get().strip()
 
-        if not code or not name:
-            messagebox.showwarning(
-                "Input Error", "Please enter course code and course name."
-            )
+        try:
+            self.service.courses.add(code, name)
+        except ValidationError as e:
+            messagebox.showwarning("Input Error", str(e))
             return
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO courses (course_code, course_name) VALUES (?, ?)",
-            (code, name),
-        )
-        conn.commit()
-        conn.close()
-
         self.reload_courses_table()
         messagebox.showinfo("Success", "Course added successfully.")
 
@@ -1081,17 +1884,12 @@ class AttendanceApp:
             messagebox.showwarning("Warning", "Please select a course to delete.")
             return
 
-        item = self.courses_tree.item(sel[0])
-        course_id = item["values"][0]
+        course_id = self.courses_table.row(sel[0]).id
 
         if not messagebox.askyesno("Confirm", "Delete selected course?"):
             return
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("DELETE FROM courses WHERE id=?", (course_id,))
-        conn.commit()
-        conn.close()
+        self.service.courses.delete(course_id)
 
         self.reload_courses_table()
         messagebox.showinfo("Deleted", "Course deleted successfully.")
@@ -1159,46 +1957,29 @@ class AttendanceApp:
         self.classes_tree.pack(pady=10, fill="x", padx=10)
 
         self.classes_tree.bind("<<TreeviewSelect>>", self.on_select_class)
+        self.classes_table = TableBinding(
+            self.classes_tree, key=operator.attrgetter("id")
+        )
 
         self.reload_classes_table()
         self.reload_courses_to_combo()
 
     def reload_courses_to_combo(self):
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id, course_name FROM courses ORDER BY course_name")
-        rows = c.fetchall()
-        conn.close()
+        rows = self.service.courses.by_name()
 
         self.course_list = rows
-        names = [r[1] for r in rows]
+        names = [r.name for r in rows]
         self.class_course_combo["values"] = names
 
     def reload_classes_table(self):
-        for i in self.classes_tree.get_children():
-            self.classes_tree.delete(i)
-
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            SELECT classes.id, classes.class_code, classes.class_name,
-                   COALESCE(courses.course_name, '')
-            FROM classes
-            LEFT JOIN courses ON classes.course_id = courses.id
-            ORDER BY classes.id
-        """)
-        rows = c.fetchall()
-        conn.close()
-
-        for r in rows:
-            self.classes_tree.insert("", tk.END, values=r)
+        self.classes_table.set_rows(self.service.classes.all())
 
     def on_select_class(self, event):
         sel = self.classes_tree.selection()
         if not sel:
             return
-        item = self.classes_tree.item(sel[0])
-        _, code, name, course_name = item["values"]
+        # The bound row, not item["values"]: Tk turns a code like "007" into 7
+        _, code, name, course_name = self.classes_table.row(sel[0])
         self.class_code.delete(0, tk.END)
         self.class_code.insert(0, code)
         self.class_name.delete(0, tk.END)
@@ -1210,27 +1991,18 @@ class AttendanceApp:
         name = self.class_name.get().strip()
         cname = self.class_course_var.get().strip()
 
-        if not code or not name:
-            messagebox.showwarning(
-                "Input Error", "Please enter class code and class name."
-            )
-            return
-
         course_id = None
         if cname:
-            for (cid, n) in getattr(self, "course_list", []):
-                if n == cname:
-                    course_id = cid
+            for course in getattr(self, "course_list", []):
+                if course.name == cname:
+                    course_id = course.id
                     break
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO classes (class_code, class_name, course_id) VALUES (?, ?, ?)",
-            (code, name, course_id),
-        )
-        conn.commit()
-        conn.close()
+        try:
+            self.service.classes.add(code, name, course_id)
+        except ValidationError as e:
+            messagebox.showwarning("Input Error", str(e))
+            return
 
         self.reload_classes_table()
         messagebox.showinfo("Success", "Class added successfully.")
@@ -1241,17 +2013,12 @@ class AttendanceApp:
             messagebox.showwarning("Warning", "Please select a class to delete.")
             return
 
-        item = self.classes_tree.item(sel[0])
-        class_id = item["values"][0]
+        class_id = self.classes_table.row(sel[0]).id
 
         if not messagebox.askyesno("Confirm", "Delete selected class?"):
             return
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("DELETE FROM classes WHERE id=?", (class_id,))
-        conn.commit()
-        conn.close()
+        self.service.classes.delete(class_id)
 
         self.reload_classes_table()
         messagebox.showinfo("Deleted", "Class deleted successfully.")
@@ -1259,6 +2026,14 @@ class AttendanceApp:
 
 # =================== RUN ===================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Student Attendance System")
+    parser.add_argument("--db", default=DB_FILE, help="database file")
+    parser.add_argument(
+        "--profile", default=DEFAULT_PROFILE, choices=sorted(STORAGE_PROFILES),
+        help="storage profile; wal only for a database on a local disk",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
     root = tk.Tk()
-    app = AttendanceApp(root)
+    app = AttendanceApp(root, args.db, args.profile)
     root.mainloop()
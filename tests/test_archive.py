@@ -0,0 +1,71 @@
+"""Archiving terms and reading across them."""
+import os
+import tempfile
+import unittest
+
+from archive import ALL_VIEW, _slots, archive_term, attach_archives, restore_term, terms
+from db import Database, init_db
+from exporter import report_query
+from service import AttendanceService, ValidationError
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = Database(os.path.join(self.tmp.name, "attendance.db"))
+        self.addCleanup(self.db.close)
+        init_db(self.db.conn)
+        self.service = AttendanceService(self.db.conn, "teacher")
+
+    def add(self, student_id, date):
+        self.service.attendance.add(student_id, "An", "Present", date)
+
+    def test_nothing_to_archive(self):
+        with self.assertRaises(ValidationError):
+            self.service.attendance.reset()
+        with self.assertRaises(ValueError):
+            archive_term(self.db.conn, "empty")
+        self.assertEqual(terms(self.db.conn), [])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "archives")))
+
+    def test_resets_share_one_archive(self):
+        for day in ("2026-09-01", "2026-09-02", "2026-09-03"):
+            self.add("SV001", f"{day} 08:00")
+            self.assertEqual(self.service.attendance.reset(), ("reset", 1))
+        (term, _, _, _, rows, _), = terms(self.db.conn)
+        self.assertEqual((term, rows), ("reset", 3))
+        self.assertEqual(restore_term(self.db.conn, "reset"), 3)
+        self.assertEqual(len(self.service.attendance.history()), 3)
+
+    def test_more_archives_than_attachments(self):
+        count = _slots(self.db.conn) + 3
+        for n in range(count):
+            self.add(f"SV{n:03d}", f"2025-01-{n + 1:02d} 08:00")
+            archive_term(self.db.conn, f"term-{n}")
+        self.add("SV999", "2026-09-01 08:00")
+
+        history = self.service.attendance.history(include_archives=True)
+        self.assertEqual(len(history), count + 1)
+        report = self.service.attendance.report(include_archives=True)
+        self.assertEqual(sum(s.total for s in report), count + 1)
+
+        # Restoring one term is seen on the next read
+        restore_term(self.db.conn, "term-0")
+        source = attach_archives(self.db.conn)
+        self.assertEqual(source, ALL_VIEW)
+        (total,) = self.db.conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()
+        self.assertEqual(total, count + 1)
+
+    def test_report_across_terms(self):
+        self.add("SV001", "2026-09-01 08:00")
+        self.service.attendance.reset()
+        self.add("SV001", "2026-10-01 08:00")
+        for include_archives, total in ((False, 1), (True, 2)):
+            sql, params, _ = report_query(self.db.conn, include_archives)
+            (row,) = self.db.conn.execute(sql, params).fetchall()
+            self.assertEqual(row[:3], ("SV001", "An", total))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Report views whose labels repeat still bind one tree row per group."""
+import operator
+import unittest
+
+from analytics import NO_COURSE, Cube, rollup
+from widgets import TableBinding
+
+
+class StrictTree:
+    """Just enough of a ttk.Treeview; refuses a duplicate iid like Tk."""
+
+    def __init__(self):
+        self.items = {}
+
+    def insert(self, parent, index, iid=None, values=()):
+        if iid in self.items:
+            raise ValueError(f"Item {iid} already exists")
+        self.items[iid] = values
+        return iid
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.items[iid]
+
+    def get_children(self, item=""):
+        return tuple(self.items)
+
+    def item(self, iid, values=None):
+        self.items[iid] = values
+
+    def move(self, iid, parent, index):
+        pass
+
+    def winfo_exists(self):
+        return True
+
+    def after_idle(self, fn):
+        fn()
+
+    def after_cancel(self, after_id):
+        pass
+
+
+# Classes 1 and 2 share a code and name. Class 2's course was deleted and
+# class 3 never had one, so both show as "(no course)".
+CUBE = Cube(
+    cells=[
+        (0, 1, "Present", 3),
+        (0, 2, "Late", 2),
+        (1, 2, "Present", 1),
+        (1, 3, "Absent", 4),
+    ],
+    classes={1: ("K1 - A", 7), 2: ("K1 - A", 9), 3: ("K2 - B", None)},
+    courses={7: "Math"},
+)
+
+
+class RollupKeysTest(unittest.TestCase):
+    def test_labels_repeat_keys_do_not(self):
+        _, rows, keys = rollup(CUBE, "class")
+        self.assertEqual([r[0] for r in rows], ["K1 - A", "K1 - A", "K2 - B"])
+        self.assertEqual(sorted(keys), [1, 2, 3])
+
+        _, rows, keys = rollup(CUBE, "course")
+        self.assertEqual([r[0] for r in rows].count(NO_COURSE), 2)
+        self.assertEqual(len(set(keys)), len(rows))
+
+    def test_every_view_has_a_key_per_row(self):
+        for view in ("class", "course", "day", "week", "late"):
+            _, rows, keys = rollup(CUBE, view)
+            self.assertEqual(len(keys), len(rows), view)
+            self.assertEqual(len(set(keys)), len(keys), view)
+
+    def test_binding_on_keys(self):
+        # As the report window binds them: key in a hidden last column
+        for view in ("class", "course"):
+            tree = StrictTree()
+            table = TableBinding(tree, key=operator.itemgetter(-1))
+            _, rows, keys = rollup(CUBE, view)
+            table.set_rows([(*r, k) for r, k in zip(rows, keys)])
+            self.assertEqual(len(tree.items), len(rows))
+            # Refreshing applies a diff over the same keys
+            table.set_rows([(*r, k) for r, k in zip(rows, keys)])
+            self.assertEqual(len(tree.items), len(rows))
+
+    def test_binding_on_labels_breaks(self):
+        tree = StrictTree()
+        table = TableBinding(tree, key=operator.itemgetter(0))
+        _, rows, _ = rollup(CUBE, "class")
+        with self.assertRaises(ValueError):
+            table.set_rows(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Students only ever see the attendance of the student they are linked to."""
+import csv
+import os
+import tempfile
+import unittest
+
+from archive import ALL_VIEW, archive_term, attach_archives
+from db import Database, attendance_scope_clause, day_range, init_db
+from exporter import export_query, history_query
+from service import AttendanceService
+
+ROWS = [
+    ("SV001", "An", "Present", "2026-09-01 08:00"),
+    ("SV002", "Binh", "Absent", "2026-09-01 08:05"),
+    ("SV001", "An", "Late", "2026-10-01 08:00"),
+    ("SV002", "Binh", "Present", "2026-10-01 08:05"),
+    ("SV003", "Chi", "Present", "2026-10-01 08:10"),
+]
+
+
+class ScopeClauseTest(unittest.TestCase):
+    def test_staff_see_every_row(self):
+        for role in ("teacher", "admin"):
+            self.assertEqual(attendance_scope_clause(role, "SV001"), ("1=1", []))
+
+    def test_linked_student_sees_own_rows(self):
+        self.assertEqual(
+            attendance_scope_clause("student", "SV001"),
+            ("student_id = ?", ["SV001"]),
+        )
+
+    def test_unlinked_student_sees_nothing(self):
+        for link in (None, ""):
+            self.assertEqual(attendance_scope_clause("student", link), ("0", []))
+
+
+class ScopedQueriesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = Database(os.path.join(self.tmp.name, "attendance.db"))
+        self.addCleanup(self.db.close)
+        init_db(self.db.conn)
+        self.service = AttendanceService(self.db.conn, "teacher")
+        for student_id, name, status, date in ROWS:
+            self.service.attendance.add(student_id, name, status, date)
+        self.service.users.save("an", "student", "secret", "SV001")
+        self.service.users.save("nobody", "student", "secret")
+        self.linked = self.service.users.get("an")
+        self.unlinked = self.service.users.get("nobody")
+        self.teacher = self.service.users.get("teacher")
+
+    def scope(self, user):
+        return attendance_scope_clause(user.role, user.student_id)
+
+    def archive_september(self):
+        start, end = day_range("2026-09-01", "2026-09-30")
+        path = os.path.join(self.tmp.name, "2026-09.db")
+        archive_term(self.db.conn, "2026-09", start, end, path)
+
+    def history_ids(self, user, **kw):
+        rows = self.service.attendance.history(user=user, **kw)
+        return sorted(r.student_id for r in rows)
+
+    def export_ids(self, user, source="attendance", **filters):
+        sql, params, header = history_query(
+            self.db.conn, scope=self.scope(user), source=source, **filters
+        )
+        path = os.path.join(self.tmp.name, "export.csv")
+        export_query(self.db.conn, sql, params, header, path)
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+        return sorted(r["student_id"] for r in rows)
+
+    def test_history(self):
+        self.assertEqual(self.history_ids(self.linked), ["SV001", "SV001"])
+        self.assertEqual(self.history_ids(self.unlinked), [])
+        self.assertEqual(len(self.history_ids(self.teacher)), len(ROWS))
+
+    def test_history_across_terms(self):
+        self.archive_september()
+        self.assertEqual(self.history_ids(self.linked), ["SV001"])
+        self.assertEqual(
+            self.history_ids(self.linked, include_archives=True), ["SV001", "SV001"]
+        )
+        self.assertEqual(self.history_ids(self.unlinked, include_archives=True), [])
+
+    def test_dashboard(self):
+        # What the dashboard table reads (AttendanceApp.load_attendance)
+        where, params = self.scope(self.linked)
+        rows = self.db.conn.execute(
+            f"SELECT student_id FROM attendance WHERE {where}", params
+        ).fetchall()
+        self.assertEqual(rows, [("SV001",), ("SV001",)])
+
+    def test_export(self):
+        self.assertEqual(self.export_ids(self.linked), ["SV001", "SV001"])
+        self.assertEqual(self.export_ids(self.unlinked), [])
+
+    def test_export_filters_stay_in_scope(self):
+        # Searching for another student finds nothing, not their rows
+        self.assertEqual(self.export_ids(self.linked, student_id="SV002"), [])
+        self.assertEqual(self.export_ids(self.linked, student_name="Binh"), [])
+
+    def test_export_across_terms(self):
+        self.archive_september()
+        source = attach_archives(self.db.conn)
+        self.assertEqual(source, ALL_VIEW)
+        self.assertEqual(
+            self.export_ids(self.linked, source=source), ["SV001", "SV001"]
+        )
+        self.assertEqual(self.export_ids(self.unlinked, source=source), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,465 @@
+import operator
+import time
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+
+# =================== DEBOUNCE ===================
+class Debouncer:
+    """Call ``fn`` once input has been quiet for ``delay_ms``.
+
+    Each ``trigger()`` restarts the timer, so a burst of keystrokes ends
+    in a single call.
+    """
+
+    def __init__(self, widget, delay_ms, fn):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        self.fn = fn
+        self._after_id = None
+
+    def trigger(self, *_):
+        self.cancel()
+        self._after_id = self.widget.after(self.delay_ms, self._fire)
+
+    def cancel(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _fire(self):
+        self._after_id = None
+        if self.widget.winfo_exists():
+            self.fn()
+
+
+# =================== SCREENS ===================
+class ScreenManager:
+    """Builds each screen once and swaps them by hiding and showing.
+
+    ``register(name, build, on_show)``: ``build(frame)`` fills a new frame
+    the first time the screen is shown and returns any state it wants
+    handed back; ``on_show(state)`` runs on every show to refresh data.
+    The duration of every switch, including the redraw, is appended to
+    ``timings`` as ``(name, built, seconds)``.
+    """
+
+    def __init__(self, root, bg=None):
+        self.root = root
+        self.bg = bg
+        self.current = None
+        self.timings = []
+        self._builders = {}
+        self._screens = {}
+
+    def register(self, name, build, on_show=None):
+        self._builders[name] = (build, on_show)
+
+    def show(self, name):
+        start = time.perf_counter()
+        build, on_show = self._builders[name]
+        built = name not in self._screens
+        if built:
+            frame = tk.Frame(self.root, bg=self.bg)
+            self._screens[name] = (frame, build(frame))
+        frame, state = self._screens[name]
+        if self.current is not None and self.current != name:
+            self._screens[self.current][0].pack_forget()
+        frame.pack(fill="both", expand=True)
+        self.current = name
+        if on_show is not None:
+            on_show(state)
+        self.root.update_idletasks()
+        self.timings.append((name, built, time.perf_counter() - start))
+
+    def forget(self, name):
+        """Destroy a built screen; the next show builds it again."""
+        screen = self._screens.pop(name, None)
+        if screen is None:
+            return
+        screen[0].destroy()
+        if self.current == name:
+            self.current = None
+
+
+# =================== TABLE BINDING ===================
+# Rows inserted per Tk callback; a few ms of work, so events keep flowing
+# while a long table fills
+CHUNK_SIZE = 200
+# Most rows PagedTreeview.refresh_ids() re-reads; past that a reload is
+# cheaper
+REFRESH_LIMIT = 200
+
+
+class TableBinding:
+    """Keeps a ttk.Treeview showing a list of rows with few Tk calls.
+
+    ``set_rows(rows)`` makes the tree show exactly ``rows``. With a
+    ``key`` (row -> unique id) and at most ``diff_limit`` rows added or
+    removed, it applies a keyed diff: stale rows go in one delete, changed
+    rows are updated in place and new ones inserted where they belong.
+    Otherwise the tree is cleared in one call and refilled. ``append``
+    adds rows at the end. Inserts run ``chunk_size`` at a time: the first
+    chunk at once, the rest from ``after_idle`` callbacks, so a long fill
+    never blocks the event loop. ``rows`` is what the tree shows once the
+    pending chunks are in; ``row(iid)`` is the row behind a shown item,
+    as it was given (item values come back from Tk converted: "007"
+    reads as 7).
+    """
+
+    def __init__(self, tree, key=None, chunk_size=CHUNK_SIZE, diff_limit=None):
+        self.tree = tree
+        self.key = key
+        self.chunk_size = chunk_size
+        self.diff_limit = chunk_size if diff_limit is None else diff_limit
+        self.rows = []
+        self._shown = {}
+        self._pending = []
+        self._after_id = None
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def row(self, iid):
+        return self._shown.get(iid)
+
+    def clear(self):
+        self._cancel()
+        self.tree.delete(*self.tree.get_children())
+        self._shown.clear()
+        self.rows = []
+
+    def set_rows(self, rows):
+        rows = list(rows)
+        if self.key is not None and self._shown and not self._pending:
+            if self._diff(rows):
+                self.rows = rows
+                return
+        self.clear()
+        self.append(rows)
+
+    def append(self, rows):
+        rows = list(rows)
+        self.rows.extend(rows)
+        self._pending.extend(rows)
+        if self._after_id is None:
+            self._insert_chunk()
+
+    def _cancel(self):
+        if self._after_id is not None:
+            self.tree.after_cancel(self._after_id)
+            self._after_id = None
+        self._pending = []
+
+    def _iid(self, row):
+        return str(self.key(row))
+
+    def _insert_chunk(self):
+        self._after_id = None
+        if not self.tree.winfo_exists():
+            self._pending = []
+            return
+        chunk = self._pending[:self.chunk_size]
+        del self._pending[:self.chunk_size]
+        for row in chunk:
+            if self.key is None:
+                self.tree.insert("", tk.END, values=row)
+                continue
+            iid = self._iid(row)
+            self.tree.insert("", tk.END, iid=iid, values=row)
+            self._shown[iid] = row
+        if self._pending:
+            self._after_id = self.tree.after_idle(self._insert_chunk)
+
+    def _diff(self, rows):
+        """Turn the shown rows into ``rows`` in place; False if too many changed."""
+        wanted = [self._iid(r) for r in rows]
+        keep = set(wanted)
+        stale = [iid for iid in self._shown if iid not in keep]
+        added = sum(1 for iid in wanted if iid not in self._shown)
+        if len(stale) + added > self.diff_limit:
+            return False
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self._shown[iid]
+        order = list(self.tree.get_children())
+        for index, (iid, row) in enumerate(zip(wanted, rows)):
+            old = self._shown.get(iid)
+            if old is None:
+                self.tree.insert("", index, iid=iid, values=row)
+                order.insert(index, iid)
+            else:
+                if old != row:
+                    self.tree.item(iid, values=row)
+                if order[index] != iid:
+                    self.tree.move(iid, "", index)
+                    order.remove(iid)
+                    order.insert(index, iid)
+            self._shown[iid] = row
+        return True
+
+
+# =================== PAGED TREEVIEW ===================
+def _comparable(key):
+    # SQLite sorts NULL below every value; None can't be compared
+    return tuple(float("-inf") if v is None else v for v in key)
+
+
+class PagedTreeview(tk.Frame):
+    """Treeview that pulls rows from SQLite one page at a time.
+
+    Rows are read with keyset pagination: each page continues strictly
+    after the key of the last row shown, so fetching page N costs the
+    same as fetching page 1. The first page covers the visible rows plus
+    ``prefetch`` extra rows; the next page is fetched once less than a
+    screenful of loaded rows remains below the view. Pages are read on the
+    DBExecutor, and a reload supersedes any page still in flight.
+
+    The first page of the last ``cache_size`` sources is kept in an LRU.
+    Switching back to a cached source shows it at once and revalidates it
+    in the background. The tree is filled through a TableBinding keyed on
+    ``id`` when ``columns`` contains it, so a new first page that differs
+    in a few rows is applied as a diff, and ``refresh_ids()`` can re-read
+    just the rows that were written.
+    """
+
+    def __init__(self, parent, executor, columns, height=12, prefetch=50,
+                 col_width=150, bg="white", cache_size=16):
+        super().__init__(parent, bg=bg)
+        self.executor = executor
+        self.columns = tuple(columns)
+        self.height = height
+        self.prefetch = prefetch
+        self.cache_size = cache_size
+
+        self.tree = ttk.Treeview(
+            self, columns=self.columns, show="headings", height=height
+        )
+        for c in self.columns:
+            self.tree.heading(c, text=c.capitalize())
+            self.tree.column(c, width=col_width, anchor="center")
+
+        self.scrollbar = ttk.Scrollbar(
+            self, orient="vertical", command=self.tree.yview
+        )
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="x", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        key = None
+        if "id" in self.columns:
+            key = operator.itemgetter(self.columns.index("id"))
+        self.table = TableBinding(self.tree, key)
+
+        self._table = None
+        self._where = "1=1"
+        self._params = ()
+        self._order_by = ("id",)
+        self._prepare = None
+        self._last_key = None
+        self._exhausted = True
+        self._job = None
+        self._cache = OrderedDict()
+        # id -> sort key of every loaded row, to place refreshed rows
+        self._keys = {}
+
+    # ---------- SOURCE ----------
+    def set_source(self, table, where="1=1", params=(), order_by=("id",),
+                   prepare=None):
+        """Point the view at ``table`` filtered by ``where``, newest first.
+
+        ``order_by`` columns must together identify a row uniquely (end
+        with the primary key). Keys that are not in ``columns`` are read
+        along with each page but not shown. ``prepare(conn)`` runs on the
+        worker's connection before every page (see DBExecutor.query).
+        """
+        self._table = table
+        self._where = where
+        self._params = tuple(params)
+        self._order_by = tuple(order_by)
+        self._prepare = prepare
+        self.reload()
+
+    def reload(self):
+        self._last_key = None
+        self._exhausted = self._table is None
+        self._job = None
+        cached = self._cache.get(self._source_key())
+        if cached is not None:
+            self._cache.move_to_end(self._source_key())
+            self.table.set_rows(cached)
+        self._fetch_page()
+
+    def invalidate_cache(self):
+        self._cache.clear()
+
+    def refresh(self):
+        """Re-read the view from its first page, skipping the cache."""
+        self._cache.clear()
+        self.reload()
+
+    def clear(self):
+        """Drop the source, its rows and every cached first page.
+
+        For when the next source belongs to someone else, e.g. on logout:
+        nothing of the old one may show while the new one loads.
+        """
+        if self._job is not None:
+            self._job.cancel()
+        self._job = None
+        self._table = None
+        self._last_key = None
+        self._exhausted = True
+        self._cache.clear()
+        self._keys.clear()
+        self.table.clear()
+
+    @property
+    def source(self):
+        """The table or view the rows come from, None before set_source()."""
+        return self._table
+
+    def shown_ids(self):
+        """Ids of the loaded rows (empty without an ``id`` column)."""
+        return list(self._keys)
+
+    def _source_key(self):
+        return (self._table, self._where, self._params, self._order_by)
+
+    # ---------- PAGING ----------
+    def _selected(self):
+        extra = tuple(k for k in self._order_by if k not in self.columns)
+        return self.columns + extra
+
+    def _page_query(self, limit):
+        cols = ", ".join(self._selected())
+        keys = ", ".join(self._order_by)
+        query = f"SELECT {cols} FROM {self._table} WHERE {self._where}"
+        params = list(self._params)
+        if self._last_key is not None:
+            marks = ", ".join("?" * len(self._order_by))
+            query += f" AND ({keys}) < ({marks})"
+            params.extend(self._last_key)
+        order = ", ".join(f"{k} DESC" for k in self._order_by)
+        query += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        return query, params
+
+    def _fetch_page(self):
+        if self._exhausted or self._job is not None:
+            return
+        limit = self.height + self.prefetch
+        first = self._last_key is None
+        source = self._source_key()
+        query, params = self._page_query(limit)
+        self._job = self.executor.query(
+            query,
+            params,
+            prepare=self._prepare,
+            on_done=lambda rows: self._add_page(rows, limit, first, source),
+            on_error=self._page_failed,
+            key=self,
+            owner=self,
+        )
+
+    def _add_page(self, rows, limit, first, source):
+        self._job = None
+        last = rows[-1] if rows else None
+        if first:
+            self._keys.clear()
+        if self.table.key is not None:
+            # The key column is among the shown ones, so it works on either
+            for row in rows:
+                self._keys[self.table.key(row)] = self._sort_key(row)
+        if len(self._selected()) > len(self.columns):
+            rows = [r[:len(self.columns)] for r in rows]
+        if first:
+            self.table.set_rows(rows)
+            if self.cache_size:
+                self._cache[source] = rows
+                self._cache.move_to_end(source)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        else:
+            self.table.append(rows)
+        if last is not None:
+            self._last_key = self._order_key(last)
+        self._exhausted = len(rows) < limit
+
+    def _order_key(self, row):
+        """The ``order_by`` values of a row as selected by _selected()."""
+        selected = self._selected()
+        return tuple(row[selected.index(k)] for k in self._order_by)
+
+    def _sort_key(self, row):
+        return _comparable(self._order_key(row))
+
+    # ---------- REFRESH ----------
+    def refresh_ids(self, ids):
+        """Re-read the rows with these ids and merge them into the view.
+
+        Rows that no longer exist or match the filter leave the tree; new
+        ones are placed by the sort order if they fall within the rows
+        loaded so far (later ones come with the next pages). Falls back
+        to reload() without an ``id`` column, for more than
+        REFRESH_LIMIT ids, or while the first page is still loading.
+        """
+        ids = sorted(set(ids))
+        if not ids or self._table is None:
+            return
+        # Cached first pages are stale now
+        self._cache.clear()
+        loading = self._last_key is None and not self._exhausted
+        if self.table.key is None or len(ids) > REFRESH_LIMIT or loading:
+            self.reload()
+            return
+        marks = ", ".join("?" * len(ids))
+        query = (
+            f"SELECT {', '.join(self._selected())} FROM {self._table} "
+            f"WHERE ({self._where}) AND id IN ({marks})"
+        )
+        source = self._source_key()
+        self.executor.query(
+            query,
+            [*self._params, *ids],
+            prepare=self._prepare,
+            on_done=lambda rows: self._merge(ids, rows, source),
+            owner=self,
+        )
+
+    def _merge(self, ids, rows, source):
+        if source != self._source_key():
+            return
+        width = len(self.columns)
+        refreshed = set(ids)
+        last = None if self._exhausted else _comparable(self._last_key)
+        for key in refreshed:
+            self._keys.pop(key, None)
+        merged = [r for r in self.table.rows if self.table.key(r) not in refreshed]
+        for full in rows:
+            sort_key = self._sort_key(full)
+            if last is None or sort_key >= last:
+                row = full[:width]
+                self._keys[self.table.key(row)] = sort_key
+                merged.append(row)
+        merged.sort(key=lambda r: self._keys[self.table.key(r)], reverse=True)
+        self.table.set_rows(merged)
+
+    def _page_failed(self, error):
+        self._job = None
+        self._exhausted = True
+        if self.executor.default_on_error is None:
+            raise error
+        self.executor.default_on_error(error)
+
+    # ---------- SCROLLING ----------
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._exhausted or self._job is not None:
+            return
+        loaded = len(self.table.rows)
+        below = (1.0 - float(last)) * loaded
+        if loaded and below < self.height:
+            self._fetch_page()
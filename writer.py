@@ -0,0 +1,147 @@
+"""Group commit for attendance writes.
+
+Committing costs an fsync, however few rows the transaction holds, so a
+burst of single-row commits (a card reader, many check-ins at once) is
+limited by the disk rather than by SQLite. Writer owns one write
+connection on its own thread and buffers incoming attendance rows in
+memory. The buffer is written as one transaction once ``max_batch`` rows
+are waiting or ``max_delay_ms`` has passed since the first of them,
+whichever comes first. Each caller gets a Future that completes once its
+row is committed, or fails with the error that rolled the batch back.
+Each row is logged to the audit log under its own actor, one event per
+actor in the batch, in the batch's transaction.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from itertools import groupby
+
+from db import DEFAULT_PROFILE, connect, insert_attendance, transaction
+from service import AttendanceService
+
+MAX_BATCH = 500
+MAX_DELAY_MS = 5
+
+
+class Writer:
+    """The single write connection, fed by a queue.
+
+    ``check_in(row, actor)`` buffers an ``insert_attendance`` row, logged
+    as ``actor`` (default: the writer's own ``actor``). ``submit(task)``
+    runs ``task(service)`` on the writer's connection, with a service
+    acting as the writer's ``actor``; it first commits
+    the rows buffered before it, so writes keep their queue order.
+    ``flush()`` commits the buffer now, and ``close()`` flushes before it
+    stops. All three return Futures. ``batches`` and ``rows`` count the
+    check-in commits and the rows they wrote.
+    """
+
+    def __init__(self, path, max_batch=MAX_BATCH, max_delay_ms=MAX_DELAY_MS,
+                 profile=DEFAULT_PROFILE, actor=None):
+        self.path = path
+        self.profile = profile
+        self.actor = actor
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def check_in(self, row, actor=None):
+        return self._put(True, (actor or self.actor, row))
+
+    def submit(self, task):
+        return self._put(False, task)
+
+    def flush(self):
+        return self.submit(lambda service: None)
+
+    def _put(self, is_row, payload):
+        if self._closed:
+            raise RuntimeError("Writer has been closed.")
+        future = Future()
+        self._queue.put((is_row, payload, future))
+        return future
+
+    @property
+    def queued(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """Commit everything queued so far, then stop the thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    # ---------- WRITER THREAD ----------
+    def _run(self):
+        conn = connect(self.path, check_same_thread=False, profile=self.profile)
+        service = AttendanceService(conn, self.actor)
+        try:
+            running = True
+            while running:
+                running = self._write(service, self._next_batch())
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        """Block for one item, then gather more until the batch is due.
+
+        Anything but a row (a task, or the stop marker) ends the batch at
+        once: there is no reason to make it wait for more rows.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            last = batch[-1]
+            if last is None or not last[0]:
+                break
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, service, batch):
+        rows = []
+        for item in batch:
+            if item is not None and item[0]:
+                rows.append(item)
+                continue
+            self._commit(service.conn, rows)
+            rows = []
+            if item is None:
+                return False
+            _, task, future = item
+            try:
+                future.set_result(task(service))
+            except Exception as e:
+                future.set_exception(e)
+        self._commit(service.conn, rows)
+        return True
+
+    def _commit(self, conn, items):
+        if not items:
+            return
+        try:
+            with transaction(conn) as c:
+                # One event per run of rows by the same actor
+                for actor, group in groupby(items, key=lambda item: item[1][0]):
+                    insert_attendance(c, [row for _, (_, row), _ in group], actor=actor)
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(items)
+        for _, _, future in items:
+            future.set_result(None)